@@ -0,0 +1,174 @@
+"""
+Headless core of toMp4: transcribe an MP3 to SRT and render the still-image video.
+
+toMp4.py is the Tk window around these two functions; PodCastTool/batch_render.py
+calls them directly, without importing tkinter. whisper is only imported when a
+transcription is actually requested (see transcribe_service).
+"""
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from PIL import Image, ImageOps
+
+# Shared helpers (duration probing, ...) live next to the other generators in PodCastTool
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "PodCastTool"))
+from audio_probe import get_duration
+from visualizer import build_visualizer_track, overlay_filter
+from encoder_profiles import get_profile, output_fps, scale_filter, video_args
+from transcript_cache import transcribe_cached, get_default_cache as get_transcript_cache
+
+VIDEO_SIZE = (1280, 720)
+FPS = 25  # rate of the looped image and of showfreqs (final mode; draft uses encoder_profiles' max_fps)
+WAVE_SIZE = (320, 200)
+WAVE_FPS = 12.5  # precomputed spectrum bars: every other output frame
+
+
+def format_time(seconds):
+    td = float(seconds)
+    h, m, s = int(td // 3600), int((td % 3600) // 60), int(td % 60)
+    ms = int((td - int(td)) * 1000)
+    return f"{h:02d}:{m:02d}:{s:02d},{ms:03d}"
+
+
+def write_srt(segments, srt_path):
+    with open(srt_path, "w", encoding="utf-8") as f:
+        for i, seg in enumerate(segments, start=1):
+            f.write(f"{i}\n{format_time(seg['start'])} --> {format_time(seg['end'])}\n{seg['text'].strip()}\n\n")
+    return srt_path
+
+
+def transcribe_to_srt(audio_path, output_dir, model_name="base", progress_callback=None, language=None):
+    """Write <audio name>.srt into output_dir with whisper; returns the SRT path.
+
+    Models stay loaded between calls and long files are decoded in parallel chunks
+    (transcribe_service); progress_callback(percent) is called as each chunk finishes.
+    Audio that was transcribed before (or only had a tail appended) comes from the
+    transcript cache."""
+    get_transcript_cache().reset_stats()
+    segments = transcribe_cached(audio_path, model_name, language=language, progress_callback=progress_callback)
+    print(get_transcript_cache().report())
+    base_name = os.path.splitext(os.path.basename(audio_path))[0]
+    return write_srt(segments, os.path.join(output_dir, base_name + ".srt"))
+
+
+def build_static_layer(bg_path, out_png, logo_path=None, logo_size_percent=15):
+    """The 1280x720 background (scaled to cover, centre-cropped) with the logo already pasted
+    top-right: everything the legacy graph recomputed on every frame."""
+    with Image.open(bg_path) as bg:
+        frame = ImageOps.fit(bg.convert("RGB"), VIDEO_SIZE, Image.BICUBIC)
+    if logo_path:
+        with Image.open(logo_path) as logo:
+            logo = logo.convert("RGBA")
+            # same as scale=iw*{percent/100}:-1 -> relative to the logo's own width
+            w = max(1, int(logo.width * logo_size_percent / 100.0))
+            h = max(1, round(logo.height * w / logo.width))
+            logo = logo.resize((w, h), Image.BICUBIC)
+        frame.paste(logo, (VIDEO_SIZE[0] - w - 20, 20), logo)
+    frame.save(out_png)
+    return out_png
+
+
+def _subtitle_filter(srt_path):
+    srt_fixed = os.path.abspath(srt_path).replace("\\", "/").replace(":", "\\:")
+    return f"subtitles='{srt_fixed}':force_style='FontSize=24,Alignment=2,MarginV=30'"
+
+
+def _output_tail(srt_path, vf):
+    """Filters applied last to the composed picture: burnt-in subtitles, then the draft downscale."""
+    return ",".join(f for f in (_subtitle_filter(srt_path) if srt_path else None, vf) if f)
+
+
+def _legacy_command(audio_path, bg_path, srt_path, logo_path, logo_size_percent, fps=FPS, vf=None):
+    # --- BUILD FFMPEG COMMAND ---
+    cmd = ['ffmpeg', '-y', '-loop', '1', '-framerate', str(fps), '-i', bg_path, '-i', audio_path]
+
+    # 1. Background & Audio Wave
+    filter_str = "[0:v]scale=1280:720:force_original_aspect_ratio=increase,crop=1280:720,format=yuv420p[bg]; "
+    filter_str += "[1:a]showfreqs=s=320x200:mode=bar:colors=white:fscale=log:ascale=sqrt[wave]; "
+
+    # 2. Add Wave onto Background
+    filter_str += "[bg][wave]overlay=480:260:shortest=1[v_intermediate]"
+    last_v_tag = "[v_intermediate]"
+
+    # 3. Add Logo if enabled
+    if logo_path:
+        cmd.extend(['-i', logo_path])
+        logo_idx = 2
+        # Tính toán tỉ lệ thập phân (ví dụ: 15% -> 0.15)
+        scale_val = logo_size_percent / 100.0
+        # Áp dụng scale tỉ lệ với iw (input width của logo)
+        filter_str += f"; [{logo_idx}:v]scale=iw*{scale_val}:-1[logo]; {last_v_tag}[logo]overlay=main_w-overlay_w-20:20[v_with_logo]"
+        last_v_tag = "[v_with_logo]"
+
+    # 4. Add Subtitles if enabled (and the draft downscale)
+    filter_str += f"; {last_v_tag}{_output_tail(srt_path, vf) or 'copy'}[v]"
+    return cmd, filter_str
+
+
+def _static_command(audio_path, static_png, srt_path, wave_track=None, fps=FPS, vf=None):
+    # the PNG is decoded and converted to yuv420p once; loop= then repeats that frame
+    cmd = ['ffmpeg', '-y', '-framerate', str(fps), '-i', static_png, '-i', audio_path]
+    filter_str = "[0:v]format=yuv420p,loop=loop=-1:size=1:start=0[bg]; "
+    if wave_track:
+        cmd.extend(['-i', wave_track])
+        filter_str += overlay_filter("[2:v]", "[wave]") + "; "
+    else:
+        filter_str += "[1:a]showfreqs=s=320x200:mode=bar:colors=white:fscale=log:ascale=sqrt[wave]; "
+    tail = _output_tail(srt_path, vf)
+    filter_str += f"[bg][wave]overlay=480:260:shortest=1:format=yuv420{',' + tail if tail else ''}[v]"
+    return cmd, filter_str
+
+
+def render_video(audio_path, bg_path, out_file, srt_path=None, logo_path=None, logo_size_percent=15,
+                 progress_callback=None, duration=None, static_layer=True, wave_fps=WAVE_FPS, render_mode=None):
+    """Background + frequency bars + optional logo and burnt-in subtitles over the audio.
+
+    With static_layer (the default) background and logo are composited once into a PNG
+    (build_static_layer) and only the bars and subtitles are drawn per frame;
+    static_layer=False runs the original graph that scales the image and logo on every
+    frame. The spectrum bars of the static-layer mode are precomputed by visualizer.py at
+    `wave_fps` (None: ffmpeg's showfreqs per frame). `duration` skips probing when the
+    caller already knows the audio length. render_mode is "draft" or "final" (encoder_profiles).
+    progress_callback(percent) follows ffmpeg's time= output. Returns out_file."""
+    total_dur = duration or get_duration(audio_path)
+    profile = get_profile(render_mode)
+    fps = output_fps(profile, FPS)
+    vf = scale_filter(profile, *VIDEO_SIZE)
+    work_dir = tempfile.mkdtemp(prefix="tomp4_")
+    try:
+        if static_layer:
+            static_png = build_static_layer(bg_path, os.path.join(work_dir, "static.png"), logo_path, logo_size_percent)
+            wave_track = None
+            if wave_fps:
+                wave_track = build_visualizer_track(audio_path, os.path.join(work_dir, "wave.mkv"), "spectrum",
+                                                    *WAVE_SIZE, fps=min(wave_fps, fps))
+            cmd, filter_str = _static_command(audio_path, static_png, srt_path, wave_track, fps, vf)
+        else:
+            cmd, filter_str = _legacy_command(audio_path, bg_path, srt_path, logo_path, logo_size_percent, fps, vf)
+
+        cmd.extend([
+            '-filter_complex', filter_str,
+            '-map', '[v]',
+            '-map', '1:a',
+            *video_args(profile, fps),
+            '-c:a', 'aac', '-b:a', '192k',
+            '-shortest', out_file
+        ])
+
+        process = subprocess.Popen(cmd, stderr=subprocess.STDOUT, stdout=subprocess.PIPE, universal_newlines=True, encoding='utf-8')
+        last_lines = []
+        for line in process.stdout:
+            last_lines = (last_lines + [line.strip()])[-5:]
+            time_match = re.search(r"time=(\d{2}:\d{2}:\d{2})", line)
+            if time_match and progress_callback:
+                h, m, s = map(int, time_match.group(1).split(':'))
+                progress_callback(min(((h * 3600 + m * 60 + s) / total_dur) * 100, 100))
+        if process.wait() != 0:
+            raise RuntimeError("ffmpeg render failed: " + " | ".join(last_lines))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return out_file
@@ -0,0 +1,89 @@
+"""
+transcript_cache: reusing an earlier transcript when a tail was appended to the audio.
+
+Real files are made with ffmpeg (30 s, then the same 30 s with 10 s appended) and
+decoded the way transcribe_cached() does; only whisper is replaced by a recorder that
+returns one segment per 5 s of whatever PCM it is given.
+
+    python -m pytest PodCastMp3ToMp4WithSub/tests
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transcribe_service import SAMPLE_RATE
+from transcript_cache import TranscriptCache, transcribe_cached
+
+
+class RecordingService:
+    def __init__(self):
+        self.calls = []
+
+    def transcribe_pcm(self, audio, model_name="base", language=None, progress_callback=None):
+        seconds = len(audio) / SAMPLE_RATE
+        self.calls.append(seconds)
+        segments = [{"start": t, "end": min(t + 5.0, seconds), "text": f"seg {t:g}"}
+                    for t in range(0, int(seconds), 5)]
+        return segments, language or "en"
+
+
+def _ffmpeg(*args):
+    subprocess.run(["ffmpeg", "-v", "error", "-y", *args], check=True)
+
+
+@pytest.fixture(scope="module")
+def audio_files(tmp_path_factory):
+    work = tmp_path_factory.mktemp("audio")
+    first, tail = str(work / "first.wav"), str(work / "tail.wav")
+    _ffmpeg("-f", "lavfi", "-i", "sine=f=300:d=30:r=44100", "-f", "lavfi", "-i", "anoisesrc=d=30:a=0.05:r=44100",
+            "-filter_complex", "amix=inputs=2", first)
+    _ffmpeg("-f", "lavfi", "-i", "sine=f=500:d=10:r=44100", tail)
+    longer = str(work / "longer.wav")
+    _ffmpeg("-i", first, "-i", tail, "-filter_complex", "[0][1]concat=n=2:v=0:a=1", longer)
+    mp3 = ["-c:a", "libmp3lame", "-b:a", "128k"]
+    first_mp3, longer_mp3, tail_mp3 = str(work / "first.mp3"), str(work / "longer.mp3"), str(work / "tail.mp3")
+    _ffmpeg("-i", first, *mp3, first_mp3)
+    _ffmpeg("-i", longer, *mp3, longer_mp3)
+    _ffmpeg("-i", tail, *mp3, tail_mp3)
+    # the MP3 concatenated by stream copy, as when a recording is appended to
+    listing = work / "list.txt"
+    listing.write_text(f"file '{first_mp3}'\nfile '{tail_mp3}'\n")
+    copied = str(work / "copied.mp3")
+    _ffmpeg("-f", "concat", "-safe", "0", "-i", str(listing), "-c", "copy", copied)
+    files = {"wav": (first, longer), "mp3": (first_mp3, longer_mp3), "mp3 copy": (first_mp3, copied)}
+    return files
+
+
+@pytest.mark.parametrize("kind", ["wav", "mp3", "mp3 copy"])
+def test_appended_tail_reuses_earlier_transcript(audio_files, tmp_path, kind):
+    first, longer = audio_files[kind]
+    cache = TranscriptCache(str(tmp_path / "cache"))
+    service = RecordingService()
+
+    transcribe_cached(first, "base", service=service, cache=cache)
+    assert (cache.misses, cache.partial) == (1, 0)
+
+    segments = transcribe_cached(longer, "base", service=service, cache=cache)
+    assert cache.partial == 1 and cache.misses == 1
+    # only the part after the kept segments is transcribed again
+    assert service.calls[1] < 20
+    assert segments[-1]["end"] == pytest.approx(40.0, abs=0.1)
+    assert all(a["end"] <= b["start"] + 1e-6 for a, b in zip(segments, segments[1:]))
+
+    transcribe_cached(longer, "base", service=service, cache=cache)
+    assert cache.hits == 1 and len(service.calls) == 2
+
+
+def test_changed_audio_is_not_reused(audio_files, tmp_path):
+    first, _ = audio_files["wav"]
+    other = str(tmp_path / "other.wav")
+    _ffmpeg("-f", "lavfi", "-i", "sine=f=700:d=40:r=44100", other)
+    cache = TranscriptCache(str(tmp_path / "cache"))
+    service = RecordingService()
+    transcribe_cached(first, "base", service=service, cache=cache)
+    transcribe_cached(other, "base", service=service, cache=cache)
+    assert (cache.misses, cache.partial) == (2, 0)
@@ -1,10 +1,10 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
-import whisper
-import subprocess
 import os
 import threading
-import re
+# transcription + ffmpeg rendering (no tkinter) live in mp4_render
+from mp4_render import transcribe_to_srt, render_video
+from encoder_profiles import MODES, get_profile  # PodCastTool is on sys.path through mp4_render
 
 class PodcastVideoAllInOne:
     def __init__(self, root):
@@ -21,6 +21,8 @@ class PodcastVideoAllInOne:
         self.has_logo = tk.BooleanVar(value=False)
         # --- Biến lưu tỉ lệ Logo (Mặc định 15%) ---
         self.logo_size_percent = tk.IntVar(value=15)
+        # draft = xem nhanh (nửa độ phân giải, ít khung hình), final = bản xuất
+        self.render_mode = tk.StringVar(value=get_profile()["name"])
 
         self.notebook = ttk.Notebook(self.root)
         self.notebook.pack(expand=True, fill="both", padx=10, pady=10)
@@ -77,6 +79,8 @@ class PodcastVideoAllInOne:
         sub_frame = tk.Frame(tab2)
         sub_frame.pack(fill="x", padx=30, pady=5)
         tk.Checkbutton(sub_frame, text="Chèn phụ đề vào video", variable=self.has_sub).pack(side="left")
+        ttk.Combobox(sub_frame, textvariable=self.render_mode, values=list(MODES), state="readonly", width=8).pack(side="right")
+        tk.Label(sub_frame, text="Chế độ xuất:").pack(side="right")
         
         self.srt_row = tk.Frame(tab2)
         self.srt_row.pack(fill="x", padx=30, pady=5)
@@ -111,12 +115,6 @@ class PodcastVideoAllInOne:
         d = filedialog.askdirectory()
         if d: self.output_dir.set(d)
 
-    def format_time(self, seconds):
-        td = float(seconds)
-        h, m, s = int(td // 3600), int((td % 3600) // 60), int(td % 60)
-        ms = int((td - int(td)) * 1000)
-        return f"{h:02d}:{m:02d}:{s:02d},{ms:03d}"
-
     def start_sub_thread(self):
         if not self.audio_path.get() or not self.output_dir.get():
             return messagebox.showwarning("Lỗi", "Vui lòng chọn Audio và Thư mục lưu!")
@@ -126,24 +124,13 @@ class PodcastVideoAllInOne:
 
     def process_sub(self):
         try:
-            self.sub_status.config(text="Đang tải Model AI...", fg="blue")
-            model = whisper.load_model(self.model_var.get())
-            
-            dur_cmd = ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'default=noprint_wrappers=1:nokey=1', self.audio_path.get()]
-            total_duration = float(subprocess.check_output(dur_cmd).strip())
-
             self.sub_status.config(text="AI đang xử lý âm thanh...", fg="blue")
-            result = model.transcribe(self.audio_path.get(), fp16=False)
-            
-            base_name = os.path.splitext(os.path.basename(self.audio_path.get()))[0]
-            srt_full_path = os.path.join(self.output_dir.get(), base_name + ".srt")
-            
-            with open(srt_full_path, "w", encoding="utf-8") as f:
-                for i, seg in enumerate(result['segments'], start=1):
-                    f.write(f"{i}\n{self.format_time(seg['start'])} --> {self.format_time(seg['end'])}\n{seg['text'].strip()}\n\n")
-                    prog = (seg['end'] / total_duration) * 100
-                    self.sub_progress["value"] = prog
-                    self.root.update_idletasks()
+
+            def on_progress(prog):
+                self.sub_progress["value"] = prog
+                self.sub_status.config(text=f"AI đang xử lý âm thanh... {int(prog)}%", fg="blue")
+                self.root.update_idletasks()
+            srt_full_path = transcribe_to_srt(self.audio_path.get(), self.output_dir.get(), self.model_var.get(), on_progress)
 
             self.sub_progress["value"] = 100
             self.srt_path.set(srt_full_path)
@@ -172,60 +159,16 @@ class PodcastVideoAllInOne:
         out_file = os.path.join(self.output_dir.get(), base_name + "_final.mp4")
         
         try:
-            dur_cmd = ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'default=noprint_wrappers=1:nokey=1', self.audio_path.get()]
-            total_dur = float(subprocess.check_output(dur_cmd).strip())
-            
-            # --- BUILD FFMPEG COMMAND ---
-            cmd = ['ffmpeg', '-y', '-loop', '1', '-i', self.bg_path.get(), '-i', self.audio_path.get()]
-            
-            # 1. Background & Audio Wave
-            filter_str = "[0:v]scale=1280:720:force_original_aspect_ratio=increase,crop=1280:720,format=yuv420p[bg]; "
-            filter_str += "[1:a]showfreqs=s=320x200:mode=bar:colors=white:fscale=log:ascale=sqrt[wave]; "
-            
-            # 2. Add Wave onto Background
-            filter_str += "[bg][wave]overlay=480:260:shortest=1[v_intermediate]"
-            last_v_tag = "[v_intermediate]"
-
-            # 3. Add Logo if enabled
-            if self.has_logo.get():
-                cmd.extend(['-i', self.logo_path.get()])
-                logo_idx = 2
-                # Tính toán tỉ lệ thập phân (ví dụ: 15% -> 0.15)
-                scale_val = self.logo_size_percent.get() / 100.0
-                # Áp dụng scale tỉ lệ với iw (input width của logo)
-                filter_str += f"; [{logo_idx}:v]scale=iw*{scale_val}:-1[logo]; {last_v_tag}[logo]overlay=main_w-overlay_w-20:20[v_with_logo]"
-                last_v_tag = "[v_with_logo]"
-
-            # 4. Add Subtitles if enabled
-            if self.has_sub.get():
-                srt_fixed = os.path.abspath(self.srt_path.get()).replace("\\", "/").replace(":", "\\:")
-                filter_str += f"; {last_v_tag}subtitles='{srt_fixed}':force_style='FontSize=24,Alignment=2,MarginV=30'[v]"
-                last_v_tag = "[v]"
-            else:
-                filter_str += f"; {last_v_tag}copy[v]"
-
-            cmd.extend([
-                '-filter_complex', filter_str,
-                '-map', '[v]', 
-                '-map', '1:a',
-                '-c:v', 'libx264', '-preset', 'ultrafast', 
-                '-tune', 'stillimage', '-crf', '23',
-                '-c:a', 'aac', '-b:a', '192k',
-                '-shortest', out_file
-            ])
-
-            process = subprocess.Popen(cmd, stderr=subprocess.STDOUT, stdout=subprocess.PIPE, universal_newlines=True, encoding='utf-8')
-            
-            for line in process.stdout:
-                time_match = re.search(r"time=(\d{2}:\d{2}:\d{2})", line)
-                if time_match:
-                    h, m, s = map(int, time_match.group(1).split(':'))
-                    percent = ((h * 3600 + m * 60 + s) / total_dur) * 100
-                    self.video_progress["value"] = min(percent, 100)
-                    self.video_status.config(text=f"Rendering: {int(self.video_progress['value'])}%")
-                    self.root.update_idletasks()
-            
-            process.wait()
+            def on_progress(percent):
+                self.video_progress["value"] = percent
+                self.video_status.config(text=f"Rendering: {int(self.video_progress['value'])}%")
+                self.root.update_idletasks()
+            render_video(self.audio_path.get(), self.bg_path.get(), out_file,
+                         srt_path=self.srt_path.get() if self.has_sub.get() else None,
+                         logo_path=self.logo_path.get() if self.has_logo.get() else None,
+                         logo_size_percent=self.logo_size_percent.get(), progress_callback=on_progress,
+                         render_mode=self.render_mode.get())
+
             self.video_progress["value"] = 100
             messagebox.showinfo("Xong!", f"Video đã sẵn sàng!\n{out_file}")
             os.startfile(self.output_dir.get())
@@ -0,0 +1,258 @@
+"""
+Whisper transcription that keeps models loaded and decodes long audio in parallel chunks.
+
+process_sub used to call whisper.load_model() on every click and transcribe the
+whole file in one model.transcribe() call, so the progress bar only moved once
+everything was done. TranscriptionService instead:
+
+- decodes the audio once to 16 kHz mono float32 (what whisper works on);
+- splits it at the quietest point inside every CHUNK_MIN..CHUNK_MAX window, so
+  cuts land in pauses between sentences rather than in the middle of a word;
+- decodes the chunks in a pool of worker processes (each loads the model once and
+  stays alive for the next file), or in-process with one worker;
+- gives each chunk the end of the text before it as whisper's initial_prompt, so
+  names and spelling carry over the cut. With a pool the chunks are split into one
+  run per worker and only the first chunk of each later run starts without it;
+- shifts every chunk's segment times by the chunk's start and reports progress as
+  each chunk finishes.
+
+Loaded models (in-process) and worker pools are both kept per model name, least
+recently used first out once more than `max_models` are held.
+
+    service = get_default_service()
+    segments = service.transcribe("podcast.mp3", "base", progress_callback=print)
+
+PODCAST_WHISPER_WORKERS sets the number of worker processes. The default is 1
+(in-process): no speed-up from more workers has been measured yet.
+"""
+import multiprocessing
+import os
+import subprocess
+import sys
+import threading
+from collections import OrderedDict
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "PodCastTool"))
+from frame_encoder import find_ffmpeg
+
+SAMPLE_RATE = 16000  # whisper's input rate
+CHUNK_MIN = 20.0     # seconds; a chunk is cut somewhere between CHUNK_MIN and CHUNK_MAX
+CHUNK_MAX = 90.0
+FRAME_SECONDS = 0.02
+QUIET_WINDOW = 0.3   # seconds of low energy looked for at a cut
+PROMPT_CHARS = 200   # tail of the previous chunk's text passed on as initial_prompt
+DEFAULT_MAX_MODELS = 2
+
+
+def default_workers():
+    env = os.environ.get("PODCAST_WHISPER_WORKERS")
+    if env:
+        return max(1, int(env))
+    return 1
+
+
+def load_whisper_model(name):
+    import whisper
+    return whisper.load_model(name)
+
+
+def decode_audio(path, sample_rate=SAMPLE_RATE):
+    """Mono float32 PCM in [-1, 1] at `sample_rate` (same conversion whisper.load_audio does)."""
+    result = subprocess.run(
+        [find_ffmpeg(), "-v", "error", "-nostdin", "-i", path, "-f", "s16le", "-acodec", "pcm_s16le",
+         "-ac", "1", "-ar", str(sample_rate), "-"],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False)
+    if result.returncode != 0:
+        raise RuntimeError(f"could not decode {path}: {result.stderr.decode('utf-8', 'replace').strip()}")
+    return np.frombuffer(result.stdout, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def split_on_silence(audio, sample_rate=SAMPLE_RATE, min_len=CHUNK_MIN, max_len=CHUNK_MAX):
+    """[(start, end), ...] sample ranges covering `audio`, cut at the quietest QUIET_WINDOW
+    inside each min_len..max_len window (the latest one when several are equally quiet)."""
+    n = len(audio)
+    if n <= max_len * sample_rate:
+        return [(0, n)]
+    hop = int(sample_rate * FRAME_SECONDS)
+    n_frames = n // hop
+    frames = audio[:n_frames * hop].reshape(n_frames, hop)
+    # per-frame energy without squaring a copy of the whole file
+    energy = np.einsum("ij,ij->i", frames, frames)
+    width = max(1, int(QUIET_WINDOW / FRAME_SECONDS))
+    smooth = np.convolve(energy, np.ones(width, dtype=np.float32), mode="same")
+
+    lo_off, hi_off = int(min_len / FRAME_SECONDS), int(max_len / FRAME_SECONDS)
+    cuts = [0]
+    while n_frames - cuts[-1] > hi_off:
+        lo, hi = cuts[-1] + lo_off, cuts[-1] + hi_off
+        window = smooth[lo:hi]
+        # of the (near) quietest points take the last one: fewer, longer chunks
+        quiet = np.flatnonzero(window <= window.min() + 1e-6 + 1e-3 * (window.max() - window.min()))
+        cuts.append(lo + int(quiet[-1]))
+    bounds = [c * hop for c in cuts] + [n]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def stitch_segments(chunk_results):
+    """Merge [(offset_seconds, segments), ...] into one time-ordered list with absolute times."""
+    merged = []
+    for offset, segments in sorted(chunk_results, key=lambda r: r[0]):
+        for seg in segments:
+            text = seg["text"].strip()
+            if not text:
+                continue
+            start = offset + seg["start"]
+            end = offset + seg["end"]
+            if merged and start < merged[-1]["end"]:
+                start = merged[-1]["end"]  # whisper may run a little past the cut
+            merged.append({"start": start, "end": max(start, end), "text": text})
+    return merged
+
+
+def _tail_text(segments, limit=PROMPT_CHARS):
+    text = " ".join(s["text"].strip() for s in segments).strip()
+    return text[-limit:] or None
+
+
+def _transcribe_array(model, audio, language, prompt=None):
+    result = model.transcribe(audio, fp16=False, language=language, initial_prompt=prompt)
+    segments = [{"start": s["start"], "end": s["end"], "text": s["text"]} for s in result["segments"]]
+    return segments, result.get("language", language)
+
+
+# --- worker process side: one model per worker, loaded by the initializer ---
+_worker_model = None
+
+
+def _init_worker(loader, model_name, threads):
+    global _worker_model
+    try:
+        import torch
+        torch.set_num_threads(threads)  # share the cores between the workers
+    except ImportError:
+        pass
+    _worker_model = loader(model_name)
+
+
+def _worker_transcribe(audio, language, prompt=None):
+    return _transcribe_array(_worker_model, audio, language, prompt)
+
+
+class TranscriptionService:
+    def __init__(self, workers=None, max_models=DEFAULT_MAX_MODELS, loader=load_whisper_model):
+        """`loader(name)` returns a model with whisper's transcribe(); it must be a module-level
+        function so worker processes can call it."""
+        self.workers = default_workers() if workers is None else max(1, int(workers))
+        self.max_models = max(1, int(max_models))
+        self.loader = loader
+        self._models = OrderedDict()  # name -> model loaded in this process
+        self._pools = OrderedDict()   # name -> ProcessPoolExecutor whose workers hold that model
+        self._lock = threading.Lock()
+
+    def get_model(self, name):
+        with self._lock:
+            model = self._models.pop(name, None)
+            if model is None:
+                model = self.loader(name)
+            self._models[name] = model  # most recently used goes last
+            while len(self._models) > self.max_models:
+                self._models.popitem(last=False)
+            return model
+
+    def _get_pool(self, name):
+        # always self.workers big: a pool made for a short file (few chunks) is kept and reused
+        # for the next, longer one
+        with self._lock:
+            pool = self._pools.pop(name, None)
+            if pool is None:
+                threads = max(1, (os.cpu_count() or 1) // self.workers)
+                pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                           initargs=(self.loader, name, threads),
+                                           mp_context=multiprocessing.get_context("spawn"))
+            self._pools[name] = pool
+            while len(self._pools) > self.max_models:
+                _, old = self._pools.popitem(last=False)
+                old.shutdown(wait=False, cancel_futures=True)
+            return pool
+
+    def transcribe(self, audio_path, model_name="base", language=None, progress_callback=None):
+        """Segments [{"start", "end", "text"}, ...] for the whole file, times in seconds.
+
+        progress_callback(percent) is called after every chunk."""
+        return self.transcribe_pcm(decode_audio(audio_path), model_name, language, progress_callback)[0]
+
+    def transcribe_pcm(self, audio, model_name="base", language=None, progress_callback=None):
+        """Like transcribe() for PCM from decode_audio(); returns (segments, language), with the
+        language whisper detected when none was given."""
+        chunks = split_on_silence(audio)
+        total = max(1, len(audio))
+        done = [0]
+        results = []
+
+        def finished(chunk, segments):
+            results.append((chunk[0] / SAMPLE_RATE, segments))
+            done[0] += chunk[1] - chunk[0]
+            if progress_callback:
+                progress_callback(100.0 * done[0] / total)
+
+        if self.workers <= 1 or len(chunks) <= 1:
+            model = self.get_model(model_name)
+            prompt = None
+            for chunk in chunks:
+                segments, language = _transcribe_array(model, audio[chunk[0]:chunk[1]], language, prompt)
+                finished(chunk, segments)
+                prompt = _tail_text(segments)
+            return stitch_segments(results), language
+
+        pool = self._get_pool(model_name)
+        pending = list(chunks)
+        prompt = None
+        if language is None:
+            # detect the language on the first chunk so every chunk is decoded the same way
+            first = pending.pop(0)
+            segments, language = pool.submit(_worker_transcribe, audio[first[0]:first[1]], None).result()
+            finished(first, segments)
+            prompt = _tail_text(segments)
+
+        # one run of consecutive chunks per worker; within a run each chunk is submitted when the
+        # one before it is done, with that chunk's text as its prompt
+        n = len(pending)
+        runs = [deque(pending[k * n // self.workers:(k + 1) * n // self.workers]) for k in range(self.workers)]
+        futures = {}
+
+        def submit(run, prompt):
+            chunk = run.popleft()
+            futures[pool.submit(_worker_transcribe, audio[chunk[0]:chunk[1]], language, prompt)] = (run, chunk)
+
+        for k, run in enumerate(r for r in runs if r):
+            submit(run, prompt if k == 0 else None)
+        while futures:
+            ready, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for fut in ready:
+                run, chunk = futures.pop(fut)
+                segments = fut.result()[0]
+                finished(chunk, segments)
+                if run:
+                    submit(run, _tail_text(segments))
+        return stitch_segments(results), language
+
+    def close(self):
+        with self._lock:
+            for pool in self._pools.values():
+                pool.shutdown(wait=False, cancel_futures=True)
+            self._pools.clear()
+            self._models.clear()
+
+
+_default_service = None
+
+
+def get_default_service():
+    global _default_service
+    if _default_service is None:
+        _default_service = TranscriptionService()
+    return _default_service
@@ -0,0 +1,149 @@
+"""
+Cache of whisper transcripts keyed by the decoded 16 kHz PCM (+ model, language); audio with
+only a tail appended reuses the earlier segments. PODCAST_TRANSCRIPT_CACHE / _MB.
+"""
+import hashlib
+import json
+import os
+import sys
+
+from transcribe_service import SAMPLE_RATE, decode_audio, get_default_service
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "PodCastTool"))
+from disk_cache import DiskCache, atomic_write_bytes, default_cache, hash_key
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "podcasttool", "transcripts")
+DEFAULT_MAX_MB = 256
+ENTRY_EXT = ".json"
+# entries live in a folder named after a hash of the first HEAD_SECONDS, where find_prefix looks
+HEAD_SECONDS = 10.0
+# the last sentence before the old end may continue into the appended tail, so it is redone
+TAIL_OVERLAP = 5.0
+# end of an entry's audio left out of its prefix hash (ffmpeg's resampler flush and the MP3
+# encoder's last frame change it once more audio follows); must stay below TAIL_OVERLAP
+PREFIX_GUARD = 1.0
+
+
+def pcm_hash(pcm):
+    return hashlib.sha256(memoryview(pcm).cast("B")).hexdigest()
+
+
+def head_hash(pcm):
+    return pcm_hash(pcm[:int(HEAD_SECONDS * SAMPLE_RATE)])
+
+
+class TranscriptCache(DiskCache):
+    ext = ENTRY_EXT
+    env = "PODCAST_TRANSCRIPT_CACHE"
+    default_dir = DEFAULT_CACHE_DIR
+    default_mb = DEFAULT_MAX_MB
+    counters = ("hits", "partial", "misses")
+
+    @staticmethod
+    def key(audio_hash, model, language):
+        return hash_key([audio_hash, model, language or "auto"])
+
+    def _path(self, head, key):
+        return self.path(key, folder=head[:16])
+
+    def _load(self, path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        self.touch(path)
+        return entry
+
+    def lookup(self, pcm, model, language=None, audio_hash=None):
+        """The entry ({"segments", "language", "n_samples", ...}) for exactly this audio, or None."""
+        audio_hash = audio_hash or pcm_hash(pcm)
+        return self._load(self._path(head_hash(pcm), self.key(audio_hash, model, language)))
+
+    def find_prefix(self, pcm, model, language=None):
+        """The longest cached entry whose audio (up to PREFIX_GUARD before its end) is a
+        prefix of the longer `pcm`, or None."""
+        if len(pcm) < HEAD_SECONDS * SAMPLE_RATE:
+            return None
+        folder = os.path.join(self.cache_dir, head_hash(pcm)[:16])
+        try:
+            names = os.listdir(folder)
+        except OSError:
+            return None
+        candidates = []
+        for name in names:
+            if not name.endswith(ENTRY_EXT) or name.startswith(".tmp_"):
+                continue
+            entry = self._load(os.path.join(folder, name))
+            if (entry and entry["model"] == model and entry["requested_language"] == (language or "auto")
+                    and entry["n_samples"] < len(pcm) and entry.get("prefix_hash")):
+                candidates.append(entry)
+        for entry in sorted(candidates, key=lambda e: -e["n_samples"]):
+            if pcm_hash(pcm[:entry["prefix_samples"]]) == entry["prefix_hash"]:
+                return entry
+        return None
+
+    def store(self, pcm, model, language, segments, detected_language, audio_hash=None):
+        audio_hash = audio_hash or pcm_hash(pcm)
+        path = self._path(head_hash(pcm), self.key(audio_hash, model, language))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        prefix_samples = max(0, len(pcm) - int(PREFIX_GUARD * SAMPLE_RATE))
+        entry = {"audio_hash": audio_hash, "n_samples": len(pcm), "model": model,
+                 "requested_language": language or "auto", "language": detected_language,
+                 "prefix_samples": prefix_samples, "prefix_hash": pcm_hash(pcm[:prefix_samples]),
+                 "segments": segments}
+        try:
+            replaced = os.path.getsize(path)
+        except OSError:
+            replaced = 0
+        atomic_write_bytes(path, json.dumps(entry, ensure_ascii=False).encode("utf-8"))
+        self.added(path, replaced)
+        return entry
+
+    def report(self):
+        return f"Transcript cache: {self.hits} hits / {self.partial} tail-only / {self.misses} misses"
+
+
+def get_default_cache():
+    return default_cache(TranscriptCache)
+
+
+def transcribe_cached(audio_path, model_name="base", language=None, progress_callback=None,
+                      service=None, cache=None):
+    """Segments for `audio_path`, from the cache when possible: an exact hit, or the segments
+    of an earlier version up to TAIL_OVERLAP before its end plus a transcript of the rest."""
+    service = service or get_default_service()
+    cache = cache or get_default_cache()
+    pcm = decode_audio(audio_path)
+    audio_hash = pcm_hash(pcm)
+
+    entry = cache.lookup(pcm, model_name, language, audio_hash)
+    if entry is not None:
+        cache.count("hits")
+        if progress_callback:
+            progress_callback(100.0)
+        return entry["segments"]
+
+    kept, resume = [], 0.0
+    old = cache.find_prefix(pcm, model_name, language)
+    if old is not None:
+        old_end = old["n_samples"] / SAMPLE_RATE
+        kept = [s for s in old["segments"] if s["end"] <= old_end - TAIL_OVERLAP]
+        resume = kept[-1]["end"] if kept else 0.0
+        # the tail is decoded in the language the earlier run settled on
+        language_used = language or old["language"]
+    else:
+        language_used = language
+    cache.count("partial" if kept else "misses")
+
+    start = int(resume * SAMPLE_RATE)
+    total = len(pcm)
+
+    def on_progress(percent):
+        if progress_callback:
+            progress_callback(100.0 * (start + percent / 100.0 * (total - start)) / total)
+
+    tail, detected = service.transcribe_pcm(pcm[start:], model_name, language_used, on_progress)
+    segments = kept + [{"start": s["start"] + resume, "end": s["end"] + resume, "text": s["text"]} for s in tail]
+    cache.store(pcm, model_name, language, segments, detected, audio_hash)
+    return segments
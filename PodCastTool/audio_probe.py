@@ -0,0 +1,194 @@
+"""
+In-process audio duration probing.
+
+Spawning `ffprobe` just to read one duration costs a process fork per clip, which
+adds up to hundreds of forks on a long story. get_duration() reads the headers
+directly instead:
+
+- WAV: RIFF 'fmt ' + 'data' chunks (data size / byte rate).
+- MP3: skips the ID3v2 tag, then uses the Xing/Info or VBRI frame count when the
+  first frame carries one (minus the encoder delay and padding from the LAME tag,
+  which decoders trim off), otherwise walks every MPEG frame header and sums the
+  samples (exact for both CBR and VBR streams, including Edge TTS output).
+
+Anything else (m4a, flac, ...) falls back to ffprobe. Results are memoized per
+(path, size, mtime), so probing the same file twice is free.
+"""
+import os
+import struct
+import subprocess
+
+# bitrate tables in kbps, indexed [version_is_mpeg1][layer][index]
+_BITRATES = {
+    (True, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (True, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (True, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (False, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (False, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (False, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+# sample rates indexed by MPEG version bits (0 = 2.5, 2 = 2, 3 = 1)
+_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+_duration_cache = {}
+
+
+def probe_duration_ffprobe(path):
+    result = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "default=noprint_wrappers=1:nokey=1", path],
+        stdout=subprocess.PIPE, text=True, check=True
+    )
+    return float(result.stdout.strip())
+
+
+def _parse_frame_header(data, pos):
+    """Return (frame_length, samples_per_frame, sample_rate) for a valid header at pos, else None."""
+    if pos + 4 > len(data):
+        return None
+    b1, b2 = data[pos + 1], data[pos + 2]
+    if data[pos] != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+    version = (b1 >> 3) & 3
+    layer_bits = (b1 >> 1) & 3
+    br_index = b2 >> 4
+    sr_index = (b2 >> 2) & 3
+    if version == 1 or layer_bits == 0 or br_index in (0, 15) or sr_index == 3:
+        return None
+    layer = 4 - layer_bits  # 1, 2 or 3
+    mpeg1 = version == 3
+    bitrate = _BITRATES[(mpeg1, layer)][br_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][sr_index]
+    padding = (b2 >> 1) & 1
+    if layer == 1:
+        return (12 * bitrate // sample_rate + padding) * 4, 384, sample_rate
+    if layer == 3 and not mpeg1:
+        return 72 * bitrate // sample_rate + padding, 576, sample_rate
+    return 144 * bitrate // sample_rate + padding, 1152, sample_rate
+
+
+def _id3v2_size(data):
+    if len(data) >= 10 and data[:3] == b"ID3":
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        footer = 10 if data[5] & 0x10 else 0
+        return 10 + size + footer
+    return 0
+
+
+def _find_sync(data, pos, end):
+    while pos < end - 4:
+        pos = data.find(b"\xff", pos, end)
+        if pos < 0:
+            return -1
+        header = _parse_frame_header(data, pos)
+        # require the next frame to line up too, so stray 0xFF bytes are not taken for a header
+        if header and (pos + header[0] >= end - 4 or _parse_frame_header(data, pos + header[0])):
+            return pos
+        pos += 1
+    return -1
+
+
+def _lame_delay_padding(data, xing, flags, end):
+    """Encoder delay + padding in samples from the LAME tag after a Xing/Info header, else 0."""
+    # optional fields after the flags: frames (4), bytes (4), TOC (100), quality (4)
+    lame = xing + 8 + (4 if flags & 1 else 0) + (4 if flags & 2 else 0) + (100 if flags & 4 else 0) \
+        + (4 if flags & 8 else 0)
+    # 9 bytes encoder string ("LAME3.100", or "Lavc..." from ffmpeg), then 12 bytes of LAME
+    # fields; delay and padding are two 12-bit numbers in the 3 bytes after those
+    if lame + 24 > end or data[lame:lame + 4] not in (b"LAME", b"Lavc", b"Lavf"):
+        return 0
+    b = data[lame + 21:lame + 24]
+    return ((b[0] << 4) | (b[1] >> 4)) + (((b[1] & 0x0F) << 8) | b[2])
+
+
+def mp3_duration(data):
+    """Duration in seconds of an MP3 byte string, or None if no MPEG frames are found."""
+    end = len(data)
+    if end >= 128 and data[end - 128:end - 125] == b"TAG":
+        end -= 128  # ID3v1 tag
+    pos = _find_sync(data, _id3v2_size(data), end)
+    if pos < 0:
+        return None
+
+    # Xing/Info (LAME) or VBRI header in the first frame gives the frame count directly
+    first_len, spf, sample_rate = _parse_frame_header(data, pos)
+    mpeg1 = ((data[pos + 1] >> 3) & 3) == 3
+    mono = (data[pos + 3] >> 6) == 3
+    side_info = (17 if mono else 32) if mpeg1 else (9 if mono else 17)
+    xing = pos + 4 + side_info
+    if data[xing:xing + 4] in (b"Xing", b"Info") and xing + 12 <= end:
+        flags = struct.unpack(">I", data[xing + 4:xing + 8])[0]
+        if flags & 1:
+            frames = struct.unpack(">I", data[xing + 8:xing + 12])[0]
+            return (frames * spf - _lame_delay_padding(data, xing, flags, end)) / sample_rate
+    vbri = pos + 36
+    if data[vbri:vbri + 4] == b"VBRI" and vbri + 18 <= end:
+        frames = struct.unpack(">I", data[vbri + 14:vbri + 18])[0]
+        return frames * spf / sample_rate
+
+    # No summary header: walk the frames (works for CBR and VBR alike)
+    total = 0.0
+    while pos < end:
+        header = _parse_frame_header(data, pos)
+        if header is None:
+            pos = _find_sync(data, pos + 1, end)
+            if pos < 0:
+                break
+            continue
+        frame_len, spf, sample_rate = header
+        if pos + frame_len > end:
+            # truncated last frame: count the part that is there
+            total += spf / sample_rate * (end - pos) / frame_len
+            break
+        total += spf / sample_rate
+        pos += frame_len
+    return total
+
+
+def wav_duration(data, file_size=None):
+    """Duration in seconds of a RIFF/WAVE header, or None if it isn't one.
+
+    `data` only needs to cover the chunks up to the start of 'data'; pass the real
+    file_size when it is just the head of the file."""
+    if len(data) < 12 or data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        return None
+    pos = 12
+    byte_rate = None
+    while pos + 8 <= len(data):
+        chunk_id = data[pos:pos + 4]
+        chunk_size = struct.unpack("<I", data[pos + 4:pos + 8])[0]
+        body = pos + 8
+        if chunk_id == b"fmt ":
+            byte_rate = struct.unpack("<I", data[body + 8:body + 12])[0]
+        elif chunk_id == b"data":
+            if not byte_rate:
+                return None
+            # streamed WAVs may leave the size as 0 / 0xFFFFFFFF: use what is in the file
+            available = (file_size or len(data)) - body
+            if chunk_size == 0 or chunk_size > available:
+                chunk_size = available
+            return chunk_size / byte_rate
+        pos = body + chunk_size + (chunk_size & 1)
+    return None
+
+
+def get_duration(path):
+    """Duration of an audio file in seconds; in-process for MP3/WAV, ffprobe for anything else."""
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_size, st.st_mtime)
+    if key in _duration_cache:
+        return _duration_cache[key]
+
+    with open(path, "rb") as f:
+        head = f.read(12)
+        duration = None
+        if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+            f.seek(0)
+            duration = wav_duration(f.read(65536), st.st_size)
+        elif head[:3] == b"ID3" or (len(head) >= 2 and head[0] == 0xFF and (head[1] & 0xE0) == 0xE0):
+            f.seek(0)
+            duration = mp3_duration(f.read())
+
+    if duration is None:
+        duration = probe_duration_ffprobe(path)
+    _duration_cache[key] = duration
+    return duration
@@ -0,0 +1,108 @@
+"""
+Sample-accurate lesson audio built from numpy PCM.
+
+repeatReading used to assemble every line as a list of moviepy clips: silences
+were AudioClips evaluated through a Python lambda, and the same English part was
+reopened with AudioFileClip for every repeat. AudioTimeline decodes each unique
+file once (ffmpeg -> s16le), keeps the timeline as a list of (array, n_samples)
+segments where a repeat is just another reference to the same array and a
+silence is only a length, and writes the final WAV by streaming the segments
+out. Memory is bounded by the unique clips, not the lesson length.
+
+    tl = AudioTimeline()
+    tl.add_clip("cn.mp3"); tl.add_silence(0.5); tl.add_clip("cn.mp3")
+    tl.pad_to(4.0)
+    tl.write_wav("track.wav")
+"""
+import subprocess
+import wave
+
+import numpy as np
+
+from frame_encoder import find_ffmpeg
+
+DEFAULT_SAMPLE_RATE = 24000  # Edge TTS output rate
+DEFAULT_CHANNELS = 1
+_SILENCE_CHUNK = 1 << 16  # samples of zeros written at a time
+
+
+class AudioTimeline:
+    def __init__(self, sample_rate=DEFAULT_SAMPLE_RATE, channels=DEFAULT_CHANNELS):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.segments = []  # (int16 array of shape (n, channels), or None for silence, n_samples)
+        self.n_samples = 0
+        self._decoded = {}
+
+    @property
+    def duration(self):
+        return self.n_samples / self.sample_rate
+
+    def load(self, path):
+        """Decode `path` to int16 PCM at the timeline's rate/channels (once per path)."""
+        pcm = self._decoded.get(path)
+        if pcm is None:
+            result = subprocess.run(
+                [find_ffmpeg(), "-v", "error", "-i", path, "-f", "s16le", "-acodec", "pcm_s16le",
+                 "-ac", str(self.channels), "-ar", str(self.sample_rate), "-"],
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False)
+            if result.returncode != 0:
+                raise RuntimeError(f"could not decode {path}: {result.stderr.decode('utf-8', 'replace').strip()}")
+            pcm = np.frombuffer(result.stdout, dtype=np.int16).reshape(-1, self.channels)
+            self._decoded[path] = pcm
+        return pcm
+
+    def clip_duration(self, path):
+        return len(self.load(path)) / self.sample_rate
+
+    def add_clip(self, path):
+        """Append the whole clip; repeats of the same file share one decoded array."""
+        pcm = self.load(path)
+        self.segments.append((pcm, len(pcm)))
+        self.n_samples += len(pcm)
+        return self
+
+    def add_silence(self, seconds):
+        n = int(round(max(0.0, seconds) * self.sample_rate))
+        if n:
+            if self.segments and self.segments[-1][0] is None:
+                self.segments[-1] = (None, self.segments[-1][1] + n)
+            else:
+                self.segments.append((None, n))
+            self.n_samples += n
+        return self
+
+    def pad_to(self, seconds):
+        """Append silence so the timeline is exactly `seconds` long (no-op if already longer)."""
+        target = int(round(seconds * self.sample_rate))
+        if target > self.n_samples:
+            self.add_silence((target - self.n_samples) / self.sample_rate)
+        return self
+
+    def render(self):
+        """The whole timeline as one preallocated (n_samples, channels) int16 array."""
+        out = np.zeros((self.n_samples, self.channels), dtype=np.int16)
+        pos = 0
+        for pcm, n in self.segments:
+            if pcm is not None:
+                out[pos:pos + n] = pcm
+            pos += n
+        return out
+
+    def write_wav(self, path):
+        """Stream the timeline to a 16-bit WAV without materializing it in memory."""
+        zeros = np.zeros((_SILENCE_CHUNK, self.channels), dtype=np.int16).tobytes()
+        frame_bytes = 2 * self.channels
+        with wave.open(path, "wb") as w:
+            w.setnchannels(self.channels)
+            w.setsampwidth(2)
+            w.setframerate(self.sample_rate)
+            for pcm, n in self.segments:
+                if pcm is not None:
+                    w.writeframesraw(pcm.tobytes())
+                    continue
+                while n > 0:
+                    k = min(n, _SILENCE_CHUNK)
+                    w.writeframesraw(zeros[:k * frame_bytes])
+                    n -= k
+        return path
@@ -0,0 +1,198 @@
+"""
+Render many lessons without the Tk windows.
+
+Every generator has a headless core (podcast_render, repeat_reading_render,
+p2p_render, story_render, PodCastMp3ToMp4WithSub/mp4_render); this script runs
+one of them over all files matching an input glob, several files at a time, and
+prints how long each one took. Nothing here imports tkinter.
+
+    python batch_render.py repeat "lessons/*.txt" --settings repeat.json --jobs 2 --output-dir out
+    python batch_render.py p2p input_ConversationP2P/*.txt --settings '{"lang_var": "Chinese"}'
+
+--settings is a JSON file (or inline JSON object) of keyword settings for the generator:
+- podcast: render_podcast() arguments (lang, voice_pack, speed, show_subtitles, wave_mode, logo_scale, background, logo)
+- repeat:  RepeatReadingRenderer.DEFAULTS names (lang_var, selected_voice, main_repeat, ...)
+- p2p:     ConversationRenderer.DEFAULTS names, plus "voices" ({"M": ..., "F1": ...}) and "bg_images".
+           With engine_var "Gemini" each <name>.txt uses <name>.mp3/.wav/.m4a and <name>.srt next to it.
+- story:   render_story() arguments (voice, speed, font_path, base_font_size)
+- mp4:     bg (required), logo, logo_size_percent, srt ("auto" = <audio name>.srt next to the audio),
+           transcribe (true = make the SRT with whisper first), model
+Every generator also takes "render_mode" ("draft" / "final", see encoder_profiles);
+--mode sets it for the whole batch.
+"""
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from encoder_profiles import MODES
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MP4_DIR = os.path.join(HERE, "..", "PodCastMp3ToMp4WithSub")
+
+GENERATORS = ("podcast", "repeat", "p2p", "story", "mp4")
+GEMINI_AUDIO_EXTS = (".mp3", ".wav", ".m4a")
+
+
+def _sibling(path, exts):
+    stem = os.path.splitext(path)[0]
+    for ext in exts:
+        if os.path.exists(stem + ext):
+            return stem + ext
+    return None
+
+
+def render_one(generator, input_path, output_path, settings, stage=None):
+    """Render a single input file with the named generator; returns the written path.
+
+    stage(name) is called as the render moves to "synthesizing", "rendering" and "muxing"."""
+    settings = dict(settings)
+    if generator == "podcast":
+        from podcast_render import render_podcast
+        with open(input_path, encoding="utf-8") as f:
+            text = f.read()
+        return render_podcast(text, output_path=output_path, stage_callback=stage, **settings)
+
+    if generator == "repeat":
+        from repeat_reading_render import RepeatReadingRenderer
+        settings.setdefault("output_dir", os.path.dirname(output_path))
+        renderer = RepeatReadingRenderer(**settings)
+        if stage:
+            renderer.report_stage = stage
+        return renderer.process_video(input_path, output_path)
+
+    if generator == "p2p":
+        from p2p_render import ConversationRenderer
+        voices = settings.pop("voices", None)
+        bg_images = settings.pop("bg_images", None)
+        settings.setdefault("output_dir", os.path.dirname(output_path))
+        renderer = ConversationRenderer(voices=voices, bg_images=bg_images, **settings)
+        if stage:
+            renderer.report_stage = stage
+        if renderer.engine_var.get() == "Gemini":
+            audio = _sibling(input_path, GEMINI_AUDIO_EXTS)
+            srt = _sibling(input_path, (".srt",))
+            if not audio or not srt:
+                raise FileNotFoundError(f"Gemini cần file audio và .srt cùng tên với {input_path}")
+            return renderer.process_video_gemini(input_path, audio, srt, output_path)
+        return renderer.process_video(input_path, output_path)
+
+    if generator == "story":
+        from story_render import render_story
+        return render_story(input_path, output_path, stage_callback=stage, **settings)
+
+    if generator == "mp4":
+        if MP4_DIR not in sys.path:
+            sys.path.insert(0, MP4_DIR)
+        from mp4_render import transcribe_to_srt, render_video
+        bg = settings.pop("bg", None)
+        if not bg:
+            raise ValueError("mp4 cần \"bg\" (ảnh nền) trong --settings")
+        model = settings.pop("model", "base")
+        srt = settings.pop("srt", "auto")
+        if settings.pop("transcribe", False):
+            srt = transcribe_to_srt(input_path, os.path.dirname(output_path), model)
+        elif srt == "auto":
+            srt = _sibling(input_path, (".srt",))
+        if stage:
+            stage("rendering")
+        return render_video(input_path, bg, output_path, srt_path=srt or None,
+                            logo_path=settings.pop("logo", None) or None, **settings)
+
+    raise ValueError(f"unknown generator: {generator}")
+
+
+def _run_job(generator, input_path, output_path, settings):
+    """Worker entry point: (input, output, seconds, error message or None)."""
+    t0 = time.perf_counter()
+    try:
+        output_path = render_one(generator, input_path, output_path, settings)
+        error = None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return input_path, output_path, time.perf_counter() - t0, error
+
+
+def load_settings(value):
+    if not value:
+        return {}
+    if os.path.exists(value):
+        with open(value, encoding="utf-8") as f:
+            return json.load(f)
+    return json.loads(value)
+
+
+def collect_inputs(patterns):
+    files = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True)) or ([pattern] if os.path.isfile(pattern) else [])
+        files.extend(m for m in matches if m not in files)
+    return files
+
+
+def output_for(generator, input_path, output_dir):
+    stem = os.path.splitext(os.path.basename(input_path))[0]
+    suffix = "_final" if generator == "mp4" else ""
+    return os.path.join(output_dir or os.path.dirname(os.path.abspath(input_path)), stem + suffix + ".mp4")
+
+
+def run_batch(generator, inputs, settings=None, jobs=1, output_dir=None, report=print):
+    """Render every input; returns a list of (input, output, seconds, error)."""
+    settings = settings or {}
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    tasks = [(generator, path, output_for(generator, path, output_dir), settings) for path in inputs]
+    jobs = max(1, min(jobs, len(tasks) or 1))
+    results = []
+
+    def done(result):
+        results.append(result)
+        src, out, seconds, error = result
+        status = f"FAILED {error}" if error else f"-> {out}"
+        report(f"[{len(results)}/{len(tasks)}] {os.path.basename(src)}: {seconds:.1f}s {status}")
+
+    if jobs == 1:
+        for task in tasks:
+            done(_run_job(*task))
+        return results
+
+    # spawn like render_pool: jobs start their own frame pools and ffmpeg pipes
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context("spawn")) as ex:
+        futures = [ex.submit(_run_job, *task) for task in tasks]
+        for fut in as_completed(futures):
+            done(fut.result())
+    return results
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Render many lessons with one of the PodCastTool generators.")
+    ap.add_argument("generator", choices=GENERATORS)
+    ap.add_argument("inputs", nargs="+", help="input files or glob patterns (quote them to use ** )")
+    ap.add_argument("--settings", help="JSON file or inline JSON object with generator settings")
+    ap.add_argument("--jobs", type=int, default=1, help="files rendered at the same time")
+    ap.add_argument("--output-dir", help="where the videos go (default: next to each input)")
+    ap.add_argument("--mode", choices=MODES, help="render mode for every file (encoder_profiles)")
+    args = ap.parse_args(argv)
+
+    inputs = collect_inputs(args.inputs)
+    if not inputs:
+        print("Không tìm thấy file đầu vào.")
+        return 1
+    settings = load_settings(args.settings)
+    if args.mode:
+        settings["render_mode"] = args.mode
+
+    t0 = time.perf_counter()
+    results = run_batch(args.generator, inputs, settings, args.jobs, args.output_dir)
+    failed = [r for r in results if r[3]]
+    print(f"Xong {len(results) - len(failed)}/{len(results)} file trong {time.perf_counter() - t0:.1f}s"
+          + (f", {len(failed)} lỗi" if failed else ""))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""
+Benchmark: in-process duration probing (audio_probe.get_duration) vs one ffprobe
+subprocess per clip.
+
+Generates a batch of MP3 clips shaped like Edge TTS output (24 kHz mono 48 kbps CBR,
+no Xing header), a few VBR MP3s and WAVs with ffmpeg, then times both paths and checks
+that they agree: every clip must be within TOLERANCE of ffprobe, or the script exits
+with an error listing the clips that are not.
+
+Usage:
+  python benchmarks/bench_audio_probe.py --clips 200
+"""
+import argparse
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import audio_probe
+
+# well under one MP3 frame (26 ms at 44.1 kHz); the LAME delay/padding alone is ~50 ms
+TOLERANCE = 0.015
+
+FORMATS = [
+    ("mp3", ["-ar", "24000", "-ac", "1", "-b:a", "48k", "-write_xing", "0"]),  # like Edge TTS
+    ("mp3", ["-ar", "44100", "-ac", "2", "-q:a", "4"]),                          # VBR with Xing header
+    ("wav", ["-ar", "22050", "-ac", "1"]),
+]
+
+
+def make_clips(folder, n):
+    paths = []
+    for i in range(n):
+        ext, args = FORMATS[i % len(FORMATS)] if i % 10 == 0 else FORMATS[0]
+        path = os.path.join(folder, f"clip_{i}.{ext}")
+        dur = round(random.uniform(0.8, 8.0), 2)
+        subprocess.run(["ffmpeg", "-loglevel", "error", "-y", "-f", "lavfi", "-i", f"sine=f=330:d={dur}", *args, path],
+                       check=True)
+        paths.append(path)
+    return paths
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--clips", type=int, default=200)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"generating {args.clips} clips...")
+        paths = make_clips(tmp, args.clips)
+
+        audio_probe._duration_cache.clear()
+        t0 = time.perf_counter()
+        fast = [audio_probe.get_duration(p) for p in paths]
+        t_fast = time.perf_counter() - t0
+        print(f"in-process probe : {t_fast * 1000:8.1f} ms  ({t_fast / len(paths) * 1e6:7.0f} us/clip)")
+
+        if not shutil.which("ffprobe"):
+            print("ffprobe not found on PATH, skipping the subprocess comparison")
+            return
+        t0 = time.perf_counter()
+        slow = [audio_probe.probe_duration_ffprobe(p) for p in paths]
+        t_slow = time.perf_counter() - t0
+        print(f"ffprobe subprocess: {t_slow * 1000:8.1f} ms  ({t_slow / len(paths) * 1e6:7.0f} us/clip)")
+        print(f"speedup: {t_slow / t_fast:.0f}x")
+
+        worst = max(abs(a - b) for a, b in zip(fast, slow))
+        print(f"max difference vs ffprobe: {worst * 1000:.1f} ms")
+        off = [(os.path.basename(p), a, b) for p, a, b in zip(paths, fast, slow) if abs(a - b) > TOLERANCE]
+        if off:
+            sys.exit(f"{len(off)} clips off by more than {TOLERANCE * 1000:.0f} ms: "
+                     + ", ".join(f"{name} {a:.3f}s vs {b:.3f}s" for name, a, b in off[:5]))
+
+
+if __name__ == "__main__":
+    main()
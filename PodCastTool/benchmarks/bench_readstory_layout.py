@@ -0,0 +1,225 @@
+"""
+Benchmark + regression check for readStory's text layout against the previous code:
+
+- fit_sentence_font / wrap_text_to_lines vs the step-down fitter and prefix-remeasuring
+  wrapper: every top and bottom sentence of the sample inputs (plus long paragraphs made
+  by joining them) is fitted at a few box sizes; size and lines must match exactly.
+- wrap_and_paginate_with_mapping vs the paginator that re-fitted the whole page text for
+  every candidate sentence: every sample input (and a long story made by repeating them)
+  is paginated at a few box sizes; the pages must be identical.
+
+Timings are with a cold metrics cache. Exits with status 1 on any mismatch.
+
+Usage:
+  python benchmarks/bench_readstory_layout.py --font /path/to/font.ttf
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import ImageFont
+
+import story_render
+import text_metrics
+
+
+def get_text_dimensions(text, font):
+    bbox = font.getbbox(text)
+    return bbox[2] - bbox[0], bbox[3] - bbox[1]
+
+
+# --- previous implementation, kept as the baseline ---
+def legacy_wrap_text_to_lines(text, font, max_width):
+    words = text.split()
+    lines = []
+    current = []
+    for w in words:
+        test = ' '.join(current + [w]) if current else w
+        w_pixels, _ = get_text_dimensions(test, font)
+        if w_pixels <= max_width:
+            current.append(w)
+        else:
+            if current:
+                lines.append(' '.join(current))
+            current = [w]
+    if current:
+        lines.append(' '.join(current))
+    # If only one line and it fits, return as a single line (no forced break)
+    if len(lines) > 1 and all(get_text_dimensions(line, font)[0] <= max_width for line in lines):
+        joined = ' '.join(lines)
+        if get_text_dimensions(joined, font)[0] <= max_width:
+            return [joined]
+    return lines
+
+def legacy_fit_sentence_font(text, font_path, base_size, max_width, max_height=None, min_size=12):
+    line_spacing = 10
+    size = base_size
+    while size >= min_size:
+        f = ImageFont.truetype(font_path, size)
+        lines = legacy_wrap_text_to_lines(text, f, max_width)
+        _, lh = get_text_dimensions("Ay", f)
+        total_h = len(lines) * (lh + line_spacing)
+        if all(get_text_dimensions(line, f)[0] <= max_width for line in lines) and (max_height is None or total_h <= max_height):
+            return f, lines, lh, total_h
+        size -= 2
+    f = ImageFont.truetype(font_path, min_size)
+    lines = legacy_wrap_text_to_lines(text, f, max_width)
+    _, lh = get_text_dimensions("Ay", f)
+    return f, lines, lh, len(lines) * (lh + line_spacing)
+
+
+def legacy_wrap_and_paginate_with_mapping(sentence_pairs, font_path, base_size, max_width, max_height):
+    pages = []
+    combined_top_sentences = []
+    combined_bottom = ""
+    combined_bottom_sentences = []
+
+    def top_text_for_measure(item):
+        # item may be a string or a tuple (chinese, pinyin)
+        if isinstance(item, tuple):
+            ch, py = item
+            return (ch + " " + py).strip()
+        return str(item)
+
+    # attempt to find a Chinese-capable font for measurements
+    chinese_font_path = story_render.get_working_chinese_font() or font_path
+
+    for top_sent, bottom_sent in sentence_pairs:
+        # try adding this top sentence to the current page candidate and compute height using combined text and pinyin if present
+        candidate_top_sentences = combined_top_sentences + [top_sent]
+        top_combined_candidate = " ".join(top_text_for_measure(s) for s in candidate_top_sentences).strip()
+        f_cand, lines_cand, lh_cand, total_h_cand = legacy_fit_sentence_font(top_combined_candidate, chinese_font_path if chinese_font_path else font_path, base_size, max_width)
+
+        # compute pinyin height for candidate if any tuple entries present
+        pinyin_text = " ".join([s[1] for s in candidate_top_sentences if isinstance(s, tuple) and s[1]])
+        pinyin_h = 0
+        if pinyin_text:
+            p_font = ImageFont.truetype(font_path, max(10, base_size//2))
+            p_lines = legacy_wrap_text_to_lines(pinyin_text, p_font, max_width)
+            _, p_lh = get_text_dimensions("Ay", p_font)
+            pinyin_h = len(p_lines) * (p_lh + 6)
+
+        cand_total_h = total_h_cand + pinyin_h
+
+        if combined_top_sentences and cand_total_h > max_height:
+            # push current page built from combined_top_sentences
+            top_combined_text = " ".join(top_text_for_measure(s) for s in combined_top_sentences).strip()
+            f_top, lines_top, lh_top, total_h_top = legacy_fit_sentence_font(top_combined_text, chinese_font_path if chinese_font_path else font_path, base_size, max_width)
+
+            # compute pinyin lines for the page
+            page_pinyin_text = " ".join([s[1] for s in combined_top_sentences if isinstance(s, tuple) and s[1]])
+            page_pinyin_lines = []
+            if page_pinyin_text:
+                p_font = ImageFont.truetype(font_path, max(10, base_size//2))
+                page_pinyin_lines = legacy_wrap_text_to_lines(page_pinyin_text, p_font, max_width)
+
+            pages.append({
+                'top_lines': lines_top,
+                'top_full_text': top_combined_text,
+                'bottom_full_text': combined_bottom,
+                'top_sentences': combined_top_sentences.copy(),
+                'bottom_sentences': combined_bottom_sentences.copy(),
+                'pinyin_lines': page_pinyin_lines
+            })
+            # start new page
+            combined_top_sentences = [top_sent]
+            combined_bottom = bottom_sent
+            combined_bottom_sentences = [bottom_sent]
+        else:
+            combined_top_sentences = candidate_top_sentences
+            combined_bottom = (combined_bottom + " " + bottom_sent).strip() if combined_bottom else bottom_sent
+            combined_bottom_sentences.append(bottom_sent)
+
+    if combined_top_sentences:
+        top_combined_text = " ".join(top_text_for_measure(s) for s in combined_top_sentences).strip()
+        f_top, lines_top, lh_top, total_h_top = legacy_fit_sentence_font(top_combined_text, chinese_font_path if chinese_font_path else font_path, base_size, max_width)
+        page_pinyin_text = " ".join([s[1] for s in combined_top_sentences if isinstance(s, tuple) and s[1]])
+        page_pinyin_lines = []
+        if page_pinyin_text:
+            p_font = ImageFont.truetype(font_path, max(10, base_size//2))
+            page_pinyin_lines = legacy_wrap_text_to_lines(page_pinyin_text, p_font, max_width)
+        pages.append({
+            'top_lines': lines_top,
+            'top_full_text': top_combined_text,
+            'bottom_full_text': combined_bottom,
+            'top_sentences': combined_top_sentences.copy(),
+            'bottom_sentences': combined_bottom_sentences.copy(),
+            'pinyin_lines': page_pinyin_lines
+        })
+    return pages
+
+
+def sample_pairs(here):
+    pairs = []
+    for fn in sorted(glob.glob(os.path.join(here, "input*", "*.txt"))):
+        pairs.append((os.path.basename(os.path.dirname(fn)) + "/" + os.path.basename(fn), story_render.parse_input_file(fn)))
+    return pairs
+
+
+def sample_texts(here):
+    texts = []
+    for fn in sorted(glob.glob(os.path.join(here, "input*", "*.txt"))):
+        for top, bottom in story_render.parse_input_file(fn):
+            texts.append(top if isinstance(top, str) else (top[0] + " " + top[1]).strip())
+            texts.append(bottom)
+    return [t for t in texts if t]
+
+
+def timed(fn, *args):
+    text_metrics.clear()
+    t0 = time.perf_counter()
+    res = fn(*args)
+    return time.perf_counter() - t0, res
+
+
+def main():
+    here = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--font", default="arial.ttf")
+    args = ap.parse_args()
+
+    texts = sample_texts(here)
+    paragraphs = [" ".join(texts[:n]) for n in (10, 50, 200)]
+    mismatches = 0
+    cases = 0
+    for text in texts + paragraphs:
+        for max_w in (300, 640):
+            for max_h in (None, 165):
+                a = legacy_fit_sentence_font(text, args.font, 32, max_w, max_h)
+                b = story_render.fit_sentence_font(text, args.font, 32, max_w, max_h)
+                cases += 1
+                if (a[0].size, a[1], a[2], a[3]) != (b[0].size, b[1], b[2], b[3]):
+                    mismatches += 1
+                    print(f"MISMATCH {text[:40]!r} w={max_w} h={max_h}: size {a[0].size} vs {b[0].size}, {len(a[1])} vs {len(b[1])} lines")
+    print(f"fit_sentence_font: {cases} cases, {mismatches} mismatches")
+
+    story = [p for _, pairs in sample_pairs(here) for p in pairs] * 5
+    page_cases = 0
+    for name, pairs in sample_pairs(here) + [("long story", story)]:
+        for max_w, max_h in ((640, 165), (400, 120), (640, 400)):
+            a = legacy_wrap_and_paginate_with_mapping(pairs, args.font, 32, max_w, max_h)
+            b = story_render.wrap_and_paginate_with_mapping(pairs, args.font, 32, max_w, max_h)
+            page_cases += 1
+            if a != b:
+                mismatches += 1
+                print(f"PAGINATION MISMATCH {name} w={max_w} h={max_h}: {len(a)} vs {len(b)} pages")
+    print(f"wrap_and_paginate_with_mapping: {page_cases} cases, {mismatches} mismatches total")
+
+    for text in paragraphs:
+        t_old, _ = timed(legacy_fit_sentence_font, text, args.font, 32, 640, 165)
+        t_new, _ = timed(story_render.fit_sentence_font, text, args.font, 32, 640, 165)
+        print(f"{len(text.split()):5d} words: step-down {t_old * 1000:8.1f} ms, binary search {t_new * 1000:7.1f} ms ({t_old / t_new:.1f}x)")
+    for max_h in (165, 400):
+        t_old, a = timed(legacy_wrap_and_paginate_with_mapping, story, args.font, 32, 640, max_h)
+        t_new, _ = timed(story_render.wrap_and_paginate_with_mapping, story, args.font, 32, 640, max_h)
+        print(f"paginate {len(story)} sentences into {len(a)} pages (box h={max_h}): "
+              f"full re-fit {t_old * 1000:8.1f} ms, incremental {t_new * 1000:7.1f} ms ({t_old / t_new:.1f}x)")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
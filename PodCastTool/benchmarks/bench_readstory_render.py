@@ -0,0 +1,283 @@
+"""
+Benchmark: layered page renderer in readStory vs the previous full-redraw renderer.
+
+The previous renderer rebuilt every frame from scratch (new numpy base, BGR->RGB,
+boxes, bottom-sentence font fitting, every glyph and pinyin token, RGB->BGR). The
+layered one draws the page layer once per page, redraws only the highlight and
+bottom-translation areas per sentence, and only the active glyph per word. Both are fed the same pages; frames are captured in memory (no encoding)
+so the numbers are pure rendering cost, and the outputs are compared pixel by pixel.
+
+Usage:
+  python benchmarks/bench_readstory_render.py --input input_Repeat_Reading/chinese.txt --font /path/to/font.ttf
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+import story_render
+from story_render import get_text_dimensions, fit_sentence_font
+
+
+FPS = 8
+
+
+class FrameCollector:
+    """Stands in for cv2.VideoWriter and FFmpegFrameEncoder: keeps distinct frames, counts writes."""
+
+    def __init__(self, *args, **kwargs):
+        self.frames = []
+        self.writes = 0
+        FrameCollector.last = self
+
+    def write(self, frame):
+        if not self.frames or self.frames[-1] is not frame:
+            self.frames.append(frame)
+        self.writes += 1
+
+    def add_frame(self, frame, duration):
+        self.write(frame)
+        self.writes += int(round(duration * FPS)) - 1
+
+    def release(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+# --- previous implementation, kept verbatim as the baseline ---
+def legacy_render_video_from_pages(temp_video, prepped_pages, page_frame_counts, width, height, fps, max_box_width, font_path, base_font_size):
+    out = cv2.VideoWriter(temp_video, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+
+    for page_index, page_info in enumerate(prepped_pages):
+        bottom_sentences = page_info['bottom_sentences']
+        top_sentence_draws = page_info['top_sentence_draws']
+        sent_word_counts = page_info['sent_word_counts']
+        pinyin_lines = page_info.get('pinyin_lines', [])
+
+        lines_render = []
+        # Build packed lines (same logic as before)
+        current_line = []
+        current_width = 0
+        global_idx = 0
+        char_pos = {i: 0 for i in range(len(top_sentence_draws))}
+        for s_idx, sdraw in enumerate(top_sentence_draws):
+            f_s = sdraw['font']
+            for s_line in sdraw['lines']:
+                if sdraw.get('is_chinese'):
+                    for ch in s_line:
+                        if ch.isspace():
+                            continue
+                        raw_w, raw_h = get_text_dimensions(ch, f_s)
+                        pad = max(4, int(sdraw.get('font_size', getattr(f_s, 'size', base_font_size)) * 0.12))
+                        ww = raw_w + pad
+                        try:
+                            temp_img = Image.new('L', (raw_w + 40, raw_h + 40), color=255)
+                            temp_draw = ImageDraw.Draw(temp_img)
+                            temp_draw.text((20, 0), ch, font=f_s, fill=0)
+                            bbox = temp_img.getbbox()
+                            if bbox:
+                                glyph_x0 = bbox[0] - 20
+                                glyph_w = bbox[2] - bbox[0]
+                            else:
+                                glyph_x0 = 0
+                                glyph_w = raw_w
+                        except Exception:
+                            glyph_x0 = 0
+                            glyph_w = raw_w
+
+                        p_token = None
+                        p_tokens = sdraw.get('pinyin_tokens', [])
+                        pos = char_pos.get(s_idx, 0)
+                        if re.match(r'[\u4e00-\u9fff]', ch):
+                            if pos < len(p_tokens):
+                                p_token = p_tokens[pos]
+                            char_pos[s_idx] = pos + 1
+
+                        item = {'word': ch, 'font': f_s, 'font_path': sdraw.get('font_path'), 'idx': global_idx, 'width': ww, 'raw_width': raw_w, 'pad': pad, 'glyph_x0': glyph_x0, 'glyph_width': glyph_w, 's_idx': s_idx, 'pinyin': p_token, 'font_size': sdraw.get('font_size', getattr(f_s, 'size', base_font_size))}
+                        if current_width == 0 or current_width + ww <= max_box_width:
+                            current_line.append(item)
+                            current_width += ww
+                        else:
+                            lines_render.append(current_line)
+                            current_line = [item]
+                            current_width = ww
+                        global_idx += 1
+                else:
+                    for w in s_line.split():
+                        ww = get_text_dimensions(w + " ", f_s)[0]
+                        if current_width == 0 or current_width + ww <= max_box_width:
+                            current_line.append({'word': w, 'font': f_s, 'idx': global_idx, 'width': ww, 's_idx': s_idx, 'font_size': getattr(f_s, 'size', base_font_size)})
+                            current_width += ww
+                        else:
+                            lines_render.append(current_line)
+                            current_line = [{'word': w, 'font': f_s, 'idx': global_idx, 'width': ww, 's_idx': s_idx, 'font_size': getattr(f_s, 'size', base_font_size)}]
+                            current_width = ww
+                        global_idx += 1
+        if current_line:
+            lines_render.append(current_line)
+
+        # render frames for this page
+        page_frames = page_frame_counts[page_index] if page_index < len(page_frame_counts) else []
+        for w_idx, frames_for_word in enumerate(page_frames):
+            # find active sentence index
+            cum = 0
+            sent_idx = 0
+            for i, cnt in enumerate(sent_word_counts):
+                if w_idx < cum + cnt:
+                    sent_idx = i
+                    break
+                cum += cnt
+            current_box_bottom_text = bottom_sentences[sent_idx] if sent_idx < len(bottom_sentences) else ""
+
+            base_frame = np.full((height, width, 3), (40, 40, 40), dtype=np.uint8)
+            cv2.rectangle(base_frame, (50, 50), (750, 245), (204, 255, 255), -1)
+            cv2.rectangle(base_frame, (50, 315), (750, 380), (204, 255, 255), -1)
+
+            img_pil = Image.fromarray(cv2.cvtColor(base_frame, cv2.COLOR_BGR2RGB))
+            draw = ImageDraw.Draw(img_pil)
+
+            if current_box_bottom_text:
+                f_b, b_lines, bh, _ = fit_sentence_font(current_box_bottom_text, font_path, base_font_size, max_box_width)
+                bw, bhw = get_text_dimensions(" ".join(b_lines), f_b)
+                yb = 347 - (len(b_lines)*(bh + 10))//2
+                for line in b_lines:
+                    lw, _ = get_text_dimensions(line, f_b)
+                    draw.text((400 - lw//2, yb), line, font=f_b, fill=(0, 0, 0))
+                    yb += bh + 10
+
+            start_word = sum(sent_word_counts[:sent_idx]) if sent_word_counts else 0
+            end_word = start_word + sent_word_counts[sent_idx] - 1 if sent_idx < len(sent_word_counts) else start_word
+
+            yt = 70
+            for line in lines_render:
+                line_h = max(get_text_dimensions("Ay", item['font'])[1] for item in line)
+                xt = 80
+
+                in_run = False
+                run_x1 = run_x2 = None
+                padding = 6
+                for item in line:
+                    if start_word <= item['idx'] <= end_word:
+                        if not in_run:
+                            in_run = True
+                            run_x1 = xt
+                            run_x2 = xt + item['width']
+                        else:
+                            run_x2 = xt + item['width']
+                    else:
+                        if in_run:
+                            draw.rectangle([run_x1 - padding, yt - 5, run_x2 + padding, yt + line_h + 5], fill=(173, 216, 230))
+                            in_run = False
+                    xt += item['width']
+                if in_run:
+                    draw.rectangle([run_x1 - padding, yt - 5, run_x2 + padding, yt + line_h + 5], fill=(173, 216, 230))
+
+                xt = 80
+                p_fs_line = None
+                p_y_line = None
+                if any(item.get('pinyin') for item in line):
+                    p_fs_size_line = max(max(10, int(item.get('font_size', base_font_size) * 0.45)) for item in line if item.get('pinyin'))
+                    try:
+                        p_fs_line = ImageFont.truetype('arial.ttf', p_fs_size_line)
+                    except Exception:
+                        try:
+                            p_fs_line = ImageFont.truetype(font_path, p_fs_size_line)
+                        except Exception:
+                            p_fs_line = ImageFont.truetype(font_path, max(10, base_font_size//2))
+                    _, p_h_line = get_text_dimensions("Ay", p_fs_line)
+                    p_y_line = yt - p_h_line - 4
+
+                for item in line:
+                    if 'raw_width' in item:
+                        char_x = xt + (item['width'] - item['raw_width']) / 2
+                    else:
+                        char_x = xt
+
+                    if item.get('pinyin') and p_fs_line:
+                        p_text = item['pinyin']
+                        p_w, p_h = get_text_dimensions(p_text, p_fs_line)
+                        g_x0 = item.get('glyph_x0', 0)
+                        g_w = item.get('glyph_width', item.get('raw_width', item['width']))
+                        p_x = char_x + g_x0 + (g_w - p_w) / 2
+                        draw.text((int(p_x), int(p_y_line)), p_text, font=p_fs_line, fill=(0, 0, 0))
+
+                    color = (255, 0, 0) if item['idx'] == w_idx else (0, 0, 0)
+                    draw.text((int(char_x), yt), item['word'], font=item['font'], fill=color)
+                    xt += item['width']
+
+                yt += line_h + 10
+
+            any_token_pinyin = any(any(item.get('pinyin') for item in l) for l in lines_render)
+            if not any_token_pinyin and pinyin_lines:
+                p_font = ImageFont.truetype(font_path, max(10, base_font_size//2))
+                for pline in pinyin_lines:
+                    lw, _ = get_text_dimensions(pline, p_font)
+                    draw.text((400 - lw//2, yt), pline, font=p_font, fill=(0, 0, 0))
+                    _, plh = get_text_dimensions("Ay", p_font)
+                    yt += plh + 6
+
+            final_frame = cv2.cvtColor(np.array(img_pil), cv2.COLOR_RGB2BGR)
+            for _ in range(frames_for_word):
+                out.write(final_frame)
+
+    out.release()
+
+
+def build_pages(txt_path, font_path, base_font_size=32, max_box_width=640):
+    pairs = story_render.parse_input_file(txt_path)
+    pages = story_render.wrap_and_paginate_with_mapping(pairs, font_path, base_font_size, max_box_width, 165)
+    prepped, frame_counts = [], []
+    for page in pages:
+        draws, counts = story_render.prepare_top_sentence_draws(page['top_sentences'], font_path, base_font_size, max_box_width)
+        prepped.append({'top_sentences': page['top_sentences'], 'bottom_sentences': page['bottom_sentences'],
+                        'pinyin_lines': page['pinyin_lines'], 'top_sentence_draws': draws, 'sent_word_counts': counts})
+        frame_counts.append([3] * sum(counts))
+    return prepped, frame_counts
+
+
+def run(render, prepped, frame_counts, font_path, base_font_size=32):
+    t0 = time.perf_counter()
+    render("bench.mp4", prepped, frame_counts, 800, 450, FPS, 640, font_path, base_font_size)
+    return time.perf_counter() - t0, FrameCollector.last
+
+
+def main():
+    here = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--input", default=os.path.join(here, "input_Repeat_Reading", "chinese.txt"))
+    ap.add_argument("--font", default="arial.ttf")
+    ap.add_argument("--repeat", type=int, default=1, help="repeat the input N times to simulate a long story")
+    args = ap.parse_args()
+
+    prepped, frame_counts = build_pages(args.input, args.font)
+    prepped, frame_counts = prepped * args.repeat, frame_counts * args.repeat
+    cv2.VideoWriter = FrameCollector
+    story_render.FFmpegFrameEncoder = FrameCollector
+
+    t_old, old = run(legacy_render_video_from_pages, prepped, frame_counts, args.font)
+    t_new, new = run(story_render.render_video_from_pages, prepped, frame_counts, args.font)
+    n = len(new.frames)
+    print(f"pages: {len(prepped)}, word frames: {n}, video frames written: {new.writes}")
+    print(f"full redraw : {t_old:7.2f}s  {len(old.frames) / t_old:8.1f} word-frames/s")
+    print(f"layered     : {t_new:7.2f}s  {n / t_new:8.1f} word-frames/s  ({t_old / t_new:.1f}x)")
+    if len(old.frames) == n:
+        diffs = [int(np.count_nonzero(np.any(a != b, axis=2))) for a, b in zip(old.frames, new.frames)]
+        print(f"pixels differing per frame: max {max(diffs)}, mean {sum(diffs) / max(1, n):.1f}")
+    else:
+        print(f"frame count mismatch: {len(old.frames)} vs {n}")
+
+
+if __name__ == "__main__":
+    main()
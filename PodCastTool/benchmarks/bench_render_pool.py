@@ -0,0 +1,97 @@
+"""
+Benchmark: frame rendering throughput of render_pool.RenderPool from 1 to N workers.
+
+Two workloads:
+- RepeatReadingRenderer.create_frame for every line of a lesson (method specs via snapshot_state)
+- story_render.render_sentence_frames for every sentence of a story (module-level function
+  specs, one sentence per task as render_video_from_pages submits them)
+
+Frames are consumed and dropped (no encoding), so the numbers are pure rendering +
+transfer cost. The generators render in-process unless PODCAST_RENDER_WORKERS is set;
+run this on the target machine to see whether N workers beat one before setting it.
+On a single core the pool only adds overhead (0.3x with 2 workers, 0.2x with 4).
+
+Usage:
+  python benchmarks/bench_render_pool.py --workers 1,2,4,8 --repeat 5 --font /path/to/font.ttf
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import story_render
+from repeat_reading_render import RepeatReadingRenderer
+from render_pool import RenderPool, snapshot_state
+
+
+def lesson_specs(here, repeat):
+    gen = RepeatReadingRenderer()
+    state = snapshot_state(gen)
+    specs = []
+    with open(os.path.join(here, "input_Repeat_Reading", "chinese.txt"), encoding="utf-8") as f:
+        for line in f:
+            data = gen.parse_line_chinese(line) if line.strip() else None
+            if data:
+                specs.append((data['hanzi'], data['english'], data.get('pinyin')))
+    with open(os.path.join(here, "input_Repeat_Reading", "spanish.txt"), encoding="utf-8") as f:
+        for line in f:
+            data = gen.parse_line(line) if line.strip() else None
+            if data and 'es_text' in data and 'en_text' in data:
+                specs.append((data['es_text'], data['en_text']))
+    return state, specs * repeat
+
+
+def story_specs(here, font, repeat):
+    pairs = story_render.parse_input_file(os.path.join(here, "input_Repeat_Reading", "chinese.txt")) * repeat
+    pages = story_render.wrap_and_paginate_with_mapping(pairs, font, 32, 640, 165)
+    specs = []
+    for page_index, page in enumerate(pages):
+        draws, counts = story_render.prepare_top_sentence_draws(page['top_sentences'], font, 32, 640)
+        info = {'top_sentences': page['top_sentences'], 'bottom_sentences': page['bottom_sentences'],
+                'pinyin_lines': page['pinyin_lines'], 'top_sentence_draws': draws, 'sent_word_counts': counts}
+        frames = [1] * sum(counts)
+        specs += [(page_index, info, frames, idx, 800, 450, 640, font, 32)
+                  for idx, _, _, _ in story_render.iter_sentences(info, frames)]
+    return specs
+
+
+def run(label, workers_list, make_iter, unit):
+    base = None
+    for workers in workers_list:
+        t0 = time.perf_counter()
+        n = make_iter(workers)
+        dt = time.perf_counter() - t0
+        base = base or dt
+        print(f"{label:14s} workers={workers:2d}: {dt:7.2f}s  {n / dt:8.1f} {unit}/s  speedup {base / dt:4.1f}x")
+
+
+def main():
+    here = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", default="1,2,4")
+    ap.add_argument("--repeat", type=int, default=3, help="repeat the sample inputs N times")
+    ap.add_argument("--chunksize", type=int, default=2)
+    ap.add_argument("--font", default="arial.ttf")
+    args = ap.parse_args()
+    workers_list = [int(w) for w in args.workers.split(",")]
+    print(f"cpu_count: {os.cpu_count()}")
+
+    state, lesson = lesson_specs(here, args.repeat)
+
+    def lesson_frames(workers):
+        with RenderPool(workers=workers, chunksize=args.chunksize, state=state) as pool:
+            return sum(1 for _ in pool.imap_method("create_frame", lesson))
+    run("repeatReading", workers_list, lesson_frames, "frames")
+
+    story = story_specs(here, args.font, args.repeat)
+
+    def story_frames(workers):
+        with RenderPool(workers=workers, chunksize=4) as pool:
+            return sum(len(sentence) for sentence in pool.imap(story_render.render_sentence_frames, story))
+    run("readStory", workers_list, story_frames, "frames")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Offline benchmark for the TTS synthesis stage (tts_pool.synthesize_all).
+
+Compares the old pattern (one asyncio.run per clip, sequential) against the pooled
+stage at several concurrency limits, using StubTTSBackend so no network is needed.
+
+Usage:
+  python benchmarks/bench_tts_pool.py --clips 300 --latency 0.25
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tts_pool import StubTTSBackend, TTSJob, synthesize_all
+
+
+def make_jobs(n, folder):
+    return [TTSJob(f"Sample sentence number {i} for the lesson.", "en-US-GuyNeural", "+0%",
+                   os.path.join(folder, f"clip_{i}.wav")) for i in range(n)]
+
+
+def run_sequential(jobs, backend):
+    for j in jobs:
+        asyncio.run(backend(j.text, j.voice, j.rate, j.filename))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--clips", type=int, default=300)
+    ap.add_argument("--latency", type=float, default=0.25)
+    ap.add_argument("--fail-rate", type=float, default=0.0)
+    ap.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8, 16])
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = StubTTSBackend(latency=args.latency)
+        t0 = time.perf_counter()
+        run_sequential(make_jobs(args.clips, tmp), backend)
+        base = time.perf_counter() - t0
+        print(f"sequential asyncio.run : {base:7.2f}s")
+
+        for c in args.concurrency:
+            backend = StubTTSBackend(latency=args.latency, fail_rate=args.fail_rate)
+            jobs = make_jobs(args.clips, tmp)
+            t0 = time.perf_counter()
+            synthesize_all(jobs, backend=backend, concurrency=c, backoff=0.05)
+            dt = time.perf_counter() - t0
+            print(f"pool concurrency={c:<3}   : {dt:7.2f}s  ({base / dt:5.1f}x, {backend.calls} backend calls)")
+
+
+if __name__ == "__main__":
+    main()
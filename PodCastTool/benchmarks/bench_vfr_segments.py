@@ -0,0 +1,89 @@
+"""
+Benchmark: still-slide segments encoded at a constant frame rate vs one frame per slide.
+
+repeatReading (fps=4) and makeConversationP2P (fps=10) encode every line as one
+unchanging frame held for the length of its audio. encode_still_segment() normally
+writes that frame duration * fps times; with vfr=True it writes it once, at a rate
+that makes the single frame last the same rounded duration.
+
+Random slides (a gray level plus a bar, 1280x720) with sine-tone audio of 2-9 s each
+are encoded both ways and joined with concat_segments(). The script prints encode and
+total time, the output size, and for the VFR output the largest gap between each
+decoded frame's timestamp and the start of its slide (the A/V sync check).
+
+Usage:
+  python benchmarks/bench_vfr_segments.py --slides 60 --fps 4
+  python benchmarks/bench_vfr_segments.py --slides 60 --fps 10 --mode draft
+"""
+import argparse
+import math
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from encoder_profiles import encoder_kwargs, get_profile
+from frame_encoder import concat_segments, encode_still_segment
+
+
+def make_slides(work, n, rng):
+    slides = []
+    for i in range(n):
+        seconds = float(rng.uniform(2, 9))
+        wav = os.path.join(work, f"line_{i}.wav")
+        subprocess.run(["ffmpeg", "-v", "error", "-y", "-f", "lavfi", "-i", f"sine=f={200 + 10 * i}:d={seconds:.3f}",
+                        "-ar", "24000", wav], check=True)
+        frame = np.full((720, 1280, 3), (37 * i) % 256, dtype=np.uint8)
+        frame[300:420, 100:100 + 40 * (i % 25)] = 255
+        slides.append((frame, seconds, wav))
+    return slides
+
+
+def frame_times(path):
+    err = subprocess.run(["ffmpeg", "-i", path, "-vf", "showinfo", "-fps_mode", "passthrough", "-f", "null", "-"],
+                         capture_output=True, text=True).stderr
+    return [float(t) for t in re.findall(r"pts_time:([\d.]+)", err)]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--slides", type=int, default=60)
+    ap.add_argument("--fps", type=int, default=4)
+    ap.add_argument("--mode", default="final", help="encoder_profiles mode")
+    args = ap.parse_args()
+
+    work = tempfile.mkdtemp(prefix="bench_vfr_")
+    slides = make_slides(work, args.slides, np.random.default_rng(0))
+    kwargs = encoder_kwargs(get_profile(args.mode), args.fps, 1280, 720)
+    print(f"{args.slides} slides, {sum(s for _, s, _ in slides):.0f} s of audio, fps={args.fps}, {args.mode}")
+
+    for vfr in (False, True):
+        name = "vfr" if vfr else "cfr"
+        t0 = time.perf_counter()
+        segments, durations = [], []
+        for i, (frame, seconds, wav) in enumerate(slides):
+            seg = os.path.join(work, f"{name}_{i}.mkv")
+            durations.append(encode_still_segment(frame, seconds, seg, args.fps, audio_path=wav, vfr=vfr, **kwargs))
+            segments.append(seg)
+        t_encode = time.perf_counter() - t0
+        out = concat_segments(segments, os.path.join(work, f"{name}.mp4"))
+        t_total = time.perf_counter() - t0
+        line = (f"{name}: encode {t_encode:6.2f}s  total {t_total:6.2f}s  "
+                f"size {os.path.getsize(out) / 1024:7.0f} KiB")
+        if vfr:
+            starts = np.concatenate([[0.0], np.cumsum(durations)[:-1]])
+            times = frame_times(out)
+            drift = max(abs(a - b) for a, b in zip(times, starts)) if len(times) == len(starts) else math.inf
+            line += f"  frames {len(times)}  max offset {drift * 1000:.1f} ms"
+        print(line)
+    print(f"outputs in {work}")
+
+
+if __name__ == "__main__":
+    main()
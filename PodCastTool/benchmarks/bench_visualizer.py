@@ -0,0 +1,108 @@
+"""
+Benchmark: test.py's animated bar visualizer, per-frame PIL version vs visualizer.py.
+
+The legacy make_frame (kept below as it was in test.py) recomputes rfftfreq, the band
+edges and one boolean mask per band for every frame, then draws the bars one by one
+on a fresh PIL image. The vectorized path computes every frame's bar heights in one
+batched STFT (bar_levels) and gathers the RGB frames from the few distinct rows a frame
+has (bar_frames), either one frame per call like test.py's make_frame or in batches.
+
+Frames are generated and dropped (no encoding), like a writer consuming them. Prints
+frames per second and how many pixels of every 10th frame differ from the legacy one.
+
+Usage:
+  python benchmarks/bench_visualizer.py --seconds 20 --width 1280 --height 360
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from visualizer import bar_frames, bar_levels, gradient_colors, iter_bar_frames
+
+
+def make_audio(duration, sr=44100):
+    t = np.linspace(0, duration, int(sr * duration), endpoint=False)
+    audio = 0.6 * np.sin(2 * np.pi * 220 * t) + 0.3 * np.sin(2 * np.pi * 440 * t)
+    audio += 0.1 * np.sin(2 * np.pi * 880 * t) * np.sin(2 * np.pi * 0.25 * t)
+    audio += 0.05 * np.random.default_rng(0).standard_normal(len(t))
+    audio *= (0.6 + 0.4 * np.sin(2 * np.pi * 0.5 * t))
+    return (audio / np.max(np.abs(audio))).astype(np.float32), sr
+
+
+def legacy_make_frame(audio, sr, t, width, height, n_bars, colors):
+    center = int(t * sr)
+    win = 2048
+    start = max(0, center - win // 2)
+    segment = audio[start:start + win]
+    if len(segment) < 2:
+        segment = np.pad(segment, (0, max(0, 2 - len(segment))))
+    fft = np.abs(np.fft.rfft(segment * np.hanning(len(segment))))
+    freqs = np.fft.rfftfreq(len(segment), d=1.0 / sr)
+    mags = np.zeros(n_bars)
+    band_edges = np.linspace(0, sr / 2, n_bars + 1)
+    for i in range(n_bars):
+        mask = (freqs >= band_edges[i]) & (freqs < band_edges[i + 1])
+        if np.any(mask):
+            mags[i] = fft[mask].mean()
+    mags = (mags / (np.max(mags) + 1e-9)) ** 0.8
+    img = Image.new("RGB", (width, height), (12, 12, 12))
+    draw = ImageDraw.Draw(img)
+    bar_w = int(width / n_bars)
+    for i, mag in enumerate(mags):
+        x0 = i * bar_w + 1
+        h = int(mag * (height * 0.95))
+        draw.rectangle([x0, height // 2 - h // 2, x0 + bar_w - 2, height // 2 + h // 2], fill=tuple(colors[i]))
+    return np.asarray(img)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--seconds", type=float, default=20)
+    ap.add_argument("--fps", type=int, default=30)
+    ap.add_argument("--width", type=int, default=1280)
+    ap.add_argument("--height", type=int, default=360)
+    ap.add_argument("--bars", type=int, default=48)
+    args = ap.parse_args()
+
+    audio, sr = make_audio(args.seconds)
+    n_frames = int(args.seconds * args.fps)
+    colors = gradient_colors(args.bars)
+    print(f"{n_frames} frames {args.width}x{args.height}, {args.bars} bars")
+
+    legacy = {}
+    t0 = time.perf_counter()
+    for i in range(n_frames):
+        frame = legacy_make_frame(audio, sr, i / args.fps, args.width, args.height, args.bars, colors)
+        if i % 10 == 0:
+            legacy[i] = frame
+    base = n_frames / (time.perf_counter() - t0)
+    print(f"legacy make_frame   : {base:8.1f} fps")
+
+    t0 = time.perf_counter()
+    levels = bar_levels(audio, sr, args.fps, args.bars)
+    buf = np.empty((1, args.height, args.width, 3), dtype=np.uint8)
+    sampled = {}
+    for i in range(n_frames):
+        frame = bar_frames(levels[i:i + 1], args.width, args.height, colors, out=buf)[0]
+        if i % 10 == 0:
+            sampled[i] = frame.copy()
+    rate = n_frames / (time.perf_counter() - t0)
+    print(f"per-frame bar_frames: {rate:8.1f} fps  speedup {rate / base:5.1f}x")
+
+    t0 = time.perf_counter()
+    count = sum(len(batch) for batch in iter_bar_frames(audio, sr, args.fps, args.width, args.height, args.bars))
+    rate = count / (time.perf_counter() - t0)
+    print(f"batched             : {rate:8.1f} fps  speedup {rate / base:5.1f}x")
+
+    diff = np.mean([np.any(sampled[i] != legacy[i], axis=-1).mean() for i in legacy])
+    print(f"pixels differing from legacy: {100 * diff:.3f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark: waveform drawn by ffmpeg every frame vs a visualizer.py track built once.
+
+Renders the podcast graph (background + waveform overlay, 1920x1080, fps=12) for a
+synthetic track twice per style: once with the WAVE_MODES filter (showwaves /
+showvolume on the audio input), once with build_visualizer_track() + overlay. The
+precomputed time includes building the track. Logo and subtitles are left out so
+only the visualizer differs.
+
+Usage:
+  python benchmarks/bench_visualizer_track.py --minutes 5
+  python benchmarks/bench_visualizer_track.py --minutes 2 --wave-fps 6
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from podcast_render import WAVE_MODES, WAVE_SIZE, WAVE_STYLES
+from visualizer import build_visualizer_track, overlay_filter
+
+BENCH_MODES = ["Dạng vạch (Line)", "Dạng cột đặc (P2P)", "Dạng thanh âm lượng (Bars)"]
+
+
+def make_audio(path, seconds):
+    subprocess.run(["ffmpeg", "-v", "error", "-y", "-f", "lavfi", "-i", f"sine=f=220:d={seconds}",
+                    "-f", "lavfi", "-i", f"anoisesrc=d={seconds}:a=0.1", "-filter_complex", "amix=inputs=2",
+                    "-c:a", "libmp3lame", "-b:a", "128k", path], check=True)
+
+
+def render(audio, out, seconds, wave_src, extra_inputs=()):
+    graph = (f"[0:v]scale=1920:1080,format=yuv420p,fps=12[bg];{wave_src};"
+             f"[bg][wave]overlay=(W-w)/2:600[v]")
+    subprocess.run(["ffmpeg", "-v", "error", "-y", "-f", "lavfi", "-i", "color=c=navy:s=1920x1080",
+                    "-i", audio, *extra_inputs, "-filter_complex", graph, "-map", "[v]", "-map", "1:a",
+                    "-c:v", "libx264", "-preset", "ultrafast", "-t", str(seconds), out], check=True)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--minutes", type=float, default=5)
+    ap.add_argument("--wave-fps", type=float, default=12)
+    args = ap.parse_args()
+
+    seconds = args.minutes * 60
+    work = tempfile.mkdtemp(prefix="bench_vis_")
+    audio = os.path.join(work, "podcast.mp3")
+    make_audio(audio, seconds)
+    print(f"{args.minutes:g} min audio, output 1920x1080 @ 12 fps, visualizer track @ {args.wave_fps:g} fps")
+
+    for key in BENCH_MODES:
+        t0 = time.perf_counter()
+        try:
+            render(audio, os.path.join(work, "ffmpeg.mp4"), seconds, f"[1:a]{WAVE_MODES[key]}[wave]")
+            t_ffmpeg = time.perf_counter() - t0
+        except subprocess.CalledProcessError:
+            t_ffmpeg = None  # e.g. showvolume rejects c=white in recent ffmpeg builds
+
+        t0 = time.perf_counter()
+        track = build_visualizer_track(audio, os.path.join(work, "wave.mkv"), WAVE_STYLES[key],
+                                       *WAVE_SIZE, fps=args.wave_fps)
+        t_track = time.perf_counter() - t0
+        render(audio, os.path.join(work, "track.mp4"), seconds, overlay_filter("[2:v]", "[wave]"), ["-i", track])
+        t_total = time.perf_counter() - t0
+        ffmpeg_col = f"{t_ffmpeg:7.1f}s" if t_ffmpeg else " failed"
+        speedup = f"speedup {t_ffmpeg / t_total:4.2f}x" if t_ffmpeg else ""
+        print(f"{WAVE_STYLES[key]:8s}: ffmpeg filter {ffmpeg_col} | precomputed {t_total:7.1f}s "
+              f"(track {t_track:5.1f}s)  {speedup}")
+    print(f"outputs in {work}")
+
+
+if __name__ == "__main__":
+    main()
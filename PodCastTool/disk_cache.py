@@ -0,0 +1,135 @@
+"""
+Size-bounded, content-addressed folder of files: the store under tts_cache, segment_cache
+and PodCastMp3ToMp4WithSub/transcript_cache (least recently used files are evicted first).
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+
+def hash_key(parts, **dump_kwargs):
+    """SHA-256 of a JSON-able list of values."""
+    raw = json.dumps(parts, ensure_ascii=False, **dump_kwargs)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def atomic_write_bytes(path, data):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp_")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except Exception:
+        try: os.remove(tmp)
+        except OSError: pass
+        raise
+
+
+def atomic_copy(src, dst):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(dst)), prefix=".tmp_")
+    os.close(fd)
+    try:
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, dst)
+    except Exception:
+        try: os.remove(tmp)
+        except OSError: pass
+        raise
+
+
+class DiskCache:
+    """Cache folder with a size limit and hit counters.
+
+    Subclasses set `ext` (the files that count towards the size and get evicted), `env`
+    (folder from $env, size in MB from $env_MB), `default_dir`, `default_mb` and `counters`."""
+    ext = ""
+    env = ""
+    default_dir = ""
+    default_mb = 1024
+    counters = ("hits", "misses")
+
+    def __init__(self, cache_dir=None, max_bytes=None):
+        self.cache_dir = cache_dir or os.environ.get(self.env) or self.default_dir
+        if max_bytes is None:
+            max_bytes = int(float(os.environ.get(self.env + "_MB", self.default_mb)) * 1024 * 1024)
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._total_bytes = None  # computed lazily by the first added()
+        self.reset_stats()
+
+    def path(self, key, folder=None):
+        return os.path.join(self.cache_dir, folder or key[:2], key + self.ext)
+
+    @staticmethod
+    def touch(path):
+        """Mark a file as recently used; False when it is gone."""
+        try:
+            os.utime(path, None)
+            return True
+        except OSError:
+            return False
+
+    def count(self, name):
+        """Add one to one of `counters`."""
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def reset_stats(self):
+        with self._lock:
+            for name in self.counters:
+                setattr(self, name, 0)
+
+    def _entries(self):
+        for sub in os.listdir(self.cache_dir):
+            folder = os.path.join(self.cache_dir, sub)
+            if not os.path.isdir(folder):
+                continue
+            for name in os.listdir(folder):
+                if name.endswith(self.ext) and not name.startswith(".tmp_"):
+                    p = os.path.join(folder, name)
+                    try:
+                        st = os.stat(p)
+                    except OSError:
+                        continue
+                    yield st.st_mtime, st.st_size, p
+
+    def added(self, path, replaced=0, keep=()):
+        """Count a file just written to `path` (`replaced` = size of the one it overwrote)
+        and evict if the cache is now over its limit."""
+        if self._total_bytes is None:
+            self._total_bytes = sum(size for _, size, _ in self._entries())
+        else:
+            self._total_bytes += os.path.getsize(path) - replaced
+        if self._total_bytes > self.max_bytes:
+            self.evict(keep)
+
+    def remove(self, path):
+        try: os.remove(path)
+        except OSError: pass
+
+    def evict(self, keep=()):
+        """Remove least recently used files until the cache fits in max_bytes."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, p in entries:
+            if total <= self.max_bytes:
+                break
+            if p in keep:
+                continue
+            self.remove(p)
+            total -= size
+        self._total_bytes = total
+
+
+_defaults = {}
+
+
+def default_cache(cls):
+    """The process-wide instance of a DiskCache subclass (made on first use)."""
+    if cls not in _defaults:
+        _defaults[cls] = cls()
+    return _defaults[cls]
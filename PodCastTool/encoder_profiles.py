@@ -0,0 +1,79 @@
+"""
+Shared encode settings for every generator, in two modes.
+
+- "draft": half resolution, at most 6 fps, x264 ultrafast at a high CRF. Meant for
+  checking timing and layout; a preview renders in a fraction of the time.
+- "final": full resolution, x264 veryfast at CRF 21 with -tune stillimage (the
+  videos are slides, still backgrounds and text) and a keyframe every 10 seconds
+  instead of x264's 250 frames, so seeking stays quick at the low frame rates used here.
+
+Generators take a `render_mode` setting ("draft", "final", or empty for the default);
+the default is PODCAST_RENDER_MODE from the environment, else "final".
+
+    profile = get_profile("draft")
+    fps = output_fps(profile, 25)               # 6
+    cmd += video_args(profile, fps)             # -c:v libx264 -preset ultrafast ...
+    vf = scale_filter(profile, 1280, 720)       # "scale=640:360"
+
+Slide generators keep their own frame rate in draft mode (it is already low, and a
+lower one would round every line's length differently); only resolution and the
+encoder settings change there.
+"""
+import os
+
+MODES = ("draft", "final")
+DEFAULT_MODE = "final"
+
+PROFILES = {
+    "draft": {"scale": 0.5, "max_fps": 6, "preset": "ultrafast", "crf": 30, "tune": None, "keyint_seconds": None},
+    "final": {"scale": 1.0, "max_fps": None, "preset": "veryfast", "crf": 21, "tune": "stillimage", "keyint_seconds": 10},
+}
+
+
+def get_profile(mode=None):
+    """Settings dict of `mode`; None/"" picks PODCAST_RENDER_MODE or DEFAULT_MODE."""
+    name = (mode or os.environ.get("PODCAST_RENDER_MODE") or DEFAULT_MODE).strip().lower()
+    if name not in PROFILES:
+        raise ValueError(f"unknown render mode {name!r} (expected one of {', '.join(MODES)})")
+    return dict(PROFILES[name], name=name)
+
+
+def output_fps(profile, fps):
+    """`fps` capped to the profile's max_fps."""
+    if profile["max_fps"] and fps > profile["max_fps"]:
+        return profile["max_fps"]
+    return fps
+
+
+def output_size(profile, width, height):
+    """(width, height) scaled by the profile, rounded down to even numbers for yuv420p."""
+    return (max(2, int(width * profile["scale"]) // 2 * 2), max(2, int(height * profile["scale"]) // 2 * 2))
+
+
+def scale_filter(profile, width, height):
+    """A scale filter bringing width x height to the profile's size, or None at full size."""
+    w, h = output_size(profile, width, height)
+    if (w, h) == (width, height):
+        return None
+    return f"scale={w}:{h}"
+
+
+def video_args(profile, fps):
+    """ffmpeg output options for the video stream (codec, preset, CRF, tune, keyframes)."""
+    args = ["-c:v", "libx264", "-preset", profile["preset"], "-crf", str(profile["crf"])]
+    if profile["tune"]:
+        args += ["-tune", profile["tune"]]
+    if profile["keyint_seconds"]:
+        args += ["-g", str(max(1, int(round(fps * profile["keyint_seconds"]))))]
+    return args + ["-pix_fmt", "yuv420p"]
+
+
+def encoder_kwargs(profile, fps, width, height):
+    """Keyword arguments for frame_encoder.FFmpegFrameEncoder / encode_still_segment."""
+    extra = ["-g", str(max(1, int(round(fps * profile["keyint_seconds"]))))] if profile["keyint_seconds"] else []
+    if profile["tune"]:
+        extra += ["-tune", profile["tune"]]
+    vf = scale_filter(profile, width, height)
+    if vf:
+        extra += ["-vf", vf]
+    return {"codec": "libx264", "preset": profile["preset"], "crf": profile["crf"], "extra_args": extra}
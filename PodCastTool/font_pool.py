@@ -0,0 +1,82 @@
+"""
+Process-wide pool of PIL fonts.
+
+The generators used to call ImageFont.truetype() inside their per-frame / per-size
+loops (and walk a try/except fallback chain each time), so parsing font files
+showed up high in profiles of long renders. Fonts here are loaded once per
+(path, size, index), and a fallback chain is resolved to a working path once;
+later sizes from the same chain go straight to that file.
+"""
+import threading
+
+from PIL import ImageFont
+
+_fonts = {}         # (path, size, index) -> FreeTypeFont
+_failed = set()     # (path, index) that could not be opened
+_chains = {}        # (candidates, index) -> first path that opened, or None
+_default = None
+_lock = threading.Lock()
+
+
+def get_font(path, size, index=0):
+    """ImageFont.truetype(path, size, index), loaded once. Raises OSError like truetype does."""
+    key = (path, int(size), index)
+    font = _fonts.get(key)
+    if font is not None:
+        return font
+    if (path, index) in _failed:
+        raise OSError(f"cannot open font {path!r}")
+    with _lock:
+        font = _fonts.get(key)
+        if font is None:
+            try:
+                font = ImageFont.truetype(path, int(size), index=index)
+            except OSError:
+                _failed.add((path, index))
+                raise
+            _fonts[key] = font
+    return font
+
+
+def default_font():
+    global _default
+    if _default is None:
+        _default = ImageFont.load_default()
+    return _default
+
+
+def resolve_chain(candidates, index=0):
+    """First path in `candidates` that opens as a font, or None. Resolved once per chain."""
+    key = (tuple(candidates), index)
+    if key in _chains:
+        return _chains[key]
+    found = None
+    for p in candidates:
+        if not p:
+            continue
+        try:
+            # any size works to check that the file opens; keep it, it's often reused
+            get_font(p, 12, index)
+            found = p
+            break
+        except Exception:
+            continue
+    _chains[key] = found
+    return found
+
+
+def get_font_chain(candidates, size, index=0, fallback_default=True):
+    """Font at `size` from the first loadable path in `candidates`.
+
+    Falls back to PIL's built-in bitmap font when none load (or raises OSError if
+    fallback_default is False)."""
+    path = resolve_chain(candidates, index)
+    if path is not None:
+        return get_font(path, size, index)
+    if fallback_default:
+        return default_font()
+    raise OSError(f"none of the fonts could be opened: {list(candidates)}")
+
+
+def pool_info():
+    return {"fonts": len(_fonts), "failed": len(_failed), "chains": len(_chains)}
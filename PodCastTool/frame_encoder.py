@@ -0,0 +1,188 @@
+"""
+Stream video frames straight into one ffmpeg process.
+
+The generators used to write one temp AVI per line (the same frame written
+hundreds of times through cv2.VideoWriter), reopen every AVI with moviepy and
+encode everything a second time. FFmpegFrameEncoder instead keeps a single
+ffmpeg running with a rawvideo stdin pipe: each distinct frame is handed over
+once together with how long it stays on screen, and the audio track (if given)
+is muxed in the same pass.
+
+    with FFmpegFrameEncoder("out.mp4", 1280, 720, fps=4, audio_path="track.wav") as enc:
+        for frame, seconds in slides:
+            enc.add_frame(frame, seconds)
+
+For long inputs that should not be held in memory at all, encode_still_segment()
+writes each slide to its own small segment file as soon as it is made, and
+concat_segments() joins them at the end with a stream copy of the video. With
+vfr=True a segment holds a single frame lasting the whole slide, so encoding cost
+follows the number of slides instead of the number of seconds.
+"""
+import math
+from fractions import Fraction
+import os
+import shutil
+import subprocess
+import tempfile
+
+import numpy as np
+
+
+def find_ffmpeg():
+    """ffmpeg on PATH, else the binary bundled with imageio-ffmpeg (installed with moviepy)."""
+    exe = shutil.which("ffmpeg")
+    if exe:
+        return exe
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return "ffmpeg"
+
+
+class FFmpegFrameEncoder:
+    """Encode BGR (OpenCV) or RGB frames to `output_path` through an ffmpeg stdin pipe.
+
+    add_frame(frame, duration) repeats the frame for `duration` seconds. Frame counts are
+    derived from the running end time, so rounding never accumulates into A/V drift.
+    """
+
+    def __init__(self, output_path, width, height, fps, audio_path=None, pix_fmt="bgr24",
+                 codec="libx264", preset="medium", crf=23, audio_codec="aac", extra_args=None,
+                 audio_start=None, audio_duration=None, pad_audio_to=None):
+        self.output_path = output_path
+        self.width = int(width)
+        self.height = int(height)
+        self.fps = fps
+        self.frames_written = 0
+        self.seconds = 0.0
+
+        cmd = [find_ffmpeg(), "-y", "-loglevel", "error",
+               "-f", "rawvideo", "-pix_fmt", pix_fmt, "-s", f"{self.width}x{self.height}", "-r", str(fps), "-i", "-"]
+        if audio_path:
+            # optional window into a longer audio file (e.g. one SRT cue of a full recording)
+            if audio_start:
+                cmd += ["-ss", f"{audio_start:.3f}"]
+            if audio_duration is not None:
+                cmd += ["-t", f"{audio_duration:.3f}"]
+            cmd += ["-i", audio_path, "-map", "0:v:0", "-map", "1:a:0", "-c:a", audio_codec]
+            if pad_audio_to is not None:
+                # fill with silence up to the end of the video so segments stay in sync when
+                # joined (an explicit -t: -shortest overshoots with apad behind libx264's lookahead)
+                cmd += ["-af", "apad", "-t", f"{pad_audio_to:.6f}"]
+        cmd += ["-c:v", codec, "-preset", preset, "-crf", str(crf), "-pix_fmt", "yuv420p"]
+        cmd += list(extra_args or [])
+        cmd += [output_path]
+        # -loglevel error keeps stderr small enough that the pipe never fills up
+        self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def add_frame(self, frame, duration):
+        """Show `frame` (H x W x 3 uint8) for `duration` seconds; returns the frames written."""
+        if frame.shape[:2] != (self.height, self.width):
+            raise ValueError(f"frame is {frame.shape[1]}x{frame.shape[0]}, encoder expects {self.width}x{self.height}")
+        self.seconds += max(0.0, duration)
+        n = int(round(self.seconds * self.fps)) - self.frames_written
+        if n <= 0:
+            return 0
+        data = np.ascontiguousarray(frame, dtype=np.uint8).tobytes()
+        try:
+            for _ in range(n):
+                self.proc.stdin.write(data)
+        except (BrokenPipeError, OSError):
+            self._fail()
+        self.frames_written += n
+        return n
+
+    def _fail(self):
+        err = b""
+        try:
+            self.proc.stdin.close()
+        except Exception:
+            pass
+        try:
+            err = self.proc.stderr.read()
+            self.proc.wait()
+        except Exception:
+            pass
+        raise RuntimeError(f"ffmpeg encoder failed for {self.output_path}: {err.decode('utf-8', 'replace').strip()[-800:]}")
+
+    def close(self):
+        if self.proc.stdin and not self.proc.stdin.closed:
+            try:
+                self.proc.stdin.close()
+            except (BrokenPipeError, OSError):
+                pass
+        err = self.proc.stderr.read()
+        if self.proc.wait() != 0:
+            raise RuntimeError(f"ffmpeg encoder failed for {self.output_path}: {err.decode('utf-8', 'replace').strip()[-800:]}")
+        return self.output_path
+
+    def abort(self):
+        """Kill the encoder and drop the partial output (used when rendering fails midway)."""
+        try:
+            self.proc.kill()
+            self.proc.wait()
+        except Exception:
+            pass
+        try:
+            os.remove(self.output_path)
+        except OSError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+def encode_still_segment(frame, duration, output_path, fps, audio_path=None, audio_start=None,
+                         audio_duration=None, pix_fmt="bgr24", vfr=False, **encoder_args):
+    """Encode one still frame + its audio as a self-contained segment file.
+
+    The shown duration is rounded up to whole frames and the audio is padded with
+    silence to match, so joined segments never drift. Audio is kept as PCM (use a .mkv
+    output) so concat_segments() can join it without AAC priming gaps. Returns the
+    segment's duration in seconds.
+
+    vfr=True encodes the frame once, at a rate of fps / n_frames, so that one frame
+    spans the same rounded duration; the joined video is then variable frame rate with
+    a frame at each slide change. B-frames are turned off there: with a different frame
+    length per segment, their decode delay would make timestamps overlap after concat."""
+    height, width = frame.shape[:2]
+    n_frames = max(1, int(math.ceil(round(duration * fps, 6))))
+    seconds = n_frames / fps
+    encoder_args.setdefault("audio_codec", "pcm_s16le")
+    if vfr:
+        fps = Fraction(fps) / n_frames
+        encoder_args["extra_args"] = list(encoder_args.get("extra_args") or []) + ["-bf", "0"]
+    with FFmpegFrameEncoder(output_path, width, height, fps, audio_path=audio_path, pix_fmt=pix_fmt,
+                            audio_start=audio_start, audio_duration=audio_duration,
+                            pad_audio_to=seconds if audio_path else None, **encoder_args) as enc:
+        enc.add_frame(frame, seconds)
+    return seconds
+
+
+def concat_segments(segment_paths, output_path, audio_codec="aac", audio_bitrate="128k"):
+    """Join segments made by encode_still_segment(): video is stream-copied, the PCM audio
+    is encoded once for the whole file."""
+    fd, list_path = tempfile.mkstemp(suffix=".txt", prefix="concat_")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            for p in segment_paths:
+                # concat demuxer quoting: single quotes, with ' escaped as '\''
+                f.write("file '" + os.path.abspath(p).replace("'", "'\\''") + "'\n")
+        result = subprocess.run(
+            [find_ffmpeg(), "-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", list_path,
+             "-c:v", "copy", "-c:a", audio_codec, "-b:a", audio_bitrate, "-movflags", "+faststart", output_path],
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg concat failed for {output_path}: {result.stderr.decode('utf-8', 'replace').strip()[-800:]}")
+    finally:
+        try: os.remove(list_path)
+        except OSError: pass
+    return output_path
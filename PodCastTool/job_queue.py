@@ -0,0 +1,419 @@
+"""
+SQLite-backed render queue for overnight batches.
+
+Jobs are the same (generator, input file, settings) units batch_render.py runs,
+but they are stored in a small SQLite database so any number of worker
+processes (started with `work`, from one or several terminals) can pull them,
+and a crashed or killed worker doesn't lose the batch.
+
+    python job_queue.py add repeat "lessons/*.txt" --settings repeat.json --output-dir out
+    python job_queue.py work --workers 3 --tts-budget 6
+    python job_queue.py status
+    python job_queue.py retry            # failed jobs back to pending
+
+- Each job goes pending -> synthesizing -> rendering -> muxing -> done (or failed);
+  the stages are reported by the render cores themselves.
+- A running job is kept alive by a heartbeat from its worker. A job whose heartbeat
+  is older than STALE_SECONDS (the worker crashed, was killed, the machine rebooted)
+  goes back to pending and is picked up again, up to MAX_ATTEMPTS times. The TTS
+  and segment caches make the retry skip the lines that were already done.
+- Job updates only apply while the job is still claimed by the worker making them;
+  a worker that was only slow (not dead) and finds its job taken over drops it.
+- --tts-budget caps the Edge TTS requests in flight across all workers together
+  (TTSBudget, see tts_pool.set_shared_budget), on top of each render's own limit.
+
+The database defaults to ~/.cache/podcasttool/jobs.sqlite (PODCAST_JOB_DB or --db).
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from batch_render import GENERATORS, collect_inputs, load_settings, output_for, render_one
+from encoder_profiles import MODES
+from tts_pool import DEFAULT_CONCURRENCY, set_shared_budget
+
+DEFAULT_DB = os.path.join(os.path.expanduser("~"), ".cache", "podcasttool", "jobs.sqlite")
+STATES = ("pending", "synthesizing", "rendering", "muxing", "done", "failed")
+ACTIVE_STATES = ("synthesizing", "rendering", "muxing")
+HEARTBEAT_SECONDS = 5
+STALE_SECONDS = 60
+MAX_ATTEMPTS = 3
+POLL_SECONDS = 2
+# a TTS slot older than this belongs to a worker that died mid-request
+SLOT_LEASE_SECONDS = 120
+SLOT_POLL_SECONDS = 0.2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    generator TEXT NOT NULL,
+    input_path TEXT NOT NULL,
+    output_path TEXT NOT NULL,
+    settings TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created REAL NOT NULL,
+    started REAL,
+    heartbeat REAL,
+    finished REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, id);
+CREATE TABLE IF NOT EXISTS tts_slots (
+    slot INTEGER PRIMARY KEY,
+    owner TEXT NOT NULL,
+    acquired REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def default_db_path():
+    return os.environ.get("PODCAST_JOB_DB") or DEFAULT_DB
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class JobQueue:
+    def __init__(self, path=None):
+        self.path = path or default_db_path()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # autocommit mode; writes go through _tx() so they take the write lock up front
+        self._db = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+
+    @contextmanager
+    def _tx(self):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def _query(self, sql, args=()):
+        with self._lock:
+            return [dict(r) for r in self._db.execute(sql, args)]
+
+    def close(self):
+        self._db.close()
+
+    def get_meta(self, key, default=None):
+        rows = self._query("SELECT value FROM meta WHERE key = ?", (key,))
+        return rows[0]["value"] if rows else default
+
+    def set_meta(self, key, value):
+        with self._tx() as db:
+            db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def add(self, generator, input_path, output_path, settings=None):
+        with self._tx() as db:
+            cur = db.execute(
+                "INSERT INTO jobs (generator, input_path, output_path, settings, created) VALUES (?, ?, ?, ?, ?)",
+                (generator, os.path.abspath(input_path), os.path.abspath(output_path),
+                 json.dumps(settings or {}, ensure_ascii=False), time.time()))
+            return cur.lastrowid
+
+    def requeue_stale(self):
+        """Jobs whose worker stopped sending heartbeats go back to pending (or fail after MAX_ATTEMPTS)."""
+        cutoff = time.time() - STALE_SECONDS
+        marks = ",".join("?" * len(ACTIVE_STATES))
+        with self._tx() as db:
+            db.execute(f"UPDATE jobs SET state = 'failed', error = 'worker lost (' || worker || ')', finished = ? "
+                       f"WHERE state IN ({marks}) AND heartbeat < ? AND attempts >= ?",
+                       (time.time(),) + ACTIVE_STATES + (cutoff, MAX_ATTEMPTS))
+            cur = db.execute(f"UPDATE jobs SET state = 'pending', worker = NULL "
+                             f"WHERE state IN ({marks}) AND heartbeat < ?", ACTIVE_STATES + (cutoff,))
+            return cur.rowcount
+
+    def claim(self, worker):
+        """Take the oldest pending job for `worker`; returns the job dict or None."""
+        self.requeue_stale()
+        now = time.time()
+        with self._tx() as db:
+            row = db.execute("SELECT * FROM jobs WHERE state = 'pending' ORDER BY id LIMIT 1").fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE jobs SET state = 'synthesizing', worker = ?, attempts = attempts + 1, "
+                       "error = NULL, started = ?, heartbeat = ?, finished = NULL WHERE id = ?",
+                       (worker, now, now, row["id"]))
+        job = dict(row)
+        job["settings"] = json.loads(job["settings"])
+        return job
+
+    # set_state/heartbeat/finish/fail only touch the job while `worker` still holds it, and
+    # return False once it was requeued (and maybe claimed) behind that worker's back
+
+    def set_state(self, job_id, worker, state):
+        with self._tx() as db:
+            return db.execute("UPDATE jobs SET state = ?, heartbeat = ? WHERE id = ? AND worker = ?",
+                              (state, time.time(), job_id, worker)).rowcount > 0
+
+    def heartbeat(self, job_id, worker):
+        with self._tx() as db:
+            return db.execute("UPDATE jobs SET heartbeat = ? WHERE id = ? AND worker = ?",
+                              (time.time(), job_id, worker)).rowcount > 0
+
+    def finish(self, job_id, worker, output_path):
+        now = time.time()
+        with self._tx() as db:
+            return db.execute("UPDATE jobs SET state = 'done', output_path = ?, finished = ?, heartbeat = ? "
+                              "WHERE id = ? AND worker = ?",
+                              (os.path.abspath(output_path), now, now, job_id, worker)).rowcount > 0
+
+    def fail(self, job_id, worker, error):
+        now = time.time()
+        with self._tx() as db:
+            return db.execute("UPDATE jobs SET state = 'failed', error = ?, finished = ?, heartbeat = ? "
+                              "WHERE id = ? AND worker = ?", (error, now, now, job_id, worker)).rowcount > 0
+
+    def retry_failed(self):
+        with self._tx() as db:
+            return db.execute("UPDATE jobs SET state = 'pending', worker = NULL, attempts = 0, error = NULL "
+                              "WHERE state = 'failed'").rowcount
+
+    def counts(self):
+        counts = dict.fromkeys(STATES, 0)
+        for r in self._query("SELECT state, COUNT(*) AS n FROM jobs GROUP BY state"):
+            counts[r["state"]] = r["n"]
+        return counts
+
+    def status(self):
+        """Counts per state, throughput figures, running and failed jobs."""
+        now = time.time()
+        done = self._query("SELECT started, finished FROM jobs WHERE state = 'done' AND finished IS NOT NULL")
+        recent = [r for r in done if r["finished"] >= now - 3600]
+        span = (max(r["finished"] for r in done) - min(r["started"] for r in done)) if done else 0
+        return {
+            "counts": self.counts(),
+            "done_last_hour": len(recent),
+            "jobs_per_hour": len(done) / span * 3600 if span > 0 else 0.0,
+            "avg_seconds": sum(r["finished"] - r["started"] for r in done) / len(done) if done else 0.0,
+            "running": self._query("SELECT id, state, input_path, worker, started, heartbeat FROM jobs "
+                                   f"WHERE state IN ({','.join('?' * len(ACTIVE_STATES))}) ORDER BY id",
+                                   ACTIVE_STATES),
+            "failed": self._query("SELECT id, input_path, attempts, error FROM jobs WHERE state = 'failed' ORDER BY id"),
+        }
+
+
+class TTSBudget:
+    """Cross-process TTS request limit kept in the queue database (see tts_pool.set_shared_budget).
+
+    Each request leases one of `tts_budget` slot rows for as long as it runs; leases older than
+    SLOT_LEASE_SECONDS are taken back, so a dead worker can't hold slots forever."""
+
+    def __init__(self, queue, owner=None):
+        self.queue = queue
+        self.owner = owner or worker_name()
+        self.limit = max(1, int(queue.get_meta("tts_budget", DEFAULT_CONCURRENCY)))
+        self.release_all()
+
+    def try_acquire(self):
+        now = time.time()
+        with self.queue._tx() as db:
+            db.execute("DELETE FROM tts_slots WHERE acquired < ?", (now - SLOT_LEASE_SECONDS,))
+            used = {r[0] for r in db.execute("SELECT slot FROM tts_slots")}
+            slot = next((s for s in range(self.limit) if s not in used), None)
+            if slot is not None:
+                db.execute("INSERT INTO tts_slots (slot, owner, acquired) VALUES (?, ?, ?)", (slot, self.owner, now))
+            return slot
+
+    async def acquire(self):
+        while True:
+            # BEGIN IMMEDIATE can wait on other workers' transactions; keep that off the event loop
+            slot = await asyncio.to_thread(self.try_acquire)
+            if slot is not None:
+                return slot
+            await asyncio.sleep(SLOT_POLL_SECONDS)
+
+    async def release(self, slot):
+        await asyncio.to_thread(self._release, slot)
+
+    def _release(self, slot):
+        with self.queue._tx() as db:
+            db.execute("DELETE FROM tts_slots WHERE slot = ? AND owner = ?", (slot, self.owner))
+
+    def release_all(self):
+        with self.queue._tx() as db:
+            db.execute("DELETE FROM tts_slots WHERE owner = ?", (self.owner,))
+
+
+class JobLost(Exception):
+    """The job was requeued and handed to another worker while this one was still on it."""
+
+
+def _heartbeat_loop(db_path, job_id, worker, stop, lost):
+    queue = JobQueue(db_path)
+    try:
+        while not stop.wait(HEARTBEAT_SECONDS):
+            if not queue.heartbeat(job_id, worker):
+                lost.set()
+                return
+    finally:
+        queue.close()
+
+
+def run_worker(db_path=None, follow=False, report=print):
+    """Pull and render jobs until the queue is drained (or forever with follow=True).
+
+    Returns the number of jobs this worker finished."""
+    queue = JobQueue(db_path)
+    name = worker_name()
+    set_shared_budget(TTSBudget(queue, name))
+    finished = 0
+    try:
+        while True:
+            job = queue.claim(name)
+            if job is None:
+                counts = queue.counts()
+                # jobs still running elsewhere may come back if their worker dies, so keep polling
+                if not follow and not any(counts[s] for s in ACTIVE_STATES):
+                    return finished
+                time.sleep(POLL_SECONDS)
+                continue
+
+            stop, lost = threading.Event(), threading.Event()
+            beat = threading.Thread(target=_heartbeat_loop, args=(queue.path, job["id"], name, stop, lost), daemon=True)
+            beat.start()
+            t0 = time.perf_counter()
+
+            def stage(state, job_id=job["id"], lost=lost):
+                # the next stage is where a render that lost its job stops
+                if lost.is_set() or not queue.set_state(job_id, name, state):
+                    raise JobLost(f"job #{job_id} was taken over by another worker")
+
+            label = f"[{name}] #{job['id']} {os.path.basename(job['input_path'])}"
+            try:
+                out = render_one(job["generator"], job["input_path"], job["output_path"], job["settings"], stage=stage)
+                if not queue.finish(job["id"], name, out or job["output_path"]):
+                    raise JobLost(f"job #{job['id']} was taken over by another worker")
+                finished += 1
+                report(f"{label}: {time.perf_counter() - t0:.1f}s -> {out}")
+            except JobLost as e:
+                report(f"{label}: dropped, {e}")
+            except Exception as e:
+                if queue.fail(job["id"], name, f"{type(e).__name__}: {e}"):
+                    report(f"{label}: FAILED {type(e).__name__}: {e}")
+                else:
+                    report(f"{label}: dropped after {type(e).__name__}, job was taken over by another worker")
+            finally:
+                stop.set()
+                beat.join()
+    finally:
+        set_shared_budget(None)
+        queue.close()
+
+
+def _worker_main(db_path, follow):
+    run_worker(db_path, follow)
+
+
+def _fmt_seconds(seconds):
+    m, s = divmod(int(seconds), 60)
+    h, m = divmod(m, 60)
+    return f"{h}h{m:02d}m{s:02d}s" if h else f"{m}m{s:02d}s"
+
+
+def print_status(queue):
+    st = queue.status()
+    counts = st["counts"]
+    print(f"Queue: {queue.path}")
+    print("  " + " | ".join(f"{state} {counts[state]}" for state in STATES))
+    print(f"  Queue depth: {counts['pending']} pending, "
+          f"{sum(counts[s] for s in ACTIVE_STATES)} running")
+    print(f"  Throughput: {st['done_last_hour']} done in the last hour, {st['jobs_per_hour']:.1f} jobs/h overall, "
+          f"avg {_fmt_seconds(st['avg_seconds'])} per job")
+    now = time.time()
+    if st["running"]:
+        print("  Running:")
+        for r in st["running"]:
+            print(f"    #{r['id']} {r['state']:12s} {os.path.basename(r['input_path'])} "
+                  f"({r['worker']}, {_fmt_seconds(now - r['started'])}, heartbeat {now - r['heartbeat']:.0f}s ago)")
+    if st["failed"]:
+        print("  Failed:")
+        for r in st["failed"]:
+            print(f"    #{r['id']} {os.path.basename(r['input_path'])} (x{r['attempts']}): {r['error']}")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Queue PodCastTool renders and run them with worker processes.")
+    ap.add_argument("--db", default=None, help=f"queue database (default {DEFAULT_DB} or PODCAST_JOB_DB)")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    add = sub.add_parser("add", help="queue input files")
+    add.add_argument("generator", choices=GENERATORS)
+    add.add_argument("inputs", nargs="+", help="input files or glob patterns")
+    add.add_argument("--settings", help="JSON file or inline JSON object (see batch_render.py)")
+    add.add_argument("--output-dir", help="where the videos go (default: next to each input)")
+    add.add_argument("--mode", choices=MODES, help="render mode stored with the jobs (encoder_profiles)")
+
+    work = sub.add_parser("work", help="render queued jobs")
+    work.add_argument("--workers", type=int, default=1, help="worker processes to start")
+    work.add_argument("--tts-budget", type=int, help="Edge TTS requests in flight across all workers")
+    work.add_argument("--follow", action="store_true", help="keep waiting for new jobs instead of exiting")
+
+    sub.add_parser("status", help="queue depth, throughput, running and failed jobs")
+    sub.add_parser("retry", help="put failed jobs back to pending")
+    args = ap.parse_args(argv)
+
+    queue = JobQueue(args.db)
+    if args.command == "add":
+        inputs = collect_inputs(args.inputs)
+        settings = load_settings(args.settings)
+        if args.mode:
+            settings["render_mode"] = args.mode
+        if args.output_dir:
+            os.makedirs(args.output_dir, exist_ok=True)
+        for path in inputs:
+            queue.add(args.generator, path, output_for(args.generator, path, args.output_dir), settings)
+        print(f"Đã thêm {len(inputs)} job ({queue.counts()['pending']} đang chờ).")
+        return 0 if inputs else 1
+
+    if args.command == "status":
+        print_status(queue)
+        return 0
+
+    if args.command == "retry":
+        print(f"{queue.retry_failed()} job đã được đưa lại hàng đợi.")
+        return 0
+
+    if args.tts_budget:
+        queue.set_meta("tts_budget", args.tts_budget)
+    queue.close()
+    t0 = time.perf_counter()
+    if args.workers <= 1:
+        run_worker(args.db, args.follow)
+    else:
+        ctx = multiprocessing.get_context("spawn")
+        procs = [ctx.Process(target=_worker_main, args=(args.db, args.follow)) for _ in range(args.workers)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+    queue = JobQueue(args.db)
+    print(f"Workers stopped after {time.perf_counter() - t0:.1f}s.")
+    print_status(queue)
+    return 1 if queue.counts()["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,118 +1,69 @@
-import asyncio
-import edge_tts
 import os
 import re
-import numpy as np
-import glob
-from datetime import datetime
-from PIL import Image, ImageDraw, ImageFont
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
-from moviepy.editor import AudioFileClip, concatenate_videoclips, concatenate_audioclips, AudioClip, ImageClip
+from p2p_render import ConversationRenderer, VOICE_TAGS
+from encoder_profiles import MODES, get_profile
+
+
+class VideoGenerator(ConversationRenderer):
+    """Tk window around ConversationRenderer (parsing and rendering live there)."""
 
-class VideoGenerator:
     def __init__(self, root):
         self.root = root
         self.root.title("Multilingual Lesson Video Generator - Pro Version")
         self.root.geometry("750x980")
 
-        # Dữ liệu giọng đọc
-        self.voices_data = {
-            "Spanish": {
-                "male": [
-                    "es-ES-AlvaroNeural",
-                    "es-MX-JorgeNeural",
-                    "es-US-AlonsoNeural",
-                    "es-ES-GonzaloNeural",
-                    "es-MX-LibertoNeural"
-                ],
-                "female": [
-                    "es-ES-ElviraNeural",
-                    "es-MX-DaliaNeural",
-                    "es-US-PalomaNeural",
-                    "es-AR-ElenaNeural",
-                    "es-CO-SalomeNeural"                    
-                ]
-            },
-            "Chinese": {
-                "male": [
-                    "zh-CN-YunxiNeural",
-                    "zh-CN-YunjianNeural",
-                    "zh-CN-YunzeNeural",
-                    "zh-TW-YunJheNeural",
-                    "zh-CN-YunyangNeural"
-                ],
-                "female": [
-                    "zh-CN-XiaoxiaoNeural",
-                    "zh-HK-HiuGaaiNeural",
-                    "zh-TW-HsiaoChenNeural",
-                    "zh-CN-XiaoniniNeural",
-                    "zh-CN-XiaoyiNeural"
-                ]
-            }
-        }
-
-        # Biến điều khiển
-        self.lang_var = tk.StringVar(value="Spanish")
-        self.voice_vars = {tag: tk.StringVar() for tag in ["M", "M1", "M2", "F", "F1", "F2"]}
+        # Biến điều khiển (same names and defaults as the headless renderer's settings)
+        d = self.DEFAULTS
+        self.lang_var = tk.StringVar(value=d["lang_var"])
+        self.voice_vars = {tag: tk.StringVar() for tag in VOICE_TAGS}
         
-        self.pos_left_var = tk.StringVar(value="6.5,4")
-        self.pos_right_var = tk.StringVar(value="6.5,12")
-        self.box_width_var = tk.StringVar(value="400")   
-        self.box_height_var = tk.StringVar(value="120")  
+        self.pos_left_var = tk.StringVar(value=d["pos_left_var"])
+        self.pos_right_var = tk.StringVar(value=d["pos_right_var"])
+        self.box_width_var = tk.StringVar(value=d["box_width_var"])   
+        self.box_height_var = tk.StringVar(value=d["box_height_var"])  
         # Single-reader mode: show single full-width bottom box
-        self.single_reader_var = tk.BooleanVar(value=False)
+        self.single_reader_var = tk.BooleanVar(value=d["single_reader_var"])
         
         # Text box style selection (three sample styles)
-        self.textbox_style_var = tk.StringVar(value="Style1")
+        self.textbox_style_var = tk.StringVar(value=d["textbox_style_var"])
         # Biến cho LOGO
-        self.logo_path = tk.StringVar(value="")
-        self.logo_size_var = tk.StringVar(value="9") # % so với chiều rộng video
-        self.logo_pos_var = tk.StringVar(value="0.7,15.3") # Y,X (Mặc định góc trên bên phải)
+        self.logo_path = tk.StringVar(value=d["logo_path"])
+        self.logo_size_var = tk.StringVar(value=d["logo_size_var"]) # % so với chiều rộng video
+        self.logo_pos_var = tk.StringVar(value=d["logo_pos_var"]) # Y,X (Mặc định góc trên bên phải)
 
-        self.bg_path = tk.StringVar(value="")
+        self.bg_path = tk.StringVar(value=d["bg_path"])
         # Support multiple title-specific images: mapping titlekey -> filepath
         self.bg_images = {}
         self.bg_images_var = tk.StringVar(value="")
         # Toggle display of subtitle/text box
-        self.show_sub_var = tk.BooleanVar(value=True)
-        self.output_dir = tk.StringVar(value=os.getcwd())
-        self.selected_speed = tk.StringVar(value="100%")
+        self.show_sub_var = tk.BooleanVar(value=d["show_sub_var"])
+        self.output_dir = tk.StringVar(value=d["output_dir"])
+        self.selected_speed = tk.StringVar(value=d["selected_speed"])
         # Engine selection: Edge TTS (legacy) or Gemini (use external audio + SRT)
-        self.engine_var = tk.StringVar(value="Edge TTTS")
+        self.engine_var = tk.StringVar(value=d["engine_var"])
         # Gemini inputs
-        self.gemini_audio = tk.StringVar(value="")
-        self.gemini_srt = tk.StringVar(value="")
+        self.gemini_audio = tk.StringVar(value=d["gemini_audio"])
+        self.gemini_srt = tk.StringVar(value=d["gemini_srt"])
 
         # Thêm biến điều khiển vị trí F
-        self.f_left_var = tk.StringVar(value="LEFT")  # "LEFT" hoặc "RIGHT"
+        self.f_left_var = tk.StringVar(value=d["f_left_var"])  # "LEFT" hoặc "RIGHT"
+        self.tts_concurrency = tk.IntVar(value=d["tts_concurrency"])
+        self.tts_backend = None
+        # draft = xem nhanh (nửa độ phân giải, encode nhanh), final = bản xuất
+        self.render_mode = tk.StringVar(value=d["render_mode"] or get_profile()["name"])
+
+        self._init_render_caches()
 
         self.set_default_voices()
         self.setup_gui()
 
-    def set_default_voices(self):
-        lang = self.lang_var.get()
-        males = self.voices_data[lang]["male"]
-        females = self.voices_data[lang]["female"]
-        mapping = {
-            "M":  males[0],
-            "M1": males[0],
-            "M2": males[1],
-            "F":  females[0],
-            "F1": females[0],
-            "F2": females[4]
-        }
-        for tag in mapping:
-            if tag in self.voice_vars:
-                self.voice_vars[tag].set(mapping[tag])
-
-
     def update_voice_options(self, event=None):
         lang = self.lang_var.get()
         males = self.voices_data[lang]["male"]
         females = self.voices_data[lang]["female"]
-        tags = ["M", "M1", "M2", "F", "F1", "F2"]
-        for i, tag in enumerate(tags):
+        for i, tag in enumerate(VOICE_TAGS):
             gender = "male" if tag.startswith("M") else "female"
             values = males if gender == "male" else females
             self.voice_combos[i]['values'] = values
@@ -135,14 +86,18 @@ class VideoGenerator:
         ttk.Combobox(posF_frame, textvariable=self.f_left_var, values=["LEFT", "RIGHT"], state="readonly", width=8).pack(side="left")
         tk.Label(posF_frame, text="(F bên trái thì M sẽ bên phải và ngược lại)").pack(side="left")
 
+        mode_frame = tk.Frame(self.root)
+        mode_frame.pack(pady=2)
+        tk.Label(mode_frame, text="Chế độ xuất:").pack(side="left")
+        ttk.Combobox(mode_frame, textvariable=self.render_mode, values=list(MODES), state="readonly", width=8).pack(side="left")
+
         # 2. CÀI ĐẶT GIỌNG ĐỌC
         v_frame = tk.LabelFrame(self.root, text=" 2. CÀI ĐẶT GIỌNG ĐỌC ", font=("Arial", 10, "bold"), pady=10)
         v_frame.pack(fill="x", padx=20, pady=5)
         self.voice_combos = []
         container = tk.Frame(v_frame)
         container.pack()
-        tags = ["M", "M1", "M2", "F", "F1", "F2"]
-        for i, tag in enumerate(tags):
+        for i, tag in enumerate(VOICE_TAGS):
             r, c = divmod(i, 2)
             gender = "male" if tag.startswith("M") else "female"
             values = self.voices_data[self.lang_var.get()][gender]
@@ -262,32 +217,6 @@ class VideoGenerator:
         f = filedialog.askdirectory()
         if f: self.output_dir.set(f)
 
-    def parse_line(self, line):
-        parts = [p.strip() for p in line.split("|")]
-        if len(parts) >= 3:
-            tag = parts[0].upper()
-            # Xác định vị trí: F1/M1 bên trái, F2/M2 bên phải
-            if tag in ["F1", "M1"]:
-                pos_type = self.f_left_var.get()
-            elif tag in ["F2", "M2"]:
-                pos_type = "RIGHT" if self.f_left_var.get() == "LEFT" else "LEFT"
-            elif tag.startswith("F"):
-                pos_type = self.f_left_var.get()
-            elif tag.startswith("M"):
-                pos_type = "RIGHT" if self.f_left_var.get() == "LEFT" else "LEFT"
-            else:
-                pos_type = "LEFT"
-            # Lấy đúng voice theo tag, fallback về "M"
-            voice = self.voice_vars.get(tag, self.voice_vars["M"]).get()
-            return {
-                "position_type": pos_type,
-                "voice": voice,
-                "text_1": parts[1],
-                "text_2": parts[2],
-                "text_3": parts[3] if len(parts) > 3 else ""
-            }
-        return None
-
     def browse_gemini_audio(self):
         f = filedialog.askopenfilename(filetypes=[("Audio files", "*.mp3 *.wav *.m4a *.flac")])
         if f: self.gemini_audio.set(f)
@@ -314,356 +243,12 @@ class VideoGenerator:
                 except Exception:
                     pass
 
-    def parse_srt(self, srt_path):
-        # Returns list of {start, end, text}
-        cues = []
-        if not os.path.exists(srt_path):
-            return cues
-        with open(srt_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        parts = re.split(r"\n\s*\n", content.strip())
-        for p in parts:
-            lines = [l.strip() for l in p.splitlines() if l.strip()]
-            if len(lines) >= 2:
-                # second line is timing
-                timing = lines[1]
-                m = re.match(r"(\d{2}:\d{2}:\d{2}[,\.]\d{3})\s*-->\s*(\d{2}:\d{2}:\d{2}[,\.]\d{3})", timing)
-                text = ' '.join(lines[2:]) if len(lines) > 2 else lines[-1]
-                if m:
-                    def parse_time(s):
-                        s = s.replace(',', '.')
-                        hh, mm, rest = s.split(':')
-                        ss = float(rest)
-                        return int(hh)*3600 + int(mm)*60 + ss
-                    start = parse_time(m.group(1))
-                    end = parse_time(m.group(2))
-                    cues.append({"start": start, "end": end, "text": text})
-        return cues
-
-    def process_video_gemini(self, text_file, audio_file, srt_file):
-        # Read text input -> map chinese text to pinyin and english
-        with open(text_file, 'r', encoding='utf-8') as f:
-            lines = [l.strip() for l in f.readlines() if l.strip()]
-        # Support title markers like: [Title 1] ... and attach title_key to parsed entries
-        mapping = {}
-        current_title = None
-        for line in lines:
-            m = re.match(r"\s*\[([^\]]+)\]", line)
-            if m:
-                title_raw = m.group(1)
-                current_title = re.sub(r"\W+", "", title_raw).lower()
-                continue
-            parsed = self.parse_line(line)
-            if parsed:
-                parsed['title_key'] = current_title
-                key = parsed['text_1'].strip()
-                mapping[key] = parsed
+    def report_status(self, text):
+        self.status_label.config(text=text, fg="red")
+        self.root.update_idletasks()
 
-        cues = self.parse_srt(srt_file)
-        if not cues:
-            messagebox.showerror("Lỗi", "Không tìm thấy cue trong SRT")
-            return
-
-        audio_clip = AudioFileClip(audio_file)
-        all_segments = []
-        for i, cue in enumerate(cues):
-            txt = cue['text'].strip()
-            # try exact match or trimmed match
-            key = txt
-            data = mapping.get(key)
-            # If not exact, try simplified whitespace/punctuation normalization
-            if not data:
-                norm = re.sub(r'[\s\n\r]+', '', txt)
-                for k in mapping:
-                    if re.sub(r'[\s\n\r]+', '', k) == norm:
-                        data = mapping[k]
-                        break
-            # If still not found, create fallback data
-            if not data:
-                data = {'text_1': txt, 'text_2': '', 'text_3': '', 'position_type': 'LEFT', 'voice': self.voice_vars['M'].get()}
-
-            duration = max(0.1, cue['end'] - cue['start'])
-            frame_rgb = self.create_frame(data)
-            # clip audio for this cue
-            try:
-                audio_sub = audio_clip.subclip(cue['start'], cue['end'])
-            except Exception:
-                # fallback: clip from start for duration
-                audio_sub = audio_clip.subclip(0, min(duration, audio_clip.duration))
-            v_seg = ImageClip(frame_rgb).set_duration(duration).set_audio(audio_sub)
-            all_segments.append(v_seg)
-
-        if all_segments:
-            time_str = datetime.now().strftime("%Y%m%d_%H%M%S")
-            final_name = f"output_Gemini_{time_str}.mp4"
-            final_path = os.path.join(self.output_dir.get(), final_name)
-            concatenate_videoclips(all_segments, method="compose").write_videofile(final_path, codec="libx264", audio_codec="aac", fps=10)
-            messagebox.showinfo("Xong!", f"Video đã lưu: {final_path}")
-
-    def create_frame(self, data, width=1280, height=720):
-        # Determine background image: prefer title-specific image if provided
-        title_img = None
-        if data and data.get('title_key') and data.get('title_key') in self.bg_images:
-            candidate = self.bg_images.get(data.get('title_key'))
-            if candidate and os.path.exists(candidate):
-                title_img = candidate
-
-        if title_img:
-            img = Image.open(title_img).convert('RGB').resize((width, height), Image.Resampling.LANCZOS)
-        elif self.bg_path.get() and os.path.exists(self.bg_path.get()):
-            img = Image.open(self.bg_path.get()).convert('RGB').resize((width, height), Image.Resampling.LANCZOS)
-        else:
-            img = Image.new('RGB', (width, height), color=(255, 245, 240))
-        
-        draw = ImageDraw.Draw(img)
-        # Treat as Chinese (show pinyin) when language is Chinese or when the data contains pinyin text
-        is_chinese = (self.lang_var.get() == "Chinese") or bool(data.get('text_2'))
-
-        # Decide whether to draw subtitle/text box
-        show_sub = getattr(self, 'show_sub_var', None) and self.show_sub_var.get()
-
-        if show_sub:
-            # Vẽ Box văn bản
-            try:
-                b_w = int(self.box_width_var.get())
-                b_h = int(self.box_height_var.get())
-            except:
-                b_w, b_h = 400, 180
-
-            # If single-reader mode is enabled, ignore position/width GUI settings
-            if getattr(self, 'single_reader_var', None) and self.single_reader_var.get():
-                margin = 20
-                b_w = width - margin * 2
-                b_h = 120
-                cx = width // 2
-                cy = height - b_h // 2 - margin
-            else:
-                pos_str = self.pos_left_var.get() if data['position_type'] == "LEFT" else self.pos_right_var.get()
-                try:
-                    y_r, x_r = map(float, pos_str.split(','))
-                except:
-                    y_r, x_r = (6.5, 4) if data['position_type'] == "LEFT" else (6.5, 12)
-
-                cx, cy = int(width * (x_r / 16)), int(height * (y_r / 9))
-            # Text box style rendering (3 sample styles)
-            style = getattr(self, 'textbox_style_var', None) and self.textbox_style_var.get() or "Style1"
-            box_radius = 15
-            box_outline = (0, 0, 0)
-            box_fill = (255, 240, 235)
-            if style == "Style1":
-                # Speech-bubble look: outer pale-blue rounded rect + inner white rounded rect
-                box_radius = 18
-                outer_fill = (217, 230, 242)
-                outer_outline = (120, 120, 125)
-                inner_fill = (255, 255, 255)
-                inner_outline = (210, 210, 210)
-                inset = 8
-                # outer
-                draw.rounded_rectangle([cx - b_w//2, cy - b_h//2, cx + b_w//2, cy + b_h//2], 
-                                        radius=box_radius, fill=outer_fill, outline=outer_outline, width=1)
-                # inner (white) inset
-                draw.rounded_rectangle([cx - b_w//2 + inset, cy - b_h//2 + inset, cx + b_w//2 - inset, cy + b_h//2 - inset], 
-                                        radius=max(6, box_radius-6), fill=inner_fill, outline=inner_outline, width=1)
-            elif style == "Style2":
-                # Modern light: soft shadow + light rounded box + subtle outline
-                box_radius = 20
-                shadow_color = (210, 210, 210)
-                # draw shadow slightly offset (soft, light)
-                draw.rounded_rectangle([cx - b_w//2 + 6, cy - b_h//2 + 6, cx + b_w//2 + 6, cy + b_h//2 + 6], 
-                                        radius=box_radius+3, fill=shadow_color)
-                box_fill = (245, 248, 250)
-                box_outline = (200, 200, 200)
-            elif style == "Style3":
-                # Minimal: pale background with subtle border
-                box_radius = 12
-                box_fill = (250, 250, 250)
-                box_outline = (200, 200, 200)
-
-            # For Style1 we already drew outer+inner; for others, draw the single rectangle
-            if style != "Style1":
-                draw.rounded_rectangle([cx - b_w//2, cy - b_h//2, cx + b_w//2, cy + b_h//2], 
-                                        radius=box_radius, fill=box_fill, outline=box_outline, width=1)
-
-        # Chèn LOGO
-        if self.logo_path.get() and os.path.exists(self.logo_path.get()):
-            try:
-                logo = Image.open(self.logo_path.get()).convert("RGBA")
-                l_scale = int(self.logo_size_var.get()) / 100
-                l_width = int(width * l_scale)
-                w_percent = (l_width / float(logo.size[0]))
-                l_height = int((float(logo.size[1]) * float(w_percent)))
-                logo = logo.resize((l_width, l_height), Image.Resampling.LANCZOS)
-                ly_r, lx_r = map(float, self.logo_pos_var.get().split(','))
-                lx, ly = int(width * (lx_r / 16)) - l_width//2, int(height * (ly_r / 9)) - l_height//2
-                img.paste(logo, (lx, ly), logo)
-            except Exception as e:
-                print(f"Lỗi chèn logo: {e}")
-
-        # CẬP NHẬT FONT CHỮ VÀ KÍCH THƯỚC
-        def get_font(name, size):
-            # Ưu tiên tìm font trong hệ thống Windows
-            paths = [
-                f"C:\\Windows\\Fonts\\{name}",
-                name
-            ]
-            for p in paths:
-                try: return ImageFont.truetype(p, size)
-                except: continue
-            return ImageFont.load_default()
-
-        # Determine text colors and font sizes based on selected style
-        style = getattr(self, 'textbox_style_var', None) and self.textbox_style_var.get() or "Style1"
-        # Base font sizes
-        base_main_size = 23
-        base_pinyin_size = 15
-        base_eng_size = 16
-        # If Style2 selected, increase Hanzi size by 20%
-        if style == "Style2":
-            main_size = int(base_main_size * 1.2)
-        else:
-            main_size = base_main_size
-
-        # For Spanish, reduce main text size by 20%
-        if self.lang_var.get() == "Spanish":
-            main_size = int(main_size * 0.8)
-
-        # Create fonts with computed sizes
-        f_main = get_font("msyh.ttc", main_size)
-        f_pinyin = get_font("arial.ttf", base_pinyin_size)
-        f_eng = get_font("arial.ttf", base_eng_size)
-
-        # Colors per style
-        if style == "Style1":
-            main_color = "black"
-            pinyin_color = "#555555"
-            eng_color = "black"
-        elif style == "Style2":
-            main_color = (48, 36, 28)  # brown-black mix
-            pinyin_color = "#666666"
-            eng_color = "#222222"
-        elif style == "Style3":
-            main_color = (0, 100, 0)
-            pinyin_color = "#666666"
-            eng_color = "black"
-        else:
-            main_color = (0, 100, 0)
-            pinyin_color = "#555555"
-            eng_color = "black"
-
-        def wrap(t, f, max_w):
-            if not t: return ""
-            words = list(t) if is_chinese and f == f_main else t.split(' ')
-            lines, cur = [], []
-            for wd in words:
-                sep = "" if is_chinese and f == f_main else " "
-                test = sep.join(cur + [wd]).strip()
-                if f.getbbox(test)[2] <= max_w: cur.append(wd)
-                else: 
-                    lines.append(sep.join(cur))
-                    cur = [wd]
-            lines.append(sep.join(cur))
-            return '\n'.join(lines)
-
-        padding = 40
-        if getattr(self, 'show_sub_var', None) and self.show_sub_var.get():
-            if is_chinese:
-                txt_pinyin = wrap(data['text_2'], f_pinyin, b_w - padding)
-                txt_hanzi = wrap(data['text_1'], f_main, b_w - padding)
-                txt_eng = wrap(data['text_3'], f_eng, b_w - padding)
-                # Style-specific vertical offsets so layout matches sample bubble
-                if style == "Style1":
-                    pinyin_off, main_off, eng_off = -36, -6, 40
-                elif style == "Style2":
-                    pinyin_off, main_off, eng_off = -45, -5, 45
-                else:
-                    pinyin_off, main_off, eng_off = -45, -5, 45
-                draw.text((cx, cy + pinyin_off), txt_pinyin, fill=pinyin_color, font=f_pinyin, anchor="mm", align="center")
-                draw.text((cx, cy + main_off), txt_hanzi, fill=main_color, font=f_main, anchor="mm", align="center")
-                draw.text((cx, cy + eng_off), txt_eng, fill=eng_color, font=f_eng, anchor="mm", align="center")
-            else:
-                txt_main = wrap(data['text_1'], f_main, b_w - padding)
-                txt_en = wrap(data['text_2'], f_eng, b_w - padding)
-                draw.text((cx, cy - 6), txt_main, fill=main_color, font=f_main, anchor="mm", align="center")
-                draw.text((cx, cy + 40), txt_en, fill=eng_color, font=f_eng, anchor="mm", align="center")
-
-        return np.array(img)
-
-    async def generate_audio(self, text, voice, speed_str, filename):
-        rate = f"{int(speed_str.replace('%', '')) - 100:+d}%"
-        await edge_tts.Communicate(text, voice, rate=rate).save(filename)
-
-    def process_video(self, file_path):
-        with open(file_path, 'r', encoding='utf-8') as f:
-            lines = [l.strip() for l in f.readlines() if l.strip()]
-
-        all_segments = []
-        current_title = None
-        seg_index = 0
-        for line in lines:
-            m = re.match(r"\s*\[([^\]]+)\]", line)
-            if m:
-                current_title = re.sub(r"\W+", "", m.group(1)).lower()
-                continue
-            data = self.parse_line(line)
-            if not data:
-                continue
-            data['title_key'] = current_title
-            i = seg_index
-            seg_index += 1
-            
-            # Handle Spanish sentence splitting with pauses
-            if self.lang_var.get() == "Spanish" and '.' in data['text_1']:
-                sentences = [s.strip() for s in data['text_1'].split('.') if s.strip()]
-                # Clean and filter out empty sentences
-                sentences = [re.sub(r'[?/.()¿¡!]', '', s).strip() for s in sentences]
-                sentences = [s for s in sentences if s]
-                if sentences:
-                    audio_clips = []
-                    for j, sent in enumerate(sentences):
-                        temp_audio = f"temp_{i}_{j}.mp3"
-                        asyncio.run(self.generate_audio(sent, data['voice'], self.selected_speed.get(), temp_audio))
-                        a_clip = AudioFileClip(temp_audio)
-                        audio_clips.append(a_clip)
-                        # Add 0.1s pause between sentences, but not after the last one
-                        if j < len(sentences) - 1:
-                            silence_pause = AudioClip(lambda t: [0, 0], duration=0.1, fps=44100)
-                            audio_clips.append(silence_pause)
-                    # Add the standard 0.1s silence at the end
-                    silence_end = AudioClip(lambda t: [0, 0], duration=0.1, fps=44100)
-                    audio_clips.append(silence_end)
-                    final_a = concatenate_audioclips(audio_clips)
-                else:
-                    # Fallback if no valid sentences
-                    temp_audio = f"temp_{i}.mp3"
-                    clean_txt = re.sub(r'[?/.()¿¡!]', '', data['text_1'])
-                    asyncio.run(self.generate_audio(clean_txt, data['voice'], self.selected_speed.get(), temp_audio))
-                    a_clip = AudioFileClip(temp_audio)
-                    silence = AudioClip(lambda t: [0, 0], duration=0.1, fps=44100)
-                    final_a = concatenate_audioclips([a_clip, silence])
-            else:
-                # Default behavior for Chinese or no periods
-                temp_audio = f"temp_{i}.mp3"
-                clean_txt = re.sub(r'[?/.()¿¡!]', '', data['text_1'])
-                asyncio.run(self.generate_audio(clean_txt, data['voice'], self.selected_speed.get(), temp_audio))
-                a_clip = AudioFileClip(temp_audio)
-                silence = AudioClip(lambda t: [0, 0], duration=0.1, fps=44100)
-                final_a = concatenate_audioclips([a_clip, silence])
-            frame_rgb = self.create_frame(data)
-            v_seg = ImageClip(frame_rgb).set_duration(final_a.duration).set_audio(final_a)
-            all_segments.append(v_seg)
-
-        if all_segments:
-            time_str = datetime.now().strftime("%Y%m%d_%H%M%S")
-            final_name = f"output_{self.lang_var.get()}_{time_str}.mp4"
-            final_path = os.path.join(self.output_dir.get(), final_name)
-            concatenate_videoclips(all_segments, method="compose").write_videofile(final_path, codec="libx264", audio_codec="aac", fps=10)
-            # Clean up all temp audio files
-            for temp_file in glob.glob("temp_*.mp3"):
-                try:
-                    os.remove(temp_file)
-                except:
-                    pass
-            messagebox.showinfo("Xong!", f"Video đã lưu: {final_path}")
+    def notify(self, title, message):
+        messagebox.showinfo(title, message)
 
     def start_process(self):
         # Choose main text file (same format as before)
@@ -690,12 +275,6 @@ class VideoGenerator:
                 self.process_video(file)
         except Exception as e:
             messagebox.showerror("Lỗi", str(e))
-        # Clean up any remaining temp audio files
-        for temp_file in glob.glob("temp_*.mp3"):
-            try:
-                os.remove(temp_file)
-            except:
-                pass
         self.status_label.config(text="Sẵn sàng", fg="blue")
 
 if __name__ == "__main__":
@@ -0,0 +1,247 @@
+"""
+Join intro/outro clips and generated lessons into one MP4, re-encoding only what has to be.
+
+merge.bat stream-copies every *.mp4 of a folder with the concat demuxer. That breaks
+as soon as one clip differs in size, frame rate, time base or audio format (an intro
+at 30 fps next to a lesson at 4 fps plays with the video and audio out of step), so
+such clips used to be converted by hand first (forceSameFps.bat, the "fixed_" files).
+
+merge_videos.py probes all inputs in parallel and compares each clip's streams with a
+reference clip (--reference, else the longest input: usually the lesson):
+
+- video: codec, size, pixel format, SAR, frame rate (tbr) and time base (tbn)
+- audio: codec, sample rate and channel layout
+
+Matching clips are stream-copied as they are. A clip that differs is re-encoded to
+the reference's parameters (only the stream that differs; the other one is copied)
+and kept in a cache keyed by the clip's path, mtime and the target parameters, so
+the same intro/outro is normalized once per target format. A stream the clip lacks
+is filled in: silence for a silent clip, black frames for an audio-only one.
+
+    python merge_videos.py output/Chinese/MergFolder
+    python merge_videos.py intro.mp4 "lessons/*.mp4" outro.mp4 -o final.mp4 --reference lesson1.mp4
+
+Probing parses `ffmpeg -i` (the same binary frame_encoder uses), so no ffprobe is needed.
+The normalized-clip cache lives in ~/.cache/podcasttool/normalized, or PODCAST_NORMALIZED_CACHE.
+"""
+import argparse
+import glob
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from frame_encoder import find_ffmpeg
+from segment_cache import SegmentCache, file_stamp
+
+DEFAULT_OUTPUT_NAME = "Gop_Ket_Qua.mp4"  # same name merge.bat writes
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "podcasttool", "normalized")
+PROBE_WORKERS = 8
+VIDEO_ENCODERS = {"h264": ["libx264", "-preset", "veryfast", "-crf", "20"],
+                  "hevc": ["libx265", "-preset", "veryfast", "-crf", "22"]}
+AUDIO_ENCODERS = {"aac": ["aac", "-b:a", "192k"], "mp3": ["libmp3lame", "-b:a", "192k"]}
+
+_DURATION = re.compile(r"Duration: (\d+):(\d+):([\d.]+)")
+_VIDEO = re.compile(r"Stream #\S+: Video: (\w+).*?, ([a-z0-9_]+)(?:\([^)]*\))?, (\d+)x(\d+)(?: \[SAR (\d+:\d+))?")
+_AUDIO = re.compile(r"Stream #\S+: Audio: (\w+).*?, (\d+) Hz, ([^,]+)")
+
+
+def _rate(text, unit):
+    """'29.97 tbr' / '16k tbn' -> '29.97' / '16000' (ffmpeg shortens multiples of 1000)."""
+    m = re.search(r"([\d.]+)(k?) " + unit, text)
+    if not m:
+        return None
+    value = float(m.group(1)) * (1000 if m.group(2) else 1)
+    return f"{value:g}" if value != int(value) else str(int(value))
+
+
+def probe(path):
+    """Duration and the stream parameters that have to match for a stream copy."""
+    err = subprocess.run([find_ffmpeg(), "-hide_banner", "-i", path],
+                         capture_output=True, text=True, encoding="utf-8", errors="replace").stderr
+    info = {"path": path, "duration": 0.0, "video": None, "audio": None}
+    m = _DURATION.search(err)
+    if m:
+        info["duration"] = int(m.group(1)) * 3600 + int(m.group(2)) * 60 + float(m.group(3))
+    for line in err.splitlines():
+        v = _VIDEO.search(line)
+        if v and info["video"] is None and "attached pic" not in line:
+            info["video"] = {"codec": v.group(1), "pix_fmt": v.group(2), "width": int(v.group(3)),
+                             "height": int(v.group(4)), "sar": v.group(5) or "1:1",
+                             "fps": _rate(line, "tbr"), "timescale": _rate(line, "tbn")}
+        a = _AUDIO.search(line)
+        if a and info["audio"] is None:
+            info["audio"] = {"codec": a.group(1), "sample_rate": int(a.group(2)), "layout": a.group(3).strip()}
+    if info["video"] is None and info["audio"] is None:
+        raise ValueError(f"không đọc được {path}: {err.strip().splitlines()[-1:] or 'ffmpeg -i failed'}")
+    return info
+
+
+def probe_all(paths, workers=PROBE_WORKERS):
+    """probe() every path on a thread pool (each probe is one short ffmpeg process); keeps order."""
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(paths)))) as pool:
+        return list(pool.map(probe, paths))
+
+
+def normalize_command(info, ref, output_path):
+    """ffmpeg command re-encoding the streams of `info` that differ from `ref` (the rest is copied)."""
+    cmd = [find_ffmpeg(), "-y", "-v", "error", "-i", info["path"]]
+    v, rv, ra = info["video"], ref["video"], ref["audio"]
+    video_in = audio_in = "0"
+    if ra and not info["audio"]:
+        # clip without sound: silence in the reference format so the audio track stays continuous
+        cmd += ["-f", "lavfi", "-i", f"anullsrc=r={ra['sample_rate']}:cl={ra['layout'].split('(')[0]}"]
+        audio_in = "1"
+    if rv and not v:
+        # clip without picture (audio only, or only cover art): black frames at the reference size
+        cmd += ["-f", "lavfi", "-i", f"color=c=black:s={rv['width']}x{rv['height']}:r={rv['fps'] or 25}"]
+        video_in = str(int(audio_in) + 1)
+    cmd += ["-map", video_in + ":v:0"] if rv else []
+    if ra:
+        cmd += ["-map", audio_in + ":a:0"]
+
+    if rv and v == rv:
+        cmd += ["-c:v", "copy"]
+    elif rv:
+        if rv["codec"] not in VIDEO_ENCODERS:
+            raise ValueError(f"không có encoder cho video {rv['codec']} của clip mẫu")
+        w, h = rv["width"], rv["height"]
+        vf = (f"scale={w}:{h}:force_original_aspect_ratio=decrease,pad={w}:{h}:(ow-iw)/2:(oh-ih)/2,"
+              f"setsar={rv['sar'].replace(':', '/')},fps={rv['fps']},format={rv['pix_fmt']}")
+        cmd += ["-vf", vf, "-c:v", *VIDEO_ENCODERS[rv["codec"]]]
+        if rv["timescale"]:
+            cmd += ["-video_track_timescale", rv["timescale"]]
+
+    if ra and info["audio"] == ra:
+        cmd += ["-c:a", "copy"]
+    elif ra:
+        if ra["codec"] not in AUDIO_ENCODERS:
+            raise ValueError(f"không có encoder cho audio {ra['codec']} của clip mẫu")
+        cmd += ["-af", f"aformat=channel_layouts={ra['layout']}", "-ar", str(ra["sample_rate"]),
+                "-c:a", *AUDIO_ENCODERS[ra["codec"]]]
+    if (ra and not info["audio"]) or (rv and not v):
+        cmd += ["-t", f"{info['duration']:.3f}"]  # the lavfi sources never end
+    return cmd + [output_path]
+
+
+def normalize(info, ref, cache):
+    """Path of `info`'s clip converted to the reference's stream parameters (cached)."""
+    key = SegmentCache.key("normalize", file_stamp(info["path"]), os.path.getsize(info["path"]),
+                           ref["video"], ref["audio"])
+    cached = cache.lookup(key)
+    if cached:
+        return cached, True
+    tmp = cache.temp_path(key)
+    result = subprocess.run(normalize_command(info, ref, tmp), stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        cache.discard(tmp)
+        raise RuntimeError(f"chuẩn hoá {info['path']} thất bại: "
+                           f"{result.stderr.decode('utf-8', 'replace').strip()[-800:]}")
+    return cache.commit(key, tmp), False
+
+
+def concat_copy(paths, output_path, total_dur, progress_callback=None):
+    """Join clips that share stream parameters with the concat demuxer, without re-encoding."""
+    fd, list_path = tempfile.mkstemp(suffix=".txt", prefix="merge_")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            for p in paths:
+                f.write("file '" + os.path.abspath(p).replace("'", "'\\''") + "'\n")
+        cmd = [find_ffmpeg(), "-y", "-hide_banner", "-f", "concat", "-safe", "0", "-i", list_path,
+               "-map", "0:v?", "-map", "0:a?", "-c", "copy", "-movflags", "+faststart", output_path]
+        process = subprocess.Popen(cmd, stderr=subprocess.STDOUT, stdout=subprocess.PIPE,
+                                   universal_newlines=True, encoding="utf-8", errors="replace")
+        last_lines = []
+        for line in process.stdout:  # text mode also splits ffmpeg's \r-terminated progress lines
+            last_lines = (last_lines + [line.strip()])[-5:]
+            m = re.search(r"time=(\d+):(\d+):([\d.]+)", line)
+            if m and progress_callback and total_dur:
+                seconds = int(m.group(1)) * 3600 + int(m.group(2)) * 60 + float(m.group(3))
+                progress_callback(min(seconds / total_dur * 100, 100))
+        if process.wait() != 0:
+            raise RuntimeError("ffmpeg concat failed: " + " | ".join(last_lines))
+    finally:
+        try: os.remove(list_path)
+        except OSError: pass
+    return output_path
+
+
+def merge_videos(paths, output_path, reference=None, jobs=1, cache=None, report=print, progress_callback=None):
+    """Merge `paths` in order into output_path; returns output_path.
+
+    reference is a clip whose stream parameters all inputs are brought to (default: the
+    longest input). Clips that already match are stream-copied; the others are re-encoded
+    on `jobs` ffmpeg processes at a time and cached."""
+    if not paths:
+        raise ValueError("không có video nào để gộp")
+    t0 = time.perf_counter()
+    infos = probe_all(list(paths) + ([reference] if reference else []))
+    ref = infos.pop() if reference else max(infos, key=lambda i: i["duration"])
+    report(f"Đã đọc {len(infos)} video trong {time.perf_counter() - t0:.1f}s; mẫu: {os.path.basename(ref['path'])}")
+
+    todo = [i for i, info in enumerate(infos) if (info["video"], info["audio"]) != (ref["video"], ref["audio"])]
+    parts = [info["path"] for info in infos]
+    if todo:
+        cache = cache or SegmentCache(os.environ.get("PODCAST_NORMALIZED_CACHE") or DEFAULT_CACHE_DIR, ext=".mp4")
+        with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+            futures = [(i, pool.submit(normalize, infos[i], ref, cache)) for i in todo]
+            for n, (i, fut) in enumerate(futures, 1):
+                parts[i], reused = fut.result()
+                report(f"Chuẩn hoá {n}/{len(todo)}: {os.path.basename(infos[i]['path'])}"
+                       + (" (cache)" if reused else ""))
+    report(f"Gộp {len(parts)} video ({len(parts) - len(todo)} copy thẳng, {len(todo)} đã chuẩn hoá)...")
+
+    concat_copy(parts, output_path, sum(info["duration"] for info in infos), progress_callback)
+    report(f"Xong {output_path} trong {time.perf_counter() - t0:.1f}s")
+    return output_path
+
+
+def collect_videos(items, output_path=None):
+    """Files, glob patterns and folders (every *.mp4 inside, sorted like merge.bat) in order."""
+    paths = []
+    for item in items:
+        if os.path.isdir(item):
+            paths += sorted(glob.glob(os.path.join(item, "*.mp4")))
+        else:
+            paths += sorted(glob.glob(item, recursive=True)) or [item]
+    out = os.path.abspath(output_path) if output_path else None
+    return [p for p in paths if os.path.abspath(p) != out]
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Merge MP4 clips, re-encoding only the ones that do not match.")
+    ap.add_argument("inputs", nargs="+", help="video files, glob patterns or folders, in playing order")
+    ap.add_argument("-o", "--output", help=f"merged file (default: {DEFAULT_OUTPUT_NAME} next to the first input)")
+    ap.add_argument("--reference", help="clip whose format every input is brought to (default: the longest input)")
+    ap.add_argument("--jobs", type=int, default=1, help="clips re-encoded at the same time")
+    args = ap.parse_args(argv)
+
+    first = args.inputs[0]
+    output = args.output or os.path.join(first if os.path.isdir(first) else os.path.dirname(first) or ".",
+                                         DEFAULT_OUTPUT_NAME)
+    paths = collect_videos(args.inputs, output)
+    if not paths:
+        print("Không tìm thấy video đầu vào.")
+        return 1
+
+    progress_line = []
+
+    def on_progress(percent):
+        progress_line[:] = [True]
+        print(f"\rĐang gộp: {percent:5.1f}%", end="", flush=True)
+
+    def report(msg):
+        # finish the "Đang gộp" line before the next message
+        print(("\n" if progress_line else "") + msg)
+        progress_line.clear()
+
+    merge_videos(paths, output, reference=args.reference, jobs=args.jobs,
+                 report=report, progress_callback=on_progress)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
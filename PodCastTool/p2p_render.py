@@ -0,0 +1,634 @@
+"""
+Headless core of makeConversationP2P: parse a two-speaker dialogue and render it.
+
+ConversationRenderer holds the parsing, frame drawing, TTS and segment encoding
+that the Tk window in makeConversationP2P.py used to do itself, without
+importing tkinter, so dialogues can also be rendered from batch_render.py.
+Settings are plain values (see DEFAULTS, plus `voices` for per-tag overrides);
+the GUI subclass swaps them for tk variables and overrides notify().
+
+    r = ConversationRenderer(lang_var="Chinese", textbox_style_var="Style2")
+    r.process_video("dialogue.txt", "dialogue.mp4")
+"""
+import os
+import re
+import shutil
+import tempfile
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from tts_pool import TTSJob, synthesize_all, edge_backend, speed_to_rate, DEFAULT_CONCURRENCY
+from tts_cache import cached_backend, get_default_cache
+from font_pool import get_font_chain
+from frame_encoder import encode_still_segment, concat_segments
+from encoder_profiles import get_profile, encoder_kwargs
+from audio_timeline import AudioTimeline
+from audio_probe import get_duration
+from render_pool import RenderPool, FrozenVar, snapshot_state
+from segment_cache import SegmentCache, file_stamp, get_default_cache as get_segment_cache
+
+SEGMENT_FPS = 10  # timing grid of the lines; with SEGMENT_VFR each line is still a single frame
+SEGMENT_VFR = True
+BASE_LAYER_CACHE_SIZE = 32  # distinct backgrounds/box layouts kept (~2.7 MB each at 720p)
+FRAME_MEMO_SIZE = 16        # finished frames kept for repeated lines
+VOICE_TAGS = ["M", "M1", "M2", "F", "F1", "F2"]
+
+
+class ConversationRenderer:
+    # Dữ liệu giọng đọc
+    voices_data = {
+        "Spanish": {
+            "male": [
+                "es-ES-AlvaroNeural",
+                "es-MX-JorgeNeural",
+                "es-US-AlonsoNeural",
+                "es-ES-GonzaloNeural",
+                "es-MX-LibertoNeural"
+            ],
+            "female": [
+                "es-ES-ElviraNeural",
+                "es-MX-DaliaNeural",
+                "es-US-PalomaNeural",
+                "es-AR-ElenaNeural",
+                "es-CO-SalomeNeural"                    
+            ]
+        },
+        "Chinese": {
+            "male": [
+                "zh-CN-YunxiNeural",
+                "zh-CN-YunjianNeural",
+                "zh-CN-YunzeNeural",
+                "zh-TW-YunJheNeural",
+                "zh-CN-YunyangNeural"
+            ],
+            "female": [
+                "zh-CN-XiaoxiaoNeural",
+                "zh-HK-HiuGaaiNeural",
+                "zh-TW-HsiaoChenNeural",
+                "zh-CN-XiaoniniNeural",
+                "zh-CN-XiaoyiNeural"
+            ]
+        }
+    }
+
+    # setting name -> default; the same names are the tk variables of the GUI
+    DEFAULTS = {
+        "lang_var": "Spanish",
+        "pos_left_var": "6.5,4",
+        "pos_right_var": "6.5,12",
+        "box_width_var": "400",
+        "box_height_var": "120",
+        # Single-reader mode: show single full-width bottom box
+        "single_reader_var": False,
+        "textbox_style_var": "Style1",
+        "logo_path": "",
+        "logo_size_var": "9",        # % so với chiều rộng video
+        "logo_pos_var": "0.7,15.3",  # Y,X (Mặc định góc trên bên phải)
+        "bg_path": "",
+        "show_sub_var": True,
+        "output_dir": os.getcwd(),
+        "selected_speed": "100%",
+        # Engine selection: Edge TTS (legacy) or Gemini (use external audio + SRT)
+        "engine_var": "Edge TTTS",
+        "gemini_audio": "",
+        "gemini_srt": "",
+        "f_left_var": "LEFT",        # "LEFT" hoặc "RIGHT"
+        "tts_concurrency": DEFAULT_CONCURRENCY,  # Edge TTS requests in flight
+        "render_mode": "",           # "draft" / "final" (encoder_profiles); "" = PODCAST_RENDER_MODE hoặc final
+    }
+
+    def __init__(self, voices=None, bg_images=None, tts_backend=None, **settings):
+        """`voices` overrides the default voice per tag (M, M1, ..., F2); `bg_images` maps
+        title keys to background images; `tts_backend` None = Edge TTS (a stub for offline runs)."""
+        unknown = set(settings) - set(self.DEFAULTS)
+        if unknown:
+            raise ValueError(f"unknown makeConversationP2P settings: {sorted(unknown)}")
+        for name, default in self.DEFAULTS.items():
+            setattr(self, name, FrozenVar(settings.get(name, default)))
+        self.voice_vars = {tag: FrozenVar("") for tag in VOICE_TAGS}
+        self.bg_images = dict(bg_images or {})
+        self.tts_backend = tts_backend
+        self._init_render_caches()
+        self.set_default_voices()
+        for tag, voice in (voices or {}).items():
+            self.voice_vars[tag.upper()] = FrozenVar(voice)
+
+    def _init_render_caches(self):
+        # render caches for create_frame (see _frame_layout / _base_layer)
+        self._base_layers = {}
+        self._frame_memo = OrderedDict()
+
+    def notify(self, title, message):
+        print(f"{title}: {message}")
+
+    def report_status(self, text):
+        print(text)
+
+    def _on_tts_progress(self, done, total, job):
+        self.report_status(f"Synthesizing audio {done}/{total}...")
+
+    def report_stage(self, stage):
+        """Called with "synthesizing", "rendering" and "muxing" as the render moves on (job_queue tracks it)."""
+
+    def set_default_voices(self):
+        lang = self.lang_var.get()
+        males = self.voices_data[lang]["male"]
+        females = self.voices_data[lang]["female"]
+        mapping = {
+            "M":  males[0],
+            "M1": males[0],
+            "M2": males[1],
+            "F":  females[0],
+            "F1": females[0],
+            "F2": females[4]
+        }
+        for tag in mapping:
+            if tag in self.voice_vars:
+                self.voice_vars[tag].set(mapping[tag])
+
+    def parse_line(self, line):
+        parts = [p.strip() for p in line.split("|")]
+        if len(parts) >= 3:
+            tag = parts[0].upper()
+            # Xác định vị trí: F1/M1 bên trái, F2/M2 bên phải
+            if tag in ["F1", "M1"]:
+                pos_type = self.f_left_var.get()
+            elif tag in ["F2", "M2"]:
+                pos_type = "RIGHT" if self.f_left_var.get() == "LEFT" else "LEFT"
+            elif tag.startswith("F"):
+                pos_type = self.f_left_var.get()
+            elif tag.startswith("M"):
+                pos_type = "RIGHT" if self.f_left_var.get() == "LEFT" else "LEFT"
+            else:
+                pos_type = "LEFT"
+            # Lấy đúng voice theo tag, fallback về "M"
+            voice = self.voice_vars.get(tag, self.voice_vars["M"]).get()
+            return {
+                "position_type": pos_type,
+                "voice": voice,
+                "text_1": parts[1],
+                "text_2": parts[2],
+                "text_3": parts[3] if len(parts) > 3 else ""
+            }
+        return None
+
+    def parse_srt(self, srt_path):
+        # Returns list of {start, end, text}
+        cues = []
+        if not os.path.exists(srt_path):
+            return cues
+        with open(srt_path, 'r', encoding='utf-8') as f:
+            content = f.read()
+        parts = re.split(r"\n\s*\n", content.strip())
+        for p in parts:
+            lines = [l.strip() for l in p.splitlines() if l.strip()]
+            if len(lines) >= 2:
+                # second line is timing
+                timing = lines[1]
+                m = re.match(r"(\d{2}:\d{2}:\d{2}[,\.]\d{3})\s*-->\s*(\d{2}:\d{2}:\d{2}[,\.]\d{3})", timing)
+                text = ' '.join(lines[2:]) if len(lines) > 2 else lines[-1]
+                if m:
+                    def parse_time(s):
+                        s = s.replace(',', '.')
+                        hh, mm, rest = s.split(':')
+                        ss = float(rest)
+                        return int(hh)*3600 + int(mm)*60 + ss
+                    start = parse_time(m.group(1))
+                    end = parse_time(m.group(2))
+                    cues.append({"start": start, "end": end, "text": text})
+        return cues
+
+    def process_video_gemini(self, text_file, audio_file, srt_file, output_path=None):
+        # Read text input -> map chinese text to pinyin and english
+        with open(text_file, 'r', encoding='utf-8') as f:
+            lines = [l.strip() for l in f.readlines() if l.strip()]
+        # Support title markers like: [Title 1] ... and attach title_key to parsed entries
+        mapping = {}
+        current_title = None
+        for line in lines:
+            m = re.match(r"\s*\[([^\]]+)\]", line)
+            if m:
+                title_raw = m.group(1)
+                current_title = re.sub(r"\W+", "", title_raw).lower()
+                continue
+            parsed = self.parse_line(line)
+            if parsed:
+                parsed['title_key'] = current_title
+                key = parsed['text_1'].strip()
+                mapping[key] = parsed
+
+        cues = self.parse_srt(srt_file)
+        if not cues:
+            raise ValueError("Không tìm thấy cue trong SRT")
+
+        # match every cue to its parsed line first, then render frames ahead in workers
+        cue_data = []
+        for cue in cues:
+            txt = cue['text'].strip()
+            # try exact match or trimmed match
+            key = txt
+            data = mapping.get(key)
+            # If not exact, try simplified whitespace/punctuation normalization
+            if not data:
+                norm = re.sub(r'[\s\n\r]+', '', txt)
+                for k in mapping:
+                    if re.sub(r'[\s\n\r]+', '', k) == norm:
+                        data = mapping[k]
+                        break
+            # If still not found, create fallback data
+            if not data:
+                data = {'text_1': txt, 'text_2': '', 'text_3': '', 'position_type': 'LEFT', 'voice': self.voice_vars['M'].get()}
+            cue_data.append(data)
+
+        audio_total = get_duration(audio_file)
+        # clip audio for each cue (fallback: from start for duration if the cue is past the end)
+        windows = []
+        for cue in cues:
+            duration = max(0.1, cue['end'] - cue['start'])
+            start = cue['start'] if cue['start'] < audio_total else 0.0
+            windows.append((start, duration, min(duration, audio_total - start)))
+
+        seg_cache = get_segment_cache()
+        seg_cache.reset_stats()
+        stamp = file_stamp(audio_file)
+        keys = [self._segment_key(d, ("gemini", stamp) + w) for d, w in zip(cue_data, windows)]
+        segments = [seg_cache.lookup(k) for k in keys]
+        todo = [i for i, p in enumerate(segments) if p is None]
+        self.report_stage("rendering")
+        with RenderPool(state=snapshot_state(self)) as pool:
+            frames = pool.imap_method("create_frame", [(cue_data[i],) for i in todo])
+            for i, frame in zip(todo, frames):
+                start, duration, audio_len = windows[i]
+                tmp = seg_cache.temp_path(keys[i])
+                try:
+                    encode_still_segment(frame, duration, tmp, SEGMENT_FPS, audio_path=audio_file,
+                                         audio_start=start, audio_duration=audio_len, pix_fmt="rgb24",
+                                         **self._encoder_args(frame))
+                except Exception:
+                    seg_cache.discard(tmp)
+                    raise
+                segments[i] = seg_cache.commit(keys[i], tmp)
+
+        if segments:
+            time_str = datetime.now().strftime("%Y%m%d_%H%M%S")
+            final_name = f"output_Gemini_{time_str}.mp4"
+            final_path = output_path or os.path.join(self.output_dir.get(), final_name)
+            self.report_stage("muxing")
+            concat_segments(segments, final_path)
+            print(seg_cache.report())
+            self.notify("Xong!", f"Video đã lưu: {final_path}\n{seg_cache.report()}")
+            return final_path
+        return None
+
+    def _frame_layout(self, data, width, height):
+        """Everything except the text that decides how a line's frame looks.
+
+        'key' identifies the base layer (background, text box, logo); lines with the same
+        key share one pre-rendered base and only get their text drawn on top."""
+        # Determine background image: prefer title-specific image if provided
+        title_img = None
+        if data and data.get('title_key') and data.get('title_key') in self.bg_images:
+            candidate = self.bg_images.get(data.get('title_key'))
+            if candidate and os.path.exists(candidate):
+                title_img = candidate
+        if title_img:
+            bg = title_img
+        elif self.bg_path.get() and os.path.exists(self.bg_path.get()):
+            bg = self.bg_path.get()
+        else:
+            bg = None
+
+        # Decide whether to draw subtitle/text box
+        show_sub = bool(getattr(self, 'show_sub_var', None) and self.show_sub_var.get())
+        style = getattr(self, 'textbox_style_var', None) and self.textbox_style_var.get() or "Style1"
+        box = None
+        if show_sub:
+            try:
+                b_w = int(self.box_width_var.get())
+                b_h = int(self.box_height_var.get())
+            except:
+                b_w, b_h = 400, 180
+
+            # If single-reader mode is enabled, ignore position/width GUI settings
+            if getattr(self, 'single_reader_var', None) and self.single_reader_var.get():
+                margin = 20
+                b_w = width - margin * 2
+                b_h = 120
+                cx = width // 2
+                cy = height - b_h // 2 - margin
+            else:
+                pos_str = self.pos_left_var.get() if data['position_type'] == "LEFT" else self.pos_right_var.get()
+                try:
+                    y_r, x_r = map(float, pos_str.split(','))
+                except:
+                    y_r, x_r = (6.5, 4) if data['position_type'] == "LEFT" else (6.5, 12)
+
+                cx, cy = int(width * (x_r / 16)), int(height * (y_r / 9))
+            box = (b_w, b_h, cx, cy)
+
+        logo = None
+        if self.logo_path.get() and os.path.exists(self.logo_path.get()):
+            logo = (self.logo_path.get(), self.logo_size_var.get(), self.logo_pos_var.get())
+
+        def mtime(p):
+            # so editing an image file in place between renders is picked up
+            try: return os.path.getmtime(p) if p else None
+            except OSError: return None
+
+        key = (data.get('title_key'), bg, mtime(bg), logo, mtime(logo and logo[0]), style, box,
+               data.get('position_type'), width, height)
+        return {'key': key, 'bg': bg, 'show_sub': show_sub, 'style': style, 'box': box, 'logo': logo}
+
+    def _base_layer(self, layout, width, height):
+        """Background + text box + logo for one layout, rendered once and reused."""
+        base = self._base_layers.get(layout['key'])
+        if base is not None:
+            return base
+
+        if layout['bg']:
+            img = Image.open(layout['bg']).convert('RGB').resize((width, height), Image.Resampling.LANCZOS)
+        else:
+            img = Image.new('RGB', (width, height), color=(255, 245, 240))
+
+        draw = ImageDraw.Draw(img)
+        if layout['show_sub']:
+            # Vẽ Box văn bản
+            b_w, b_h, cx, cy = layout['box']
+            # Text box style rendering (3 sample styles)
+            style = layout['style']
+            box_radius = 15
+            box_outline = (0, 0, 0)
+            box_fill = (255, 240, 235)
+            if style == "Style1":
+                # Speech-bubble look: outer pale-blue rounded rect + inner white rounded rect
+                box_radius = 18
+                outer_fill = (217, 230, 242)
+                outer_outline = (120, 120, 125)
+                inner_fill = (255, 255, 255)
+                inner_outline = (210, 210, 210)
+                inset = 8
+                # outer
+                draw.rounded_rectangle([cx - b_w//2, cy - b_h//2, cx + b_w//2, cy + b_h//2], 
+                                        radius=box_radius, fill=outer_fill, outline=outer_outline, width=1)
+                # inner (white) inset
+                draw.rounded_rectangle([cx - b_w//2 + inset, cy - b_h//2 + inset, cx + b_w//2 - inset, cy + b_h//2 - inset], 
+                                        radius=max(6, box_radius-6), fill=inner_fill, outline=inner_outline, width=1)
+            elif style == "Style2":
+                # Modern light: soft shadow + light rounded box + subtle outline
+                box_radius = 20
+                shadow_color = (210, 210, 210)
+                # draw shadow slightly offset (soft, light)
+                draw.rounded_rectangle([cx - b_w//2 + 6, cy - b_h//2 + 6, cx + b_w//2 + 6, cy + b_h//2 + 6], 
+                                        radius=box_radius+3, fill=shadow_color)
+                box_fill = (245, 248, 250)
+                box_outline = (200, 200, 200)
+            elif style == "Style3":
+                # Minimal: pale background with subtle border
+                box_radius = 12
+                box_fill = (250, 250, 250)
+                box_outline = (200, 200, 200)
+
+            # For Style1 we already drew outer+inner; for others, draw the single rectangle
+            if style != "Style1":
+                draw.rounded_rectangle([cx - b_w//2, cy - b_h//2, cx + b_w//2, cy + b_h//2], 
+                                        radius=box_radius, fill=box_fill, outline=box_outline, width=1)
+
+        # Chèn LOGO
+        if layout['logo']:
+            logo_path, logo_size, logo_pos = layout['logo']
+            try:
+                logo = Image.open(logo_path).convert("RGBA")
+                l_scale = int(logo_size) / 100
+                l_width = int(width * l_scale)
+                w_percent = (l_width / float(logo.size[0]))
+                l_height = int((float(logo.size[1]) * float(w_percent)))
+                logo = logo.resize((l_width, l_height), Image.Resampling.LANCZOS)
+                ly_r, lx_r = map(float, logo_pos.split(','))
+                lx, ly = int(width * (lx_r / 16)) - l_width//2, int(height * (ly_r / 9)) - l_height//2
+                img.paste(logo, (lx, ly), logo)
+            except Exception as e:
+                print(f"Lỗi chèn logo: {e}")
+
+        if len(self._base_layers) >= BASE_LAYER_CACHE_SIZE:
+            self._base_layers.clear()
+        self._base_layers[layout['key']] = img
+        return img
+
+    def create_frame(self, data, width=1280, height=720):
+        layout = self._frame_layout(data, width, height)
+        # identical lines (same text on the same base) reuse the finished frame
+        frame_key = (layout['key'], self.lang_var.get(), data.get('text_1'), data.get('text_2'), data.get('text_3'))
+        frame = self._frame_memo.get(frame_key)
+        if frame is not None:
+            self._frame_memo.move_to_end(frame_key)
+            return frame
+
+        img = self._base_layer(layout, width, height).copy()
+        draw = ImageDraw.Draw(img)
+        # Treat as Chinese (show pinyin) when language is Chinese or when the data contains pinyin text
+        is_chinese = (self.lang_var.get() == "Chinese") or bool(data.get('text_2'))
+        if layout['box']:
+            b_w, b_h, cx, cy = layout['box']
+
+        # CẬP NHẬT FONT CHỮ VÀ KÍCH THƯỚC
+        def get_font(name, size):
+            # Ưu tiên tìm font trong hệ thống Windows
+            # font_pool resolves the path once and keeps one font object per size
+            return get_font_chain((f"C:\\Windows\\Fonts\\{name}", name), size)
+
+        # Determine text colors and font sizes based on selected style
+        style = layout['style']
+        # Base font sizes
+        base_main_size = 23
+        base_pinyin_size = 15
+        base_eng_size = 16
+        # If Style2 selected, increase Hanzi size by 20%
+        if style == "Style2":
+            main_size = int(base_main_size * 1.2)
+        else:
+            main_size = base_main_size
+
+        # For Spanish, reduce main text size by 20%
+        if self.lang_var.get() == "Spanish":
+            main_size = int(main_size * 0.8)
+
+        # Create fonts with computed sizes
+        f_main = get_font("msyh.ttc", main_size)
+        f_pinyin = get_font("arial.ttf", base_pinyin_size)
+        f_eng = get_font("arial.ttf", base_eng_size)
+
+        # Colors per style
+        if style == "Style1":
+            main_color = "black"
+            pinyin_color = "#555555"
+            eng_color = "black"
+        elif style == "Style2":
+            main_color = (48, 36, 28)  # brown-black mix
+            pinyin_color = "#666666"
+            eng_color = "#222222"
+        elif style == "Style3":
+            main_color = (0, 100, 0)
+            pinyin_color = "#666666"
+            eng_color = "black"
+        else:
+            main_color = (0, 100, 0)
+            pinyin_color = "#555555"
+            eng_color = "black"
+
+        def wrap(t, f, max_w):
+            if not t: return ""
+            words = list(t) if is_chinese and f == f_main else t.split(' ')
+            lines, cur = [], []
+            for wd in words:
+                sep = "" if is_chinese and f == f_main else " "
+                test = sep.join(cur + [wd]).strip()
+                if f.getbbox(test)[2] <= max_w: cur.append(wd)
+                else: 
+                    lines.append(sep.join(cur))
+                    cur = [wd]
+            lines.append(sep.join(cur))
+            return '\n'.join(lines)
+
+        padding = 40
+        if layout['show_sub']:
+            if is_chinese:
+                txt_pinyin = wrap(data['text_2'], f_pinyin, b_w - padding)
+                txt_hanzi = wrap(data['text_1'], f_main, b_w - padding)
+                txt_eng = wrap(data['text_3'], f_eng, b_w - padding)
+                # Style-specific vertical offsets so layout matches sample bubble
+                if style == "Style1":
+                    pinyin_off, main_off, eng_off = -36, -6, 40
+                elif style == "Style2":
+                    pinyin_off, main_off, eng_off = -45, -5, 45
+                else:
+                    pinyin_off, main_off, eng_off = -45, -5, 45
+                draw.text((cx, cy + pinyin_off), txt_pinyin, fill=pinyin_color, font=f_pinyin, anchor="mm", align="center")
+                draw.text((cx, cy + main_off), txt_hanzi, fill=main_color, font=f_main, anchor="mm", align="center")
+                draw.text((cx, cy + eng_off), txt_eng, fill=eng_color, font=f_eng, anchor="mm", align="center")
+            else:
+                txt_main = wrap(data['text_1'], f_main, b_w - padding)
+                txt_en = wrap(data['text_2'], f_eng, b_w - padding)
+                draw.text((cx, cy - 6), txt_main, fill=main_color, font=f_main, anchor="mm", align="center")
+                draw.text((cx, cy + 40), txt_en, fill=eng_color, font=f_eng, anchor="mm", align="center")
+
+        frame = np.array(img)
+        frame.flags.writeable = False  # shared through the memo, callers must not draw on it
+        self._frame_memo[frame_key] = frame
+        if len(self._frame_memo) > FRAME_MEMO_SIZE:
+            self._frame_memo.popitem(last=False)
+        return frame
+
+    def _segment_key(self, data, audio):
+        """Segment cache key for one line: its parsed data (text, voice, position), the frame
+        layout (background, box, style, logo with mtimes), what its audio is made from and the
+        encode profile."""
+        layout = self._frame_layout(data, 1280, 720)
+        return SegmentCache.key("p2p", data, layout['key'], self.lang_var.get(), audio, SEGMENT_FPS,
+                                SEGMENT_VFR, get_profile(self.render_mode.get()))
+
+    def _encoder_args(self, frame):
+        args = encoder_kwargs(get_profile(self.render_mode.get()), SEGMENT_FPS, frame.shape[1], frame.shape[0])
+        return dict(args, vfr=SEGMENT_VFR)
+
+    def process_video(self, file_path, output_path=None):
+        with open(file_path, 'r', encoding='utf-8') as f:
+            lines = [l.strip() for l in f.readlines() if l.strip()]
+
+        # Streaming: each line is encoded to its own segment file as soon as its frame and
+        # audio exist, so only the list of segment paths stays in memory.
+        items = []
+        current_title = None
+        for line in lines:
+            m = re.match(r"\s*\[([^\]]+)\]", line)
+            if m:
+                current_title = re.sub(r"\W+", "", m.group(1)).lower()
+                continue
+            data = self.parse_line(line)
+            if not data:
+                continue
+            data['title_key'] = current_title
+            items.append(data)
+
+        # Segments are cached across renders: only lines whose text/voice/settings changed
+        # since the last run are synthesized and encoded again.
+        seg_cache = get_segment_cache()
+        seg_cache.reset_stats()
+        backend = self.tts_backend or edge_backend
+        keys = [self._segment_key(d, ("tts", self.selected_speed.get(), getattr(backend, "cache_namespace", "")))
+                for d in items]
+        segments = [seg_cache.lookup(k) for k in keys]
+        todo = [i for i, p in enumerate(segments) if p is None]
+
+        seg_dir = tempfile.mkdtemp(prefix="p2p_segments_")
+        tts_cache = get_default_cache()
+        tts_cache.reset_stats()
+        try:
+            # --- SYNTHESIS STAGE ---
+            # every clip of the missing lines is collected first and synthesized in one batch
+            rate = speed_to_rate(self.selected_speed.get())
+            clips = {}
+            for i in todo:
+                data = items[i]
+                # Handle Spanish sentence splitting with pauses
+                sentences = []
+                if self.lang_var.get() == "Spanish" and '.' in data['text_1']:
+                    sentences = [s.strip() for s in data['text_1'].split('.') if s.strip()]
+                    # Clean and filter out empty sentences
+                    sentences = [re.sub(r'[?/.()¿¡!]', '', s).strip() for s in sentences]
+                    sentences = [s for s in sentences if s]
+                if sentences:
+                    clips[i] = [TTSJob(sent, data['voice'], rate, os.path.join(seg_dir, f"temp_{i}_{j}.mp3"))
+                                for j, sent in enumerate(sentences)]
+                else:
+                    # Default behavior for Chinese or no periods (or no valid sentences)
+                    clean_txt = re.sub(r'[?/.()¿¡!]', '', data['text_1'])
+                    clips[i] = [TTSJob(clean_txt, data['voice'], rate, os.path.join(seg_dir, f"temp_{i}.mp3"))]
+            self.report_stage("synthesizing")
+            synthesize_all([job for i in todo for job in clips[i]], backend=cached_backend(backend, tts_cache),
+                           concurrency=self.tts_concurrency.get(), progress_callback=self._on_tts_progress)
+
+            # --- VIDEO STAGE ---
+            self.report_stage("rendering")
+            with RenderPool(state=snapshot_state(self)) as pool:
+                frames = pool.imap_method("create_frame", [(items[i],) for i in todo])
+                for i, frame in zip(todo, frames):
+                    timeline = AudioTimeline()
+                    for j, job in enumerate(clips[i]):
+                        timeline.add_clip(job.filename)
+                        # Add 0.1s pause between sentences, but not after the last one
+                        if j < len(clips[i]) - 1:
+                            timeline.add_silence(0.1)
+                    # the standard 0.1s silence at the end
+                    timeline.add_silence(0.1)
+
+                    line_wav = os.path.join(seg_dir, f"line_{i}.wav")
+                    timeline.write_wav(line_wav)
+                    tmp = seg_cache.temp_path(keys[i])
+                    try:
+                        encode_still_segment(frame, timeline.duration, tmp, SEGMENT_FPS,
+                                             audio_path=line_wav, pix_fmt="rgb24", **self._encoder_args(frame))
+                    except Exception:
+                        seg_cache.discard(tmp)
+                        raise
+                    os.remove(line_wav)
+                    segments[i] = seg_cache.commit(keys[i], tmp)
+
+            if segments:
+                time_str = datetime.now().strftime("%Y%m%d_%H%M%S")
+                final_name = f"output_{self.lang_var.get()}_{time_str}.mp4"
+                final_path = output_path or os.path.join(self.output_dir.get(), final_name)
+                self.report_stage("muxing")
+                concat_segments(segments, final_path)
+        finally:
+            # temp audio and line WAVs all live in seg_dir
+            shutil.rmtree(seg_dir, ignore_errors=True)
+
+        if not segments:
+            return None
+        print(tts_cache.report())
+        print(seg_cache.report())
+        self.notify("Xong!", f"Video đã lưu: {final_path}\n{tts_cache.report()}\n{seg_cache.report()}")
+        return final_path
@@ -0,0 +1,251 @@
+"""
+Headless core of main.py: dialogue text -> Edge TTS clips + SRT -> waveform video.
+
+main.py is only the Tk window around these functions; batch_render.py calls
+render_podcast() directly, without importing tkinter.
+"""
+import asyncio
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+
+from tts_pool import edge_backend
+from tts_cache import synthesize_cached, get_default_cache
+from visualizer import build_visualizer_track, overlay_filter
+from encoder_profiles import get_profile, output_fps, scale_filter, video_args
+
+# ---------- CONFIG ----------
+VIDEO_SIZE = "1920x1080"
+OUTPUT_DIR = "output"
+
+# Đường dẫn font (Hãy đảm bảo các font này tồn tại trên máy bạn)
+FONT_LATIN = "C\\:/Windows/Fonts/arial.ttf"
+FONT_CHINESE = "C\\:/Users/USER/AppData/Local/Microsoft/Windows/Fonts/NotoSansCJKsc-Regular.otf"
+
+LANG_VOICES = {
+    "Vietnamese": {
+        "Mặc định (Nam Minh & Hoài My)": {
+            "male": "vi-VN-NamMinhNeural", 
+            "female": "vi-VN-HoaiMyNeural"
+        }
+    },
+    "Chinese": {
+        "Yunxi & Xiaoxiao (Phổ thông)": {"male": "zh-CN-YunxiNeural", "female": "zh-CN-XiaoxiaoNeural"},
+        "Yunjian & Xiaoyi (Sâu lắng)": {"male": "zh-CN-YunjianNeural", "female": "zh-CN-XiaoyiNeural"},
+        "Yunfeng & Xiaoni (Tươi vui)": {"male": "zh-CN-YunfengNeural", "female": "zh-CN-XiaoniNeural"},
+    },
+    "Spanish": {
+        "Alvaro & Elvira (Tây Ban Nha)": {"male": "es-ES-AlvaroNeural", "female": "es-ES-ElviraNeural"},
+        "Tomas & Elena (Argentina)": {"male": "es-AR-TomasNeural", "female": "es-AR-ElenaNeural"},
+        "Jorge & Dalia (Mexico)": {"male": "es-MX-JorgeNeural", "female": "es-MX-DaliaNeural"},
+        "Lorenzo & Paloma (Colombia-US)": {"male": "es-CL-LorenzoNeural", "female": "es-US-PalomaNeural"},
+    }
+}
+
+WAVE_MODES = {
+    "Dạng vạch (Line)": "showwaves=s=800x200:mode=line:colors=white:draw=full",
+    "Dạng cột đặc (P2P)": "showwaves=s=800x200:mode=p2p:colors=white:draw=full",
+    "Dạng đối xứng (Center line)": "showwaves=s=800x200:mode=cline:colors=white:draw=full",
+    "Dạng điểm (Point)": "showwaves=s=800x200:mode=point:colors=white",
+    "Dạng sóng mảnh": "showwaves=s=800x200:mode=line:colors=white:draw=none",
+    "Dạng sóng mờ": "showwaves=s=800x200:mode=line:colors=white@0.4:draw=full",
+    "Dạng sóng dày": "showwaves=s=800x200:mode=line:colors=white,white:draw=full",
+    "Dạng thanh âm lượng (Bars)": "showvolume=f=0.5:w=800:h=200:t=0:b=4:v=0:c=white",
+    "Dạng thanh âm lượng mịn": "showvolume=f=0.1:w=800:h=200:t=0:b=2:v=0:c=white",
+}
+# the same modes drawn by visualizer.py (precomputed once instead of per frame in ffmpeg)
+WAVE_STYLES = {
+    "Dạng vạch (Line)": "line",
+    "Dạng cột đặc (P2P)": "p2p",
+    "Dạng đối xứng (Center line)": "cline",
+    "Dạng điểm (Point)": "point",
+    "Dạng sóng mảnh": "line_thin",
+    "Dạng sóng mờ": "line_faint",
+    "Dạng sóng dày": "line_thick",
+    "Dạng thanh âm lượng (Bars)": "volume",
+    "Dạng thanh âm lượng mịn": "volume_smooth",
+}
+WAVE_SIZE = (800, 200)
+OUTPUT_FPS = 12  # final mode; draft renders at encoder_profiles' max_fps
+WAVE_FPS = 12  # visualizer track rate; may be lower than the output rate
+
+# ---------- HELPER FUNCTIONS ----------
+def get_seconds(time_str):
+    h, m, s = time_str.split(':')
+    return int(h) * 3600 + int(m) * 60 + float(s)
+
+def format_srt_time(seconds):
+    td_h = int(seconds // 3600)
+    td_m = int((seconds % 3600) // 60)
+    td_s = int(seconds % 60)
+    td_ms = int((seconds - int(seconds)) * 1000)
+    return f"{td_h:02}:{td_m:02}:{td_s:02},{td_ms:03}"
+
+def parse_input(text, lang):
+    dialogs = []
+    lines = [l.strip() for l in text.split("\n") if l.strip()]
+    for line in lines:
+        parts = line.split("|")
+        if lang == "Chinese" and len(parts) == 4:
+            dialogs.append((parts[0].strip(), parts[1].strip(), parts[2].strip(), parts[3].strip()))
+        elif lang != "Chinese" and len(parts) == 3:
+            dialogs.append((parts[0].strip(), parts[1].strip(), parts[2].strip()))
+    return dialogs
+
+async def generate_assets(dialogs, lang, voice_pack_name, rate_str, work_dir=OUTPUT_DIR):
+    os.makedirs(work_dir, exist_ok=True)
+    speed_map = {"100%": "+0%", "90%": "-10%", "80%": "-20%", "70%": "-30%"}
+    rate = speed_map.get(rate_str, "+0%")
+    pack = LANG_VOICES[lang][voice_pack_name]
+    audio_files = []
+    srt_content = ""
+    timeline = 0.0
+    
+    for i, d in enumerate(dialogs):
+        voice = pack["male"] if d[0] == "M" else pack["female"]
+        audio_path = os.path.join(work_dir, f"audio_{i}.mp3")
+        # Cached clips come back with their stored duration, so no ffprobe is needed here
+        meta = await synthesize_cached(d[1], voice, rate, audio_path, edge_backend)
+        dur = float(meta["duration"])
+        start_t, end_t = format_srt_time(timeline), format_srt_time(timeline + dur)
+        
+        main_text = d[1]
+        f_size = 17 if len(main_text) <= 40 else 14
+        sub_text = f"{{\\fs{f_size}}}{d[1]}\\N{{\\fs{f_size-2}}}{d[2]}"
+        if lang == "Chinese": sub_text += f"\\N{{\\fs{f_size-4}}}{d[3]}"
+            
+        srt_content += f"{i+1}\n{start_t} --> {end_t}\n{sub_text}\n\n"
+        audio_files.append(audio_path)
+        timeline += dur
+        
+    with open(os.path.join(work_dir, "subs.srt"), "w", encoding="utf-8") as f:
+        f.write(srt_content)
+    return audio_files, timeline
+
+def build_video_ffmpeg_with_progress(audio_files, total_dur, lang, show_subtitles, wave_mode_key, logo_scale_val, progress_callback,
+                                     background=None, logo=None, work_dir=OUTPUT_DIR, output_path=None, wave_fps=WAVE_FPS,
+                                     render_mode=None):
+    """Mux the clips from generate_assets() over the background with the waveform, logo and
+    subtitles; `background` may be an image or a looping video. Returns the output path.
+
+    The waveform is drawn beforehand by visualizer.py at `wave_fps`; wave_fps=None draws it
+    with the WAVE_MODES ffmpeg filter instead. render_mode picks the encoder_profiles profile
+    (draft: lower fps, half size, fast preset)."""
+    profile = get_profile(render_mode)
+    fps = output_fps(profile, OUTPUT_FPS)
+    selected_bg, selected_logo = background, logo
+    list_path = os.path.join(work_dir, "audio_list.txt")
+    with open(list_path, "w") as f:
+        for audio in audio_files: f.write(f"file '{os.path.abspath(audio)}'\n")
+            
+    full_audio = os.path.join(work_dir, "full_audio.mp3")
+    subprocess.run(["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", list_path, "-c", "copy", full_audio], check=True)
+
+    srt_path = os.path.join(work_dir, "subs.srt").replace("\\", "/")
+    current_font = FONT_CHINESE if lang == "Chinese" else FONT_LATIN
+    sub_style = (f"subtitles='{srt_path}':force_style='Fontname={current_font},FontSize=16,"
+                 f"PrimaryColour=&HFFFFFF,BorderStyle=3,OutlineColour=&H99333333,Alignment=2,MarginV=40'")
+
+    # Tính toán tỉ lệ logo (chia cho 100 vì scale GUI là phần trăm)
+    scale_factor = logo_scale_val / 100.0
+
+    wave_input = []
+    if wave_fps:
+        wave_track = build_visualizer_track(full_audio, os.path.join(work_dir, "wave.mkv"),
+                                            WAVE_STYLES[wave_mode_key], *WAVE_SIZE, fps=min(wave_fps, fps))
+        wave_input = ["-i", wave_track]
+        wave_src = overlay_filter(f"[{3 if selected_logo else 2}:v]", "[wave]")
+    else:
+        wave_src = f"[1:a]{WAVE_MODES[wave_mode_key]}[wave]"
+
+    filter_chain = (
+        # fps first: the background is scaled and the wave, logo and subtitles drawn only on kept frames
+        f"[0:v]fps={fps},scale=1920:1080:force_original_aspect_ratio=increase,crop=1920:1080[bg];"
+        f"{wave_src};"
+        f"[bg][wave]overlay=(W-w)/2:600[v_base];"
+    )
+
+    logo_input = []
+    current_v = "[v_base]"
+
+    if selected_logo:
+        logo_input = ["-i", selected_logo]
+        # Sử dụng biến scale_factor từ GUI
+        filter_chain += f"[2:v]scale=iw*{scale_factor}:-1[logo_scaled];"
+        filter_chain += f"{current_v}[logo_scaled]overlay=W-w-50:50[v_logo];"
+        current_v = "[v_logo]"
+
+    # draft: shrink the composed picture last so positions and sizes above stay as they are
+    scale = scale_filter(profile, 1920, 1080)
+    tail = [f for f in (sub_style if show_subtitles else None, scale) if f]
+    filter_chain += f"{current_v}{','.join(tail) or 'null'}[v]"
+
+    bg_input = ["-f", "lavfi", "-i", "color=c=black:s=1920x1080"]
+    if selected_bg:
+        if selected_bg.lower().endswith((".mp4", ".mov")): bg_input = ["-stream_loop", "-1", "-i", selected_bg]
+        else: bg_input = ["-loop", "1", "-framerate", str(fps), "-i", selected_bg]
+
+    cmd = ["ffmpeg", "-y", *bg_input, "-i", full_audio, *logo_input, *wave_input,
+           "-filter_complex", filter_chain,
+           "-map", "[v]", "-map", "1:a", *video_args(profile, fps),
+           "-t", str(total_dur), output_path or os.path.join(work_dir, f"podcast_{lang}.mp4")]
+    
+    process = subprocess.Popen(cmd, stderr=subprocess.STDOUT, stdout=subprocess.PIPE, universal_newlines=True, encoding='utf-8')
+    time_pattern = re.compile(r"time=(\d{2}:\d{2}:\d{2}\.\d{2})")
+
+    last_lines = []
+    while True:
+        line = process.stdout.readline()
+        if not line: break
+        last_lines = (last_lines + [line.strip()])[-5:]
+        match = time_pattern.search(line)
+        if match:
+            current_seconds = get_seconds(match.group(1))
+            progress_callback(min(int((current_seconds / total_dur) * 100), 100))
+    returncode = process.wait()
+
+    try:
+        for audio in audio_files:
+            if os.path.exists(audio): os.remove(audio)
+        if os.path.exists(full_audio): os.remove(full_audio)
+        if os.path.exists(list_path): os.remove(list_path)
+        if wave_input and os.path.exists(wave_input[1]): os.remove(wave_input[1])
+    except: pass
+
+    if returncode != 0:
+        raise RuntimeError("ffmpeg render failed: " + " | ".join(last_lines))
+    return cmd[-1]
+
+
+def render_podcast(text, lang="Vietnamese", voice_pack=None, speed="100%", show_subtitles=True,
+                   wave_mode="Dạng vạch (Line)", logo_scale=15, background=None, logo=None,
+                   output_path=None, progress_callback=None, stage_callback=None, render_mode=None):
+    """Whole pipeline for one dialogue text; returns the video path.
+
+    voice_pack defaults to the language's first pack; the clips and subtitles are built in
+    a private temp folder so several podcasts can render at the same time. stage_callback(stage)
+    is told when the render moves to "synthesizing" and then "rendering" (one ffmpeg pass
+    draws and muxes). render_mode is "draft" or "final" (see encoder_profiles)."""
+    stage_callback = stage_callback or (lambda stage: None)
+    dialogs = parse_input(text, lang)
+    if not dialogs:
+        raise ValueError("Định dạng sai!")
+    voice_pack = voice_pack or next(iter(LANG_VOICES[lang]))
+    output_path = output_path or os.path.join(OUTPUT_DIR, f"podcast_{lang}.mp4")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    work_dir = tempfile.mkdtemp(prefix="podcast_")
+    try:
+        get_default_cache().reset_stats()
+        stage_callback("synthesizing")
+        audio_files, total_dur = asyncio.run(generate_assets(dialogs, lang, voice_pack, speed, work_dir=work_dir))
+        stage_callback("rendering")
+        out = build_video_ffmpeg_with_progress(audio_files, total_dur, lang, show_subtitles, wave_mode, logo_scale,
+                                               progress_callback or (lambda v: None), background=background,
+                                               logo=logo, work_dir=work_dir, output_path=output_path,
+                                               render_mode=render_mode)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print(get_default_cache().report())
+    return out
@@ -0,0 +1,185 @@
+"""
+Render PIL frames on several cores.
+
+Frame generation (repeatReading.create_frame, makeConversationP2P.create_frame,
+readStory's sentence renderer) is pure-CPU PIL work that ran on one core. RenderPool
+runs it in worker processes and hands the frames back in input order, with only
+a bounded window of results in flight so memory stays flat while the encoder
+catches up.
+
+Work items are serializable render specs. Two ways to describe them:
+
+- A module-level function and its argument tuples:
+      for frame in pool.imap(render_page, specs): ...
+- A method of one of the GUI generator classes, via snapshot_state(): the
+  generator's tk variables are frozen into plain values and every worker builds
+  its own copy of the object once, so only the per-line arguments travel:
+      pool = RenderPool(state=snapshot_state(self))
+      for frame in pool.imap_method("create_frame", [(text, trans), ...]): ...
+
+Everything runs in-process by default: no 1->N speed-up has been measured yet
+(benchmarks/bench_render_pool.py), and spawned workers cost start-up and frame
+pickling. PODCAST_RENDER_WORKERS=N (or workers=N) opts in to N worker processes;
+lists of specs too short to be worth starting workers for still run in-process.
+"""
+import multiprocessing
+import os
+import pickle
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+DEFAULT_CHUNKSIZE = 2
+# starting spawned workers costs a second or two (each imports PIL/cv2/tk), so short
+# jobs with fewer specs than this per worker are rendered in-process instead
+MIN_SPECS_PER_WORKER = 8
+
+
+def default_workers():
+    env = os.environ.get("PODCAST_RENDER_WORKERS")
+    if env:
+        return max(1, int(env))
+    return 1
+
+
+class FrozenVar:
+    """Picklable stand-in for a tk.*Var holding the value it had when the render started."""
+
+    def __init__(self, value):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+
+def _freeze(value, tk):
+    if isinstance(value, tk.Variable):
+        return FrozenVar(value.get())
+    if isinstance(value, dict) and any(isinstance(v, tk.Variable) for v in value.values()):
+        return {k: _freeze(v, tk) for k, v in value.items()}
+    return value
+
+
+def snapshot_state(obj):
+    """(class, attributes) of a generator with tk vars frozen and widgets dropped.
+
+    Private dict caches (e.g. _base_layers) start empty in the workers."""
+    # only a GUI that already imported tkinter can hold tk objects; headless renders never load it
+    tk = sys.modules.get("tkinter")
+    state = {}
+    for name, value in vars(obj).items():
+        if tk is not None and isinstance(value, tk.Misc):
+            continue
+        if name.startswith("_") and isinstance(value, dict):
+            state[name] = type(value)()
+            continue
+        if tk is not None:
+            value = _freeze(value, tk)
+        try:
+            pickle.dumps(value)
+        except Exception:
+            continue  # widgets lists, callbacks, open handles...
+        state[name] = value
+    return type(obj), state
+
+
+def restore_state(state):
+    cls, attrs = state
+    obj = cls.__new__(cls)
+    obj.__dict__.update(attrs)
+    return obj
+
+
+_worker_obj = None
+
+
+def _init_worker(state):
+    global _worker_obj
+    _worker_obj = restore_state(state) if state else None
+
+
+def _call_chunk(fn, chunk):
+    return [fn(*args) for args in chunk]
+
+
+def _call_method_chunk(method, chunk):
+    bound = getattr(_worker_obj, method)
+    return [bound(*args) for args in chunk]
+
+
+class RenderPool:
+    """Ordered, bounded-window parallel map for frame rendering.
+
+    `workers` processes each take `chunksize` specs per task; at most `window` tasks are
+    queued ahead of the consumer."""
+
+    def __init__(self, workers=None, chunksize=DEFAULT_CHUNKSIZE, state=None, window=None):
+        self.workers = default_workers() if workers is None else max(1, int(workers))
+        self.chunksize = max(1, int(chunksize))
+        self.window = window or self.workers * 2
+        self.state = state
+        self._executor = None
+        self._local = None
+
+    def _pool(self):
+        if self._executor is None:
+            # spawn, not fork: forked workers would inherit the encoder's stdin pipe and keep
+            # ffmpeg waiting for EOF forever (and Windows only has spawn anyway)
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                                 initargs=(self.state,),
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def _chunks(self, specs):
+        chunk = []
+        for spec in specs:
+            chunk.append(spec if isinstance(spec, tuple) else (spec,))
+            if len(chunk) >= self.chunksize:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def _run(self, task, first_arg, specs):
+        pending = deque()
+        for chunk in self._chunks(specs):
+            pending.append(self._pool().submit(task, first_arg, chunk))
+            if len(pending) >= self.window:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+    def _in_process(self, specs):
+        if self.workers <= 1:
+            return True
+        return hasattr(specs, "__len__") and len(specs) < self.workers * MIN_SPECS_PER_WORKER
+
+    def imap(self, fn, specs):
+        """fn(*spec) for every spec, in order. fn must be a module-level function."""
+        if self._in_process(specs):
+            return (fn(*(s if isinstance(s, tuple) else (s,))) for s in specs)
+        return self._run(_call_chunk, fn, specs)
+
+    def imap_method(self, method, specs):
+        """getattr(generator, method)(*spec) for every spec, in order (needs state=snapshot_state(...))."""
+        if self._in_process(specs):
+            if self._local is None:
+                self._local = restore_state(self.state)
+            bound = getattr(self._local, method)
+            return (bound(*(s if isinstance(s, tuple) else (s,))) for s in specs)
+        return self._run(_call_method_chunk, method, specs)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
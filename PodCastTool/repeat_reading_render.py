@@ -0,0 +1,397 @@
+"""
+Headless core of repeatReading: parse a lesson, synthesize it and render the video.
+
+RepeatReadingRenderer holds everything the Tk window in repeatReading.py used to
+do on its own, without importing tkinter, so lessons can also be rendered from
+batch_render.py on a machine without a display. Settings are plain values
+(see DEFAULTS); the GUI subclass swaps them for tk variables and overrides
+report_status()/notify() to drive its label and message boxes.
+
+    r = RepeatReadingRenderer(lang_var="Chinese", main_repeat=3)
+    r.process_video("lesson.txt", "lesson.mp4")
+"""
+import os
+import re
+import shutil
+import tempfile
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw
+
+from tts_pool import TTSJob, synthesize_all, edge_backend, speed_to_rate, DEFAULT_CONCURRENCY
+from tts_cache import cached_backend, get_default_cache
+from font_pool import get_font_chain
+from frame_encoder import encode_still_segment, concat_segments
+from encoder_profiles import get_profile, encoder_kwargs
+from audio_timeline import AudioTimeline
+from render_pool import RenderPool, FrozenVar, snapshot_state
+from segment_cache import SegmentCache, file_stamp, get_default_cache as get_segment_cache
+
+DEFAULT_OUTPUT_NAME = "pattern_lesson_wrapped.mp4"
+
+
+class RepeatReadingRenderer:
+    # setting name -> default; the same names are the tk variables of the GUI
+    DEFAULTS = {
+        "output_dir": os.getcwd(),
+        "logo_path": "",
+        "selected_voice": "es-ES-AlvaroNeural (Male)",
+        "selected_speed": "100%",
+        "lang_var": "Spanish",
+        # For Chinese mode: repeat counts
+        "main_repeat": 2,
+        "trans_repeat": 1,
+        "chinese_voice": "zh-CN-XiaoxiaoNeural",
+        # TTS synthesis: max parallel requests
+        "tts_concurrency": DEFAULT_CONCURRENCY,
+        # "draft" / "final" encode (see encoder_profiles); "" = PODCAST_RENDER_MODE or final
+        "render_mode": "",
+    }
+
+    def __init__(self, tts_backend=None, **settings):
+        unknown = set(settings) - set(self.DEFAULTS)
+        if unknown:
+            raise ValueError(f"unknown repeatReading settings: {sorted(unknown)}")
+        for name, default in self.DEFAULTS.items():
+            setattr(self, name, FrozenVar(settings.get(name, default)))
+        # backend None = Edge TTS (a stub can be set for offline runs)
+        self.tts_backend = tts_backend
+
+    def report_status(self, text):
+        print(text)
+
+    def notify(self, title, message):
+        print(f"{title}: {message}")
+
+    def report_stage(self, stage):
+        """Called with "synthesizing", "rendering" and "muxing" as the render moves on (job_queue tracks it)."""
+
+    def parse_line(self, line):
+        # Keep existing Spanish format parser
+        pattern = r"(.+?)\s*\((\d+)\)\.\|(.+?)\s*\((\d+)\)\."
+        match = re.search(pattern, line)
+        if match:
+            return {
+                "es_text": match.group(1).strip(),
+                "es_count": int(match.group(2)),
+                "en_text": match.group(3).strip(),
+                "en_count": int(match.group(4))
+            }
+        return None
+
+    def parse_line_chinese(self, line):
+        # Expect: Hanzi.|Pinyin.|English.  separated by '|'
+        parts = [p.strip() for p in line.split('|') if p.strip()]
+        if len(parts) >= 3:
+            # remove trailing dots if present
+            hanzi = parts[0].rstrip('.')
+            pinyin = parts[1].rstrip('.')
+            english = parts[2].rstrip('.')
+            return {"hanzi": hanzi, "pinyin": pinyin, "english": english}
+        return None
+
+    def _on_tts_progress(self, done, total, job):
+        self.report_status(f"Synthesizing audio {done}/{total}...")
+
+    def wrap_text(self, text, font, max_width):
+        """Helper to split text into lines that fit the box width."""
+        words = text.split(' ')
+        lines = []
+        current_line = []
+
+        for word in words:
+            test_line = ' '.join(current_line + [word])
+            # getbbox returns (left, top, right, bottom)
+            w = font.getbbox(test_line)[2]
+            if w <= max_width:
+                current_line.append(word)
+            else:
+                lines.append(' '.join(current_line))
+                current_line = [word]
+        lines.append(' '.join(current_line))
+        return '\n'.join(lines)
+
+    def create_frame(self, main_text, trans_text, pinyin_text=None, width=1280, height=720):
+        # 1. Main Background: Seashell White (RGB: 255, 245, 240)
+        img = Image.new('RGB', (width, height), color=(255, 245, 240))
+        draw = ImageDraw.Draw(img)
+
+        # 2. Dimensions and Positioning
+        margin_x = 80
+        container_padding = 40
+        box_width = width - (margin_x * 2)
+        inner_box_width = box_width - (container_padding * 2)
+        inner_box_height = 220 
+        
+        # 3. Outer Container Box (Large white box covering everything)
+        # Positioned to fit both inner boxes plus padding
+        container_box = [margin_x - 20, 60, width - margin_x + 20, 660]
+        draw.rounded_rectangle(container_box, radius=35, fill="white", outline=(200, 200, 200), width=2)
+
+        # Boxes: colors differ by language; when Chinese mode, the top box will show Hanzi + Pinyin
+        es_box = [margin_x + 20, 100, width - margin_x - 20, 100 + inner_box_height]
+        en_box = [margin_x + 20, 380, width - margin_x - 20, 380 + inner_box_height]
+
+        # If pinyin_text is provided, draw Chinese-style cards like the sample image
+        if pinyin_text is not None:
+            # Outer rounded frame (teal border)
+            outer_pad = 8
+            outer_x1 = es_box[0] - outer_pad
+            outer_y1 = es_box[1] - outer_pad
+            outer_x2 = en_box[2] + outer_pad
+            outer_y2 = en_box[3] + outer_pad
+            outer_radius = 26
+            frame_color = (6, 95, 85)  # dark teal
+            draw.rounded_rectangle([outer_x1, outer_y1, outer_x2, outer_y2], radius=outer_radius, fill=(252,250,248), outline=frame_color, width=6)
+
+            # Inner top panel (pale teal)
+            top_x1 = outer_x1 + 12
+            top_y1 = outer_y1 + 12
+            top_x2 = outer_x2 - 12
+            top_y2 = top_y1 + int((outer_y2 - outer_y1) * 0.48)
+            draw.rounded_rectangle([top_x1, top_y1, top_x2, top_y2], radius=18, fill=(201,234,231), outline=(190,220,215), width=1)
+
+            # Inner bottom panel (white) with dashed border
+            bot_x1 = top_x1
+            bot_y1 = top_y2 + 12
+            bot_x2 = top_x2
+            bot_y2 = outer_y2 - 12
+            draw.rounded_rectangle([bot_x1, bot_y1, bot_x2, bot_y2], radius=16, fill=(255,255,255), outline=(220,220,220), width=1)
+            # dashed border effect
+            dash_w = 10
+            gap_w = 8
+            x = bot_x1 + 12
+            while x < bot_x2 - 12:
+                x2 = min(x + dash_w, bot_x2 - 12)
+                draw.line([(x, bot_y1+8), (x2, bot_y1+8)], fill=(180,180,180), width=2)
+                draw.line([(x, bot_y2-8), (x2, bot_y2-8)], fill=(180,180,180), width=2)
+                x += dash_w + gap_w
+
+            # Fonts: try to use italic for pinyin and english, hanzi in bold-like
+            top_height = top_y2 - top_y1
+            bot_height = bot_y2 - bot_y1
+            hanzi_size = 55# max(12, int(top_height * 0.5))
+            pinyin_size = 22#  max(10, int(top_height * 0.18))
+            eng_size = 35# max(12, int(bot_height * 0.35))
+            # fonts come from the shared pool (loaded once per size, default font if missing)
+            hanzi_font = get_font_chain(("msyh.ttc", "C:\\Windows\\Fonts\\msyh.ttc"), hanzi_size)
+            pinyin_font = get_font_chain(("ariali.ttf",), pinyin_size)
+            eng_font = get_font_chain(("ariali.ttf",), eng_size)
+
+            # Wrap texts to fit within inner top/bottom areas
+            text_max_w = (top_x2 - top_x1) - 48
+            wrapped_pinyin = self.wrap_text(pinyin_text, pinyin_font, text_max_w)
+            wrapped_hanzi = self.wrap_text(main_text, hanzi_font, text_max_w)
+            wrapped_eng = self.wrap_text(trans_text, eng_font, (bot_x2 - bot_x1) - 40)
+
+            # Positions: pinyin above hanzi, centered in top panel
+            cx = (top_x1 + top_x2) // 2
+            pinyin_y = top_y1 + int(top_height * 0.12)
+            hanzi_y = pinyin_y + int(pinyin_size * 1.6) + 6
+            draw.text((cx, pinyin_y), wrapped_pinyin, fill=(6,95,85), font=pinyin_font, anchor="ma", align="center")
+            draw.text((cx, hanzi_y), wrapped_hanzi, fill=(5,70,65), font=hanzi_font, anchor="ma", align="center")
+
+            # English centered in bottom panel, italic grey
+            eng_cx = (bot_x1 + bot_x2) // 2
+            eng_cy = bot_y1 + bot_height // 2
+            draw.text((eng_cx, eng_cy), wrapped_eng, fill=(120,120,120), font=eng_font, anchor="mm", align="center")
+
+        else:
+            # Default Spanish layout (original behavior)
+            draw.rounded_rectangle(es_box, radius=25, fill=(255, 240, 235), outline=(0, 128, 0), width=4)
+            draw.rounded_rectangle(en_box, radius=25, fill=(178, 191, 255), outline=(50, 50, 50), width=2)
+
+            # 6. Fonts and Text Wrapping
+            en_size = 48
+            es_size = int(en_size * 1.5)
+            es_font = get_font_chain(("arial.ttf",), es_size)
+            en_font = get_font_chain(("arial.ttf",), en_size)
+
+            wrapped_es = self.wrap_text(main_text, es_font, inner_box_width)
+            wrapped_en = self.wrap_text(trans_text, en_font, inner_box_width)
+
+            # 7. Center Text
+            es_pos = (es_box[0] + (es_box[2] - es_box[0]) // 2, es_box[1] + inner_box_height // 2)
+            en_pos = (en_box[0] + (en_box[2] - en_box[0]) // 2, en_box[1] + inner_box_height // 2)
+
+            draw.text(es_pos, wrapped_es, fill=(0, 100, 0), font=es_font, anchor="mm", align="center")
+            draw.text(en_pos, wrapped_en, fill="black", font=en_font, anchor="mm", align="center")
+
+        # 8. Logo Logic
+        if self.logo_path.get() and os.path.exists(self.logo_path.get()):
+            try:
+                logo = Image.open(self.logo_path.get()).convert("RGBA")
+                logo_w = int(width * 0.08)
+                w_percent = (logo_w / float(logo.size[0]))
+                logo_h = int((float(logo.size[1]) * float(w_percent)))
+                logo = logo.resize((logo_w, logo_h), Image.Resampling.LANCZOS)
+                img.paste(logo, (width - logo_w - 45, 15), logo)
+            except: pass
+
+        return cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
+
+    def process_video(self, file_path, output_path=None):
+        """Render the lesson in `file_path`; returns the video path (None if no line parsed).
+
+        output_path defaults to pattern_lesson_wrapped.mp4 in the output folder."""
+        with open(file_path, 'r', encoding='utf-8') as f:
+            lines = [line for line in f.readlines() if line.strip()]
+
+        fps = 4  # line lengths are rounded to 1/fps; each line is still encoded as one frame (vfr)
+        profile = get_profile(self.render_mode.get())
+        final_path = output_path or os.path.join(self.output_dir.get(), DEFAULT_OUTPUT_NAME)
+        rate = speed_to_rate(self.selected_speed.get())
+        # per-render scratch folder, so several lessons can render side by side
+        work_dir = tempfile.mkdtemp(prefix="repeat_reading_")
+
+        def tmp(name):
+            return os.path.join(work_dir, name)
+
+        # --- PARSE STAGE ---
+        # Parse every line first; the TTS jobs of all lines that need (re)building are then
+        # run together on one event loop with bounded concurrency.
+        entries = []
+        for i, line in enumerate(lines):
+            if self.lang_var.get() == "Chinese":
+                data = self.parse_line_chinese(line)
+                if not data:
+                    continue
+
+                # Clean punctuation for TTS generation
+                clean_hanzi = re.sub(r'[?/.()¿¡!]', '', data['hanzi'])
+                cn_job = TTSJob(clean_hanzi, self.chinese_voice.get().split(" ")[0], rate, tmp(f"cn_temp_{i}.mp3"))
+
+                # Split English on '/' to create parts; if no '/', create single part
+                raw_eng = data['english']
+                eng_parts = [p.strip() for p in re.split(r'/+', raw_eng) if p.strip()]
+                if len(eng_parts) > 1:
+                    en_jobs = [TTSJob(re.sub(r'[?/.()¿¡!]', '', part), "en-US-GuyNeural", rate, tmp(f"en_temp_{i}_{j}.mp3"))
+                               for j, part in enumerate(eng_parts)]
+                else:
+                    en_jobs = [TTSJob(re.sub(r'[?/.()¿¡!]', '', raw_eng), "en-US-GuyNeural", rate, tmp(f"en_temp_{i}.mp3"))]
+                entries.append({"data": data, "main": cn_job, "trans": en_jobs})
+            else:
+                # Spanish (existing behavior)
+                data = self.parse_line(line)
+                if not data:
+                    continue
+                # Validate expected keys to avoid KeyError on malformed lines
+                if 'en_text' not in data or 'es_text' not in data:
+                    continue
+
+                # --- AUDIO CLEANING STEP ---
+                # We remove punctuation ONLY for the audio generation so it's not read aloud
+                # This regex replaces ?, /, ., (, ), and other symbols with an empty space
+                clean_es_audio = re.sub(r'[?/.()¿¡!]', '', data['es_text'])
+                clean_en_audio = re.sub(r'[?/.()¿¡!]', '', data['en_text'])
+                es_job = TTSJob(clean_es_audio, self.selected_voice.get().split(" ")[0], rate, tmp(f"es_temp_{i}.mp3"))
+                en_job = TTSJob(clean_en_audio, "en-US-GuyNeural", rate, tmp(f"en_temp_{i}.mp3"))
+                entries.append({"data": data, "main": es_job, "trans": [en_job]})
+
+        # --- SEGMENT CACHE ---
+        # Each line becomes its own segment, cached under everything that shapes it (text,
+        # voices, speed, repeat counts, logo, fps, encode profile); only missing lines are synthesized and
+        # encoded, the rest are reused as-is.
+        seg_cache = get_segment_cache()
+        seg_cache.reset_stats()
+        backend = self.tts_backend or edge_backend
+        logo = file_stamp(self.logo_path.get())
+        repeats = (self.main_repeat.get(), self.trans_repeat.get()) if self.lang_var.get() == "Chinese" else None
+        for entry in entries:
+            entry["key"] = SegmentCache.key(
+                "repeat", self.lang_var.get(), entry["data"],
+                [(j.text, j.voice, j.rate) for j in [entry["main"]] + entry["trans"]],
+                repeats, logo, fps, "vfr", profile, getattr(backend, "cache_namespace", ""))
+            entry["segment"] = seg_cache.lookup(entry["key"])
+        todo = [entry for entry in entries if entry["segment"] is None]
+        jobs = [j for entry in todo for j in [entry["main"]] + entry["trans"]]
+
+        frame_specs = []
+        for entry in todo:
+            data = entry["data"]
+            if self.lang_var.get() == "Chinese":
+                # Visual: pass hanzi (main), english (trans), and pinyin
+                frame_specs.append((data['hanzi'], data['english'], data.get('pinyin')))
+            else:
+                # We use the ORIGINAL 'data' text for the frame so the punctuation STILL SHOWS
+                frame_specs.append((data['es_text'], data['en_text']))
+
+        tts_cache = get_default_cache()
+        tts_cache.reset_stats()
+        try:
+            if not entries:
+                return None
+
+            # --- SYNTHESIS STAGE ---
+            self.report_stage("synthesizing")
+            synthesize_all(jobs, backend=cached_backend(backend, tts_cache),
+                           concurrency=self.tts_concurrency.get(),
+                           progress_callback=self._on_tts_progress)
+
+            # --- VIDEO STAGE ---
+            # Frames of the missing lines are rendered ahead by worker processes and come back
+            # in line order; each one is encoded with its line's audio into a cached segment.
+            self.report_stage("rendering")
+            with RenderPool(state=snapshot_state(self)) as pool:
+                for n, (entry, frame) in enumerate(zip(todo, pool.imap_method("create_frame", frame_specs))):
+                    self.report_status(f"Encoding line {n + 1}/{len(todo)}...")
+                    track_path = tmp(f"line_track_temp_{n}.wav")
+                    line_dur = self._write_line_audio(entry, fps, track_path)
+                    seg_tmp = seg_cache.temp_path(entry["key"])
+                    try:
+                        encode_still_segment(frame, line_dur, seg_tmp, fps, audio_path=track_path, vfr=True,
+                                             **encoder_kwargs(profile, fps, frame.shape[1], frame.shape[0]))
+                    except Exception:
+                        seg_cache.discard(seg_tmp)
+                        raise
+                    entry["segment"] = seg_cache.commit(entry["key"], seg_tmp)
+                    os.remove(track_path)
+
+            self.report_stage("muxing")
+            concat_segments([entry["segment"] for entry in entries], final_path)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        print(tts_cache.report())
+        print(seg_cache.report())
+        self.notify("Success", f"Video saved to:\n{final_path}\n{tts_cache.report()}\n{seg_cache.report()}")
+        return final_path
+
+    def _write_line_audio(self, entry, fps, path):
+        """Build one line's audio as a WAV and return how long the line stays on screen.
+
+        Every clip is decoded once to PCM; repeats reuse the same samples and silences are
+        just lengths. The line lasts a whole number of frames and the audio is padded to it."""
+        data = entry["data"]
+        main_file = entry["main"].filename
+        trans_files = [j.filename for j in entry["trans"]]
+        timeline = AudioTimeline()
+
+        if self.lang_var.get() == "Chinese":
+            # Build audio pattern: CN -> 0.5s -> 1.3s -> EN parts (0.5s between parts) repeated -> CN repeats
+            timeline.add_clip(main_file).add_silence(0.5 + 1.3)
+            for _ in range(self.trans_repeat.get()):
+                for k, part_file in enumerate(trans_files):
+                    timeline.add_clip(part_file)
+                    if k < len(trans_files) - 1:
+                        timeline.add_silence(0.5)
+                timeline.add_silence(0.5)
+
+            if self.main_repeat.get() > 1:
+                for _ in range(self.main_repeat.get() - 1):
+                    timeline.add_clip(main_file).add_silence(0.5)
+        else:
+            timeline.add_clip(main_file).add_silence(0.5 + 1.3)
+
+            for _ in range(data['en_count']):
+                timeline.add_clip(trans_files[0]).add_silence(0.5)
+
+            if data['es_count'] > 1:
+                for _ in range(data['es_count'] - 1):
+                    timeline.add_clip(main_file).add_silence(0.5)
+
+        line_dur = (int(timeline.duration * fps) + 1) / fps
+        timeline.pad_to(line_dur)
+        timeline.write_wav(path)
+        return line_dur
@@ -0,0 +1,73 @@
+"""
+Cache of encoded per-line video segments, keyed by everything that shapes a line (text,
+voices, settings, file mtimes); re-renders only rebuild missing keys. PODCAST_SEGMENT_CACHE / _MB.
+"""
+import os
+import tempfile
+
+from disk_cache import DiskCache, default_cache, hash_key
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "podcasttool", "segments")
+DEFAULT_MAX_MB = 4096
+SEGMENT_EXT = ".mkv"
+# bump when the segment layout/encoding changes so old segments stop matching
+FORMAT_VERSION = 1
+
+
+def file_stamp(path):
+    """(path, mtime) for files that feed a segment (logo, background), None when missing."""
+    if not path or not os.path.exists(path):
+        return None
+    return (path, os.path.getmtime(path))
+
+
+class SegmentCache(DiskCache):
+    env = "PODCAST_SEGMENT_CACHE"
+    default_dir = DEFAULT_CACHE_DIR
+    default_mb = DEFAULT_MAX_MB
+
+    def __init__(self, cache_dir=None, max_bytes=None, ext=SEGMENT_EXT):
+        self.ext = ext  # container of the cached files (merge_videos keeps .mp4 clips)
+        super().__init__(cache_dir, max_bytes)
+
+    @staticmethod
+    def key(*parts):
+        """Hash of any JSON-able description of a segment (dicts, tuples, strings, numbers)."""
+        return hash_key([FORMAT_VERSION] + list(parts), sort_keys=True, default=str)
+
+    def lookup(self, key):
+        """Path of the cached segment, or None on a miss."""
+        p = self.path(key)
+        hit = self.touch(p)
+        self.count("hits" if hit else "misses")
+        return p if hit else None
+
+    def temp_path(self, key):
+        """A fresh temp file next to the final location; encode into it, then commit()."""
+        folder = os.path.dirname(self.path(key))
+        os.makedirs(folder, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=folder, prefix=".tmp_", suffix=self.ext)
+        os.close(fd)
+        return tmp
+
+    def commit(self, key, tmp):
+        """Move an encoded temp segment into place and return its cached path."""
+        p = self.path(key)
+        try:
+            replaced = os.path.getsize(p)
+        except OSError:
+            replaced = 0
+        os.replace(tmp, p)
+        self.added(p, replaced, keep={p})
+        return p
+
+    def discard(self, tmp):
+        self.remove(tmp)
+
+    def report(self):
+        total = self.hits + self.misses
+        return f"Segment cache: {self.hits} reused / {self.misses} rebuilt of {total} lines"
+
+
+def get_default_cache():
+    return default_cache(SegmentCache)
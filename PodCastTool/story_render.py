@@ -0,0 +1,1059 @@
+"""
+Headless core of readStory: paginate a story, synthesize it and render the video.
+
+Everything readStory.py needs to turn a text file into a video lives here
+without importing tkinter (the Tk window only collects the file, voice and
+speed), so stories can also be rendered from batch_render.py:
+
+    render_story("story.txt", "story.mp4", voice="Alvaro (ES)", speed="90%")
+"""
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from tts_pool import TTSJob, synthesize_all, edge_backend_with_words, speed_to_rate
+from tts_cache import cached_backend, get_default_cache
+import text_metrics
+import font_pool
+from render_pool import RenderPool
+from frame_encoder import FFmpegFrameEncoder
+from encoder_profiles import get_profile, encoder_kwargs
+
+# Optional: pypinyin for automatic pinyin generation when input does not provide it
+try:
+    from pypinyin import pinyin as _pypinyin_pinyin, Style as _pypinyin_Style
+    HAVE_PYPINYIN = True
+except Exception:
+    _pypinyin_pinyin = None
+    _pypinyin_Style = None
+    HAVE_PYPINYIN = False
+
+# GUI voice/speed options
+VOICE_OPTIONS = {
+    "Jenny (EN)": "en-US-JennyNeural",
+    "Guy (EN)": "en-US-GuyNeural",
+    "Alvaro (ES)": "es-ES-AlvaroNeural",
+    "Elvira (ES)": "es-ES-ElviraNeural",
+    "NamMinh (VI)": "vi-VN-NamMinhNeural",
+    "HoaiMy (VI)": "vi-VN-HoaiMyNeural",
+    "Yunxi (ZH)": "zh-CN-YunxiNeural",
+    "Yunjian (ZH)": "zh-CN-YunjianNeural",
+}
+SPEED_OPTIONS = ["100%", "90%", "80%", "70%", "60%", "50%"]
+
+# Helper: locate a Chinese-capable font on this system
+def _can_render_glyph(path, glyph='你'):
+    try:
+        f = ImageFont.truetype(path, 32)
+        img = Image.new('L', (64, 64), color=255)
+        d = ImageDraw.Draw(img)
+        d.text((0, 0), glyph, font=f, fill=0)
+        return img.getbbox() is not None
+    except Exception:
+        return False
+
+
+def find_chinese_font():
+    # First try a few well-known paths
+    candidates = [
+        "C:/Users/USER/AppData/Local/Microsoft/Windows/Fonts/NotoSansCJKsc-Regular.otf",
+        "C:/Windows/Fonts/msyh.ttf",
+        "C:/Windows/Fonts/SimHei.ttf",
+        "C:/Windows/Fonts/simsun.ttc",
+    ]
+    for p in candidates:
+        if os.path.exists(p) and _can_render_glyph(p):
+            return p
+
+    # Fallback: scan all fonts in Windows Fonts folder and test rendering
+    fonts_dir = "C:/Windows/Fonts"
+    try:
+        for fname in os.listdir(fonts_dir):
+            if not fname.lower().endswith(('.ttf', '.ttc', '.otf')):
+                continue
+            p = os.path.join(fonts_dir, fname)
+            if _can_render_glyph(p):
+                return p
+    except Exception:
+        pass
+
+    # last resort: try system font path entries from known places
+    try:
+        import matplotlib.font_manager as fm
+        for fpath in fm.findSystemFonts():
+            try:
+                if _can_render_glyph(fpath):
+                    return fpath
+            except Exception:
+                continue
+    except Exception:
+        pass
+
+    return None
+
+# Cache chosen chinese font at module load so GUI can display/debug it
+CHINESE_FONT = find_chinese_font()
+
+# If the cached font does not render, attempt a dynamic search the first time we need it
+def get_working_chinese_font():
+    global CHINESE_FONT
+    if CHINESE_FONT and _can_render_glyph(CHINESE_FONT):
+        return CHINESE_FONT
+    CHINESE_FONT = find_chinese_font()
+    return CHINESE_FONT
+
+# --- CÁC HÀM HỖ TRỢ XỬ LÝ VĂN BẢN ---
+
+def get_text_dimensions(text, font):
+    # memoized per (font file, size, text) in text_metrics
+    return text_metrics.text_size(text, font)
+
+
+def normalize_pinyin_tokens(py_text, ch_text):
+    """Normalize a pinyin string into a list of tokens aligned to Chinese characters when possible.
+
+    Strategy:
+    - If pinyin has spaces and token count == Chinese character count, use them.
+    - Otherwise, flatten the pinyin and perform a segmentation into ch_count pieces.
+    - Prefer segmentations where each piece contains a vowel and each segment (except maybe the first) starts with a consonant.
+    """
+    if not py_text:
+        return []
+    tokens = [t for t in py_text.split() if t.strip()]
+    # Count only Hanzi characters for alignment (ignore punctuation, digits, etc.)
+    ch_count = sum(1 for ch in ch_text if re.match(r'[\u4e00-\u9fff]', ch))
+    if ch_count == 0:
+        return tokens
+    if len(tokens) == ch_count:
+        return tokens
+
+    s = ''.join(tokens)
+    s = s.strip()
+    if not s:
+        return [''] * ch_count
+
+    vowels = set(list('aeiouüāáǎàēéěèīíǐìōóǒòūúǔùǖǘǚǜAEIOUÜĀÁǍÀĒÉĚÈĪÍǏÌŌÓǑÒŪÚǓÙǕǗǙǛ'))
+
+    def has_vowel(seg):
+        return any(ch in vowels for ch in seg)
+
+    def is_consonant(ch):
+        return ch.lower() not in 'aeiouüāáǎàēéěèīíǐìōóǒòūúǔùǖǘǚǜAEIOUÜĀÁǍÀĒÉĚÈĪÍǏÌŌÓǑÒŪÚǓÙǕǗǙǛ'
+
+    # Backtracking segmentation: try to split s into ch_count parts where each has at least one vowel
+    L = len(s)
+    memo = {}
+
+    def backtrack(start, parts_left):
+        key = (start, parts_left)
+        if key in memo:
+            return memo[key]
+        if parts_left == 1:
+            seg = s[start:]
+            if seg and has_vowel(seg):
+                return [seg]
+            else:
+                return None
+        # heuristic: try longer first to avoid tiny prefixes (prefer natural syllables)
+        best = None
+        # maximum possible end to leave enough chars for remaining parts
+        for end in range(L - (parts_left - 1), start, -1):
+            seg = s[start:end]
+            # each segment must contain a vowel
+            if not has_vowel(seg):
+                continue
+            rest = backtrack(end, parts_left - 1)
+            if rest is not None:
+                candidate = [seg] + rest
+                # prefer candidate where next segments start with consonant (more natural), compute score
+                score = 0
+                # +1 for each subsequent part that starts with consonant
+                for r in candidate[1:]:
+                    if r and is_consonant(r[0]):
+                        score += 1
+                # prefer higher score and prefer balanced lengths
+                # We'll keep the first candidate with maximal score; for ties, keep existing
+                if best is None:
+                    best = (candidate, score)
+                else:
+                    if score > best[1]:
+                        best = (candidate, score)
+        memo[key] = best[0] if best else None
+        return memo[key]
+
+    parts = backtrack(0, ch_count)
+    if parts:
+        return parts
+
+    # Fallback: even slicing
+    total = len(s)
+    if total == 0:
+        return [''] * ch_count
+    if ch_count > total:
+        parts = list(s) + [''] * (ch_count - total)
+        return parts
+    avg = total // ch_count
+    rem = total % ch_count
+    parts = []
+    i = 0
+    for k in range(ch_count):
+        take = avg + (1 if k < rem else 0)
+        parts.append(s[i:i+take])
+        i += take
+    return parts
+
+
+def get_pinyin_for_chinese(ch_text):
+    """Return a space-separated pinyin string for a Chinese text using pypinyin if available."""
+    if not ch_text:
+        return ''
+    if not HAVE_PYPINYIN:
+        return ''
+    try:
+        # ignore non-Chinese characters so punctuation is not returned as pinyin tokens
+        toks = _pypinyin_pinyin(ch_text, style=_pypinyin_Style.TONE, errors='ignore')
+        return ' '.join(t[0] for t in toks)
+    except Exception:
+        return ''
+
+
+class LineWrapper:
+    """Greedy word-wrap state that can be extended word by word.
+
+    Line widths come from cumulative per-word advances (cached in text_metrics) instead
+    of re-measuring the growing line string for every word. Greedy wrapping never moves
+    earlier breaks, so appending words only touches the last line."""
+
+    def __init__(self, font, max_width):
+        self.font = font
+        self.max_width = max_width
+        self.space_w = text_metrics.advance(" ", font)
+        self.lines = []  # list of word lists
+        self.x0 = 0      # ink start of the last line
+        self.pen = 0     # where a space after the last word would start
+
+    def copy(self):
+        c = LineWrapper.__new__(LineWrapper)
+        c.__dict__.update(self.__dict__)
+        # earlier lines are never modified again, only the last one needs its own list
+        c.lines = self.lines[:-1] + [self.lines[-1][:]] if self.lines else []
+        return c
+
+    def extend(self, words):
+        """Append words; returns the index of the first line that changed."""
+        first_changed = max(0, len(self.lines) - 1)
+        font = self.font
+        for w in words:
+            w_adv = text_metrics.advance(w, font)
+            if self.lines:
+                start = self.pen + self.space_w
+                # ink width of "line w" = up to w's pen position + w's ink right edge
+                if start + text_metrics.text_bbox(w, font)[2] - self.x0 <= self.max_width:
+                    self.lines[-1].append(w)
+                    self.pen = start + w_adv
+                    continue
+            self.lines.append([w])
+            self.x0 = text_metrics.text_bbox(w, font)[0]
+            self.pen = w_adv
+        return first_changed
+
+    def text_lines(self, start=0):
+        return [' '.join(line) for line in self.lines[start:]]
+
+
+def wrap_text_to_lines(text, font, max_width):
+    wrapper = LineWrapper(font, max_width)
+    wrapper.extend(text.split())
+    return wrapper.text_lines()
+
+# --- HÀM MỚI: TẠO BẢNG MAPPING RIÊNG BIỆT ---
+def create_sentence_map(parts):
+    """
+    Tạo một bảng mapping giữa các câu gốc và câu dịch.
+    Ví dụ: sentence_lookup_map["ABC CD ."] = "EGF GD."
+    """
+    global sentence_lookup_map
+    sentence_lookup_map = {}
+    for top, bottom in parts:
+        if top:
+            # top may be a tuple (chinese, pinyin) or a string
+            key = top[0] if isinstance(top, tuple) else top
+            sentence_lookup_map[key] = bottom
+
+# --- HÀM MỚI: TRUY XUẤT TEXT BOX DƯỚI ---
+def get_bottom_text(current_top_full_sentence):
+    """
+    Dựa trên câu đang highlight ở Box trên, trả về câu dịch tương ứng.
+    """
+    return sentence_lookup_map.get(current_top_full_sentence, "")
+
+def top_text_for_measure(item):
+    # item may be a string or a tuple (chinese, pinyin)
+    if isinstance(item, tuple):
+        ch, py = item
+        return (ch + " " + py).strip()
+    return str(item)
+
+
+class PageMeasure:
+    """Running layout of one page's top box while sentences are appended.
+
+    Keeps the fitted top font, its wrapped lines and the wrapped pinyin lines. Appending
+    a sentence only re-measures the tail line; the top text is re-fitted from scratch
+    only when the new words no longer fit at the current size (the size can only drop)."""
+    line_spacing = 10
+
+    def __init__(self, top_font_path, pinyin_font_path, base_size, max_width):
+        self.top_font_path = top_font_path
+        self.base_size = base_size
+        self.max_width = max_width
+        self.sentences = []
+        self.words = []
+        self.top = None  # LineWrapper at the fitted size
+        self.pinyin = LineWrapper(font_pool.get_font(pinyin_font_path, max(10, base_size//2)), max_width)
+
+    def copy(self):
+        c = PageMeasure.__new__(PageMeasure)
+        c.__dict__.update(self.__dict__)
+        c.sentences = self.sentences[:]
+        c.words = self.words[:]
+        c.top = self.top.copy() if self.top else None
+        c.pinyin = self.pinyin.copy()
+        return c
+
+    def _refit(self):
+        f, _, _, _ = fit_sentence_font(' '.join(self.words), self.top_font_path, self.base_size, self.max_width)
+        self.top = LineWrapper(f, self.max_width)
+        self.top.extend(self.words)
+
+    def append(self, top_sent):
+        words = top_text_for_measure(top_sent).split()
+        self.sentences.append(top_sent)
+        self.words.extend(words)
+        if self.top is None:
+            self._refit()
+        else:
+            first = self.top.extend(words)
+            f = self.top.font
+            if not all(get_text_dimensions(line, f)[0] <= self.max_width for line in self.top.text_lines(first)):
+                self._refit()
+        if isinstance(top_sent, tuple) and top_sent[1]:
+            self.pinyin.extend(top_sent[1].split())
+        return self
+
+    def height(self):
+        top_h = len(self.top.lines) * (text_metrics.line_height(self.top.font) + self.line_spacing) if self.top else 0
+        pinyin_h = len(self.pinyin.lines) * (text_metrics.line_height(self.pinyin.font) + 6)
+        return top_h + pinyin_h
+
+
+def wrap_and_paginate_with_mapping(sentence_pairs, font_path, base_size, max_width, max_height):
+    """Group sentence pairs into pages whose top box (text + pinyin) fits in max_height.
+
+    Each candidate sentence is appended to a running PageMeasure, so a page with many
+    short sentences costs one tail re-measure per sentence instead of re-fitting the
+    whole page text every time."""
+    pages = []
+    combined_bottom = ""
+    combined_bottom_sentences = []
+
+    # attempt to find a Chinese-capable font for measurements
+    chinese_font_path = get_working_chinese_font() or font_path
+
+    def new_measure():
+        return PageMeasure(chinese_font_path, font_path, base_size, max_width)
+
+    def push_page(measure, bottom_full_text, bottom_sentences):
+        pages.append({
+            'top_lines': measure.top.text_lines() if measure.top else [],
+            'top_full_text': " ".join(top_text_for_measure(s) for s in measure.sentences).strip(),
+            'bottom_full_text': bottom_full_text,
+            'top_sentences': measure.sentences.copy(),
+            'bottom_sentences': bottom_sentences.copy(),
+            'pinyin_lines': measure.pinyin.text_lines()
+        })
+
+    measure = new_measure()
+    for top_sent, bottom_sent in sentence_pairs:
+        # try adding this top sentence to the current page candidate
+        candidate = measure.copy().append(top_sent)
+        if measure.sentences and candidate.height() > max_height:
+            push_page(measure, combined_bottom, combined_bottom_sentences)
+            # start new page
+            measure = new_measure().append(top_sent)
+            combined_bottom = bottom_sent
+            combined_bottom_sentences = [bottom_sent]
+        else:
+            measure = candidate
+            combined_bottom = (combined_bottom + " " + bottom_sent).strip() if combined_bottom else bottom_sent
+            combined_bottom_sentences.append(bottom_sent)
+
+    if measure.sentences:
+        push_page(measure, combined_bottom, combined_bottom_sentences)
+    return pages
+
+# --- HÀM XỬ LÝ CHÍNH KHI NHẤN NÚT ---
+def fit_sentence_font(text, font_path, base_size, max_width, max_height=None, min_size=12):
+    """Largest size in base_size, base_size-2, ... >= min_size whose wrapped lines fit.
+
+    The fit check only gets harder as the size grows, so the size is binary-searched
+    instead of stepped down one by one. Returns (font, lines, line_h, total_h)."""
+    line_spacing = 10
+
+    def layout(size):
+        f = font_pool.get_font(font_path, size)
+        lines = wrap_text_to_lines(text, f, max_width)
+        lh = text_metrics.line_height(f)
+        return f, lines, lh, len(lines) * (lh + line_spacing)
+
+    def fits(res):
+        f, lines, _, total_h = res
+        return all(get_text_dimensions(line, f)[0] <= max_width for line in lines) and (max_height is None or total_h <= max_height)
+
+    sizes = list(range(base_size, min_size - 1, -2))  # descending
+    lo, hi = 0, len(sizes) - 1
+    best = None
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        res = layout(sizes[mid])
+        if fits(res):
+            best = res
+            hi = mid - 1  # try a bigger size
+        else:
+            lo = mid + 1
+    if best is not None:
+        return best
+    return layout(min_size)
+
+def parse_input_file(txt_path):
+    """Read and parse the text file into sentence pairs (top, bottom).
+    This function centralizes parsing and pinyin auto-generation so `generate_video` remains concise."""
+    with open(txt_path, 'r', encoding='utf-8') as f:
+        raw = f.read().strip()
+
+    sentence_pairs = []
+    if '|' in raw:
+        lines = [l.strip() for l in raw.splitlines() if l.strip()]
+        for line in lines:
+            parts = [p.strip() for p in line.split('|')]
+            if len(parts) == 3:
+                ch = parts[0]
+                if re.search(r'[\u4e00-\u9fff]', ch):
+                    auto_py = get_pinyin_for_chinese(ch)
+                    py_to_use = auto_py if auto_py else parts[1]
+                    sentence_pairs.append(((ch, py_to_use), parts[2]))
+                else:
+                    sentence_pairs.append(((parts[0], parts[1]), parts[2]))
+            elif len(parts) == 2:
+                if re.search(r'[\u4e00-\u9fff]', parts[0]):
+                    py = get_pinyin_for_chinese(parts[0])
+                    sentence_pairs.append(((parts[0], py), parts[1]))
+                else:
+                    sentence_pairs.append((parts[0], parts[1]))
+            elif len(parts) == 1:
+                only = parts[0]
+                if re.search(r'[\u4e00-\u9fff]', only):
+                    py = get_pinyin_for_chinese(only)
+                    sentence_pairs.append(((only, py), ''))
+                else:
+                    sentence_pairs.append(('', only))
+    else:
+        raw_nopipes = raw.replace('|', ' ')
+        segs = [s.strip() for s in re.split(r'(?<=[.!?])\s*', raw_nopipes) if s.strip()]
+
+        def is_spanish_sentence(s):
+            if re.search(r'[áéíóúñüÁÉÍÓÚÑÜ]', s):
+                return True
+            spanish_words = {'estoy', 'hola', 'mundo', 'también', 'entonces', 'gracias', 'yo', 'tú', 'usted'}
+            tokens = re.findall(r'\w+', s.lower())
+            return any(t in spanish_words for t in tokens)
+
+        i = 0
+        while i < len(segs):
+            s = segs[i]
+            if is_spanish_sentence(s):
+                j = i + 1
+                while j < len(segs) and is_spanish_sentence(segs[j]):
+                    j += 1
+                if j < len(segs):
+                    sentence_pairs.append((s, segs[j]))
+                    i = j + 1
+                else:
+                    sentence_pairs.append((s, ""))
+                    i = j
+            else:
+                j = i + 1
+                while j < len(segs) and not is_spanish_sentence(segs[j]):
+                    j += 1
+                if j < len(segs):
+                    sentence_pairs.append((segs[j], s))
+                    i = j + 1
+                else:
+                    sentence_pairs.append(("", s))
+                    i = j
+    return sentence_pairs
+
+
+def prepare_top_sentence_draws(top_sentences, font_path, base_font_size, max_box_width):
+    """Prepare fitted fonts, wrapped lines and pinyin tokens for each top sentence.
+    Returns: top_sentence_draws list and sent_word_counts list."""
+    top_sentence_draws = []
+    chinese_font_path = find_chinese_font() or font_path
+    for s in top_sentences:
+        if isinstance(s, tuple):
+            ch_text, py_text = s
+            f_s, lines_s, lh_s, _ = fit_sentence_font(ch_text, chinese_font_path, base_font_size, max_box_width)
+            p_tokens = normalize_pinyin_tokens(py_text, ch_text)
+            top_sentence_draws.append({'font': f_s, 'font_path': chinese_font_path, 'font_size': getattr(f_s, 'size', base_font_size), 'lines': lines_s, 'line_h': lh_s, 'is_chinese': True, 'pinyin_tokens': p_tokens})
+        else:
+            f_s, lines_s, lh_s, _ = fit_sentence_font(s, font_path, base_font_size, max_box_width)
+            top_sentence_draws.append({'font': f_s, 'font_path': font_path, 'font_size': getattr(f_s, 'size', base_font_size), 'lines': lines_s, 'line_h': lh_s, 'is_chinese': False})
+
+    sent_word_counts = []
+    for sdraw in top_sentence_draws:
+        if sdraw.get('is_chinese'):
+            cnt = 0
+            for line in sdraw['lines']:
+                cnt += sum(1 for ch in line if not ch.isspace())
+            sent_word_counts.append(cnt)
+        else:
+            sent_word_counts.append(sum(len(line.split()) for line in sdraw['lines']))
+    return top_sentence_draws, sent_word_counts
+
+
+def sentence_display_units(sdraw):
+    """The highlight units of one prepared sentence, in order: characters for Chinese, words otherwise."""
+    if sdraw.get('is_chinese'):
+        return [ch for line in sdraw['lines'] for ch in line if not ch.isspace()]
+    return [w for line in sdraw['lines'] for w in line.split()]
+
+
+def word_frames_from_boundaries(units, boundaries, audio_dur, fps):
+    """Split a sentence's frames over its display units using TTS word-boundary offsets.
+
+    Boundary texts are matched to the units on their letters/digits only (so punctuation and
+    case don't matter); a boundary covering several Chinese characters is spread evenly over
+    them. Units with no matching boundary are interpolated between their neighbours. The
+    first unit starts at frame 0 and the counts always add up to the sentence's frame total.
+    Returns None when nothing could be matched, so the caller can fall back to even spreading.
+    """
+    def norm(t):
+        return ''.join(ch.lower() for ch in t if ch.isalnum())
+
+    total_frames = max(1, int(round(audio_dur * fps)))
+    if not units or not boundaries:
+        return None
+
+    # character offsets of each unit in the normalized sentence
+    unit_pos = []
+    joined = ''
+    for u in units:
+        unit_pos.append(len(joined) if norm(u) else None)
+        joined += norm(u)
+
+    char_time = [None] * len(joined)
+    cursor = 0
+    for b in boundaries:
+        bt = norm(b.get('text', ''))
+        if not bt:
+            continue
+        idx = joined.find(bt, cursor)
+        if idx < 0:
+            continue
+        for k in range(len(bt)):
+            char_time[idx + k] = b['offset'] + b.get('duration', 0.0) * k / len(bt)
+        cursor = idx + len(bt)
+
+    starts = [char_time[p] if p is not None else None for p in unit_pos]
+    if all(t is None for t in starts):
+        return None
+    starts[0] = 0.0
+    # interpolate units that got no boundary between the nearest known neighbours
+    known = [i for i, t in enumerate(starts) if t is not None]
+    for i, t in enumerate(starts):
+        if t is not None:
+            continue
+        prev_i = max(k for k in known if k < i)
+        next_i = next((k for k in known if k > i), None)
+        next_t = starts[next_i] if next_i is not None else audio_dur
+        span = (next_i if next_i is not None else len(starts)) - prev_i
+        starts[i] = starts[prev_i] + (next_t - starts[prev_i]) * (i - prev_i) / span
+
+    bounds = [min(total_frames, int(round(t * fps))) for t in starts] + [total_frames]
+    for i in range(1, len(bounds)):
+        bounds[i] = max(bounds[i], bounds[i - 1])
+    return [bounds[i + 1] - bounds[i] for i in range(len(units))]
+
+
+def synthesize_tts_and_compute_frame_counts(prepped_pages, fps, default_frames_per_word, voice=None, speed="100%", work_dir=""):
+    """Synthesize TTS per sentence and compute per-word frame budgets per page from the
+    Edge TTS word-boundary offsets (even spreading is only the fallback).
+    `voice` is an Edge TTS voice id (default Jenny), `speed` a percentage like "90%"; the
+    per-sentence clips are written to `work_dir`.
+    Returns (tts_files_list, page_frame_counts_list) where page_frame_counts_list is a list of lists (per-page frame counts).
+    """
+    tts_files_all = []
+    page_frame_counts_all = []
+    selected_voice = voice or 'en-US-JennyNeural'
+    try:
+        rate = speed_to_rate(speed)
+    except ValueError:
+        rate = "+0%"
+
+    # every sentence is synthesized in one batch through the shared TTS cache (which keeps
+    # the Edge TTS word boundaries under 'words'); frames are counted per page afterwards
+    jobs = {}
+    for page_index, page_info in enumerate(prepped_pages):
+        for s_idx, s_text in enumerate(page_info['top_sentences']):
+            ch_text = s_text[0] if isinstance(s_text, tuple) else s_text
+            jobs[page_index, s_idx] = TTSJob(ch_text, selected_voice, rate,
+                                             os.path.join(work_dir, f"tts_p{page_index}_s{s_idx}.mp3"))
+    synthesize_all(list(jobs.values()), backend=cached_backend(edge_backend_with_words, require=("words",)),
+                   raise_on_error=False)
+
+    for page_index, page_info in enumerate(prepped_pages):
+        top_sentences = page_info['top_sentences']
+        sent_word_counts = page_info['sent_word_counts']
+        top_sentence_draws = page_info.get('top_sentence_draws', [])
+        page_frames = []
+        page_tts_files = []
+
+        for s_idx in range(len(top_sentences)):
+            job = jobs[page_index, s_idx]
+            safe_name = job.filename
+            if job.ok and job.meta:
+                audio_dur = float(job.meta["duration"])
+                boundaries = job.meta.get("words") or []
+            else:
+                audio_dur = max(0.1, (sent_word_counts[s_idx] * default_frames_per_word) / fps)
+                boundaries = []
+                safe_name = None
+
+            word_count = sent_word_counts[s_idx] if s_idx < len(sent_word_counts) else 0
+            frames_for_sentence = max(1, int(round(audio_dur * fps)))
+            word_frames = None
+            if word_count > 0 and s_idx < len(top_sentence_draws):
+                units = sentence_display_units(top_sentence_draws[s_idx])
+                if len(units) == word_count:
+                    word_frames = word_frames_from_boundaries(units, boundaries, audio_dur, fps)
+            if word_frames is None:
+                # no usable word timing: spread the sentence evenly over its words
+                if word_count <= 0:
+                    word_count = 1
+                base = frames_for_sentence // word_count
+                rem = frames_for_sentence % word_count
+                word_frames = [base + (1 if w_i < rem else 0) for w_i in range(word_count)]
+            page_frames.extend(word_frames)
+
+            if safe_name:
+                page_tts_files.append(safe_name)
+
+        tts_files_all.extend(page_tts_files)
+        page_frame_counts_all.append(page_frames)
+
+    return tts_files_all, page_frame_counts_all
+
+
+def layout_page_lines(top_sentence_draws, max_box_width, base_font_size):
+    """Pack the page's words / Chinese characters into display lines (list of lists of items)."""
+    lines_render = []
+    current_line = []
+    current_width = 0
+    global_idx = 0
+    char_pos = {i: 0 for i in range(len(top_sentence_draws))}
+    for s_idx, sdraw in enumerate(top_sentence_draws):
+        f_s = sdraw['font']
+        for s_line in sdraw['lines']:
+            if sdraw.get('is_chinese'):
+                for ch in s_line:
+                    if ch.isspace():
+                        continue
+                    raw_w, raw_h = get_text_dimensions(ch, f_s)
+                    pad = max(4, int(sdraw.get('font_size', getattr(f_s, 'size', base_font_size)) * 0.12))
+                    ww = raw_w + pad
+                    glyph_x0, glyph_w = text_metrics.ink_extent(ch, f_s)
+
+                    p_token = None
+                    p_tokens = sdraw.get('pinyin_tokens', [])
+                    pos = char_pos.get(s_idx, 0)
+                    if re.match(r'[\u4e00-\u9fff]', ch):
+                        if pos < len(p_tokens):
+                            p_token = p_tokens[pos]
+                        char_pos[s_idx] = pos + 1
+
+                    item = {'word': ch, 'font': f_s, 'font_path': sdraw.get('font_path'), 'idx': global_idx, 'width': ww, 'raw_width': raw_w, 'pad': pad, 'glyph_x0': glyph_x0, 'glyph_width': glyph_w, 's_idx': s_idx, 'pinyin': p_token, 'font_size': sdraw.get('font_size', getattr(f_s, 'size', base_font_size))}
+                    if current_width == 0 or current_width + ww <= max_box_width:
+                        current_line.append(item)
+                        current_width += ww
+                    else:
+                        lines_render.append(current_line)
+                        current_line = [item]
+                        current_width = ww
+                    global_idx += 1
+            else:
+                for w in s_line.split():
+                    ww = get_text_dimensions(w + " ", f_s)[0]
+                    if current_width == 0 or current_width + ww <= max_box_width:
+                        current_line.append({'word': w, 'font': f_s, 'idx': global_idx, 'width': ww, 's_idx': s_idx, 'font_size': getattr(f_s, 'size', base_font_size)})
+                        current_width += ww
+                    else:
+                        lines_render.append(current_line)
+                        current_line = [{'word': w, 'font': f_s, 'idx': global_idx, 'width': ww, 's_idx': s_idx, 'font_size': getattr(f_s, 'size', base_font_size)}]
+                        current_width = ww
+                    global_idx += 1
+    if current_line:
+        lines_render.append(current_line)
+    return lines_render
+
+
+def place_page_lines(lines_render, font_path, base_font_size):
+    """Compute where every item, pinyin token and line goes on the page (done once per page).
+
+    Each item gets 'x' (cell start), 'char_x' and 'y'. Returns (placed_lines, y_after_text)
+    where each placed line is {'items', 'yt', 'line_h', 'p_font', 'p_y'}."""
+    placed = []
+    yt = 70
+    for line in lines_render:
+        line_h = max(text_metrics.line_height(item['font']) for item in line)
+        p_fs_line = None
+        p_y_line = None
+        if any(item.get('pinyin') for item in line):
+            p_fs_size_line = max(max(10, int(item.get('font_size', base_font_size) * 0.45)) for item in line if item.get('pinyin'))
+            # arial for the pinyin if the system has it, else the page font (resolved once)
+            p_fs_line = font_pool.get_font_chain(('arial.ttf', font_path), p_fs_size_line, fallback_default=False)
+            p_h_line = text_metrics.line_height(p_fs_line)
+            p_y_line = yt - p_h_line - 4
+
+        xt = 80
+        for item in line:
+            item['x'] = xt
+            item['char_x'] = xt + (item['width'] - item['raw_width']) / 2 if 'raw_width' in item else xt
+            item['y'] = yt
+            xt += item['width']
+        placed.append({'items': line, 'yt': yt, 'line_h': line_h, 'p_font': p_fs_line, 'p_y': p_y_line})
+        yt += line_h + 10
+    return placed, yt
+
+
+def bottom_text_lines(bottom_text, max_box_width, font_path, base_font_size):
+    """[(x, y, line, font)] of the bottom translation, centred in the lower box."""
+    if not bottom_text:
+        return []
+    f_b, b_lines, bh, _ = fit_sentence_font(bottom_text, font_path, base_font_size, max_box_width)
+    out = []
+    yb = 347 - (len(b_lines)*(bh + 10))//2
+    for line in b_lines:
+        lw, _ = get_text_dimensions(line, f_b)
+        out.append((400 - lw//2, yb, line, f_b))
+        yb += bh + 10
+    return out
+
+
+def highlight_rects(placed, start_word, end_word):
+    """{line index: rectangle} of the highlight behind words start_word..end_word."""
+    padding = 6
+    rects = {}
+    for n, pl in enumerate(placed):
+        # items are in index order, so the active sentence is one contiguous run per line
+        run = [item for item in pl['items'] if start_word <= item['idx'] <= end_word]
+        if run:
+            yt, line_h = pl['yt'], pl['line_h']
+            rects[n] = (run[0]['x'] - padding, yt - 5, run[-1]['x'] + run[-1]['width'] + padding, yt + line_h + 5)
+    return rects
+
+
+def _text_box(x, y, text, font):
+    b = text_metrics.text_bbox(text, font)
+    return (x + b[0], y + b[1], x + b[2], y + b[3])
+
+
+def draw_page_layer(img_pil, placed, y_after, pinyin_lines, bottom_text, start_word, end_word, max_box_width, font_path, base_font_size, draw_glyphs=True, origin=(0, 0)):
+    """Draw one page state onto img_pil: bottom translation, highlight of the active sentence
+    (words start_word..end_word), pinyin, and (optionally) the top glyphs in black.
+
+    img_pil may be a crop of the page whose top-left corner is at `origin`; everything is
+    drawn in the same order, and text that lies entirely outside the crop is skipped."""
+    draw = ImageDraw.Draw(img_pil)
+    ox, oy = origin
+    cx1, cy1 = ox + img_pil.width, oy + img_pil.height
+
+    def visible(box):
+        return box[0] < cx1 and box[2] >= ox and box[1] < cy1 and box[3] >= oy
+
+    for x, y, line, f_b in bottom_text_lines(bottom_text, max_box_width, font_path, base_font_size):
+        if visible(_text_box(x, y, line, f_b)):
+            draw.text((x - ox, y - oy), line, font=f_b, fill=(0, 0, 0))
+
+    rects = highlight_rects(placed, start_word, end_word)
+    for n, pl in enumerate(placed):
+        yt = pl['yt']
+        if n in rects:
+            x0, y0, x1, y1 = rects[n]
+            draw.rectangle([x0 - ox, y0 - oy, x1 - ox, y1 - oy], fill=(173, 216, 230))
+
+        for item in pl['items']:
+            if item.get('pinyin') and pl['p_font']:
+                p_text = item['pinyin']
+                p_w, p_h = get_text_dimensions(p_text, pl['p_font'])
+                g_x0 = item.get('glyph_x0', 0)
+                g_w = item.get('glyph_width', item.get('raw_width', item['width']))
+                p_x, p_y = int(item['char_x'] + g_x0 + (g_w - p_w) / 2), int(pl['p_y'])
+                if visible(_text_box(p_x, p_y, p_text, pl['p_font'])):
+                    draw.text((p_x - ox, p_y - oy), p_text, font=pl['p_font'], fill=(0, 0, 0))
+            if draw_glyphs and visible(_text_box(int(item['char_x']), yt, item['word'], item['font'])):
+                draw.text((int(item['char_x']) - ox, yt - oy), item['word'], font=item['font'], fill=(0, 0, 0))
+
+    any_token_pinyin = any(any(item.get('pinyin') for item in pl['items']) for pl in placed)
+    if not any_token_pinyin and pinyin_lines:
+        yt = y_after
+        p_font = font_pool.get_font(font_path, max(10, base_font_size//2))
+        plh = text_metrics.line_height(p_font)
+        for pline in pinyin_lines:
+            lw, _ = get_text_dimensions(pline, p_font)
+            draw.text((400 - lw//2 - ox, yt - oy), pline, font=p_font, fill=(0, 0, 0))
+            yt += plh + 6
+
+
+def make_background_frame(width, height):
+    base_frame = np.full((height, width, 3), (40, 40, 40), dtype=np.uint8)
+    cv2.rectangle(base_frame, (50, 50), (750, 245), (204, 255, 255), -1)
+    cv2.rectangle(base_frame, (50, 315), (750, 380), (204, 255, 255), -1)
+    return base_frame
+
+
+def prepare_page(page_info, background_rgb, max_box_width, font_path, base_font_size):
+    """Layout and static layers of one page, drawn once: positions of every item and the
+    page without / with its top glyphs (boxes and pinyin included)."""
+    lines_render = layout_page_lines(page_info['top_sentence_draws'], max_box_width, base_font_size)
+    placed, y_after = place_page_lines(lines_render, font_path, base_font_size)
+    page = {'placed': placed, 'y_after': y_after, 'pinyin_lines': page_info.get('pinyin_lines', []),
+            'items_by_idx': {item['idx']: item for pl in placed for item in pl['items']},
+            'background': background_rgb, 'max_box_width': max_box_width,
+            'font_path': font_path, 'base_font_size': base_font_size}
+    page['bare'] = _page_layer(page, background_rgb.copy(), "", 0, -1, False)
+    page['full'] = cv2.cvtColor(_page_layer(page, background_rgb.copy(), "", 0, -1, True), cv2.COLOR_RGB2BGR)
+    return page
+
+
+def _page_layer(page, img, bottom_text, start_word, end_word, draw_glyphs, origin=(0, 0)):
+    draw_page_layer(img, page['placed'], page['y_after'], page['pinyin_lines'], bottom_text, start_word, end_word,
+                    page['max_box_width'], page['font_path'], page['base_font_size'],
+                    draw_glyphs=draw_glyphs, origin=origin)
+    return np.asarray(img)
+
+
+def iter_sentence_frames(page, bottom_text, start_word, word_frames):
+    """Yield (sentence_frame_bgr, patch, frame_count) for each word of one sentence.
+
+    The sentence frame is the page layer with only the areas this sentence changes (its
+    highlight rectangles and bottom lines) redrawn: a crop of the background with the
+    page's drawing replayed into it. `patch` is (x0, y0, cell_bgr), the active glyph's
+    cell redrawn in red (None when the word has no glyph); see word_frame()."""
+    width, height = page['background'].size
+    end_word = start_word + len(word_frames) - 1
+    # areas this sentence changes (+ antialiasing margin)
+    areas = list(highlight_rects(page['placed'], start_word, end_word).values())
+    areas += [_text_box(x, y, line, f) for x, y, line, f in
+              bottom_text_lines(bottom_text, page['max_box_width'], page['font_path'], page['base_font_size'])]
+    bare, full = page['bare'].copy(), page['full'].copy()
+    for a in areas:
+        x0, y0 = max(0, int(a[0]) - 2), max(0, int(a[1]) - 2)
+        x1, y1 = min(width, int(a[2]) + 3), min(height, int(a[3]) + 3)
+        if x1 <= x0 or y1 <= y0:
+            continue
+        crop = (x0, y0, x1, y1)
+        bare[y0:y1, x0:x1] = _page_layer(page, page['background'].crop(crop), bottom_text, start_word, end_word, False, (x0, y0))
+        full[y0:y1, x0:x1] = _page_layer(page, page['background'].crop(crop), bottom_text, start_word, end_word, True, (x0, y0))[..., ::-1]
+
+    for k, frames_for_word in enumerate(word_frames):
+        if frames_for_word <= 0:
+            continue
+        item = page['items_by_idx'].get(start_word + k)
+        if item is None:
+            yield full, None, frames_for_word
+            continue
+        # the glyph's ink box from the glyph-less layer, with the glyph redrawn in red
+        gx, gy = int(item['char_x']), item['y']
+        b = text_metrics.text_bbox(item['word'], item['font'])
+        x0, y0 = max(0, gx + b[0] - 1), max(0, gy + b[1] - 1)
+        x1, y1 = min(width, gx + b[2] + 1), min(height, gy + b[3] + 1)
+        if x1 <= x0 or y1 <= y0:
+            yield full, None, frames_for_word
+            continue
+        cell = Image.fromarray(bare[y0:y1, x0:x1])
+        ImageDraw.Draw(cell).text((gx - x0, gy - y0), item['word'], font=item['font'], fill=(255, 0, 0))
+        yield full, (x0, y0, cv2.cvtColor(np.array(cell), cv2.COLOR_RGB2BGR)), frames_for_word
+
+
+def word_frame(full, patch):
+    """The word's frame: the sentence frame with its red-glyph patch pasted in."""
+    if patch is None:
+        return full
+    x0, y0, cell = patch
+    frame = full.copy()
+    frame[y0:y0 + cell.shape[0], x0:x0 + cell.shape[1]] = cell
+    return frame
+
+
+def iter_sentences(page_info, page_frames):
+    """(sent_idx, bottom_text, start_word, word_frames) of the sentences that are on screen."""
+    bottom_sentences = page_info['bottom_sentences']
+    w_idx = 0
+    for sent_idx, cnt in enumerate(page_info['sent_word_counts']):
+        if cnt <= 0:
+            continue
+        sent_frames = page_frames[w_idx:w_idx + cnt]
+        if any(sent_frames):
+            bottom_text = bottom_sentences[sent_idx] if sent_idx < len(bottom_sentences) else ""
+            yield sent_idx, bottom_text, w_idx, sent_frames
+        w_idx += cnt
+
+
+def iter_page_frames(page_info, page_frames, background_rgb, max_box_width, font_path, base_font_size):
+    """Yield (frame_bgr, frame_count) for each word of one page (layers: see prepare_page and
+    iter_sentence_frames)."""
+    page = prepare_page(page_info, background_rgb, max_box_width, font_path, base_font_size)
+    for _, bottom_text, start_word, word_frames in iter_sentences(page_info, page_frames):
+        for full, patch, frames_for_word in iter_sentence_frames(page, bottom_text, start_word, word_frames):
+            yield word_frame(full, patch), frames_for_word
+
+
+_page_memo = {}
+
+
+def render_sentence_frames(page_index, page_info, page_frames, sent_idx, width, height, max_box_width, font_path, base_font_size):
+    """[(sentence_frame_bgr, patch, frame_count)] of one sentence; module-level so render_pool
+    workers can run it. The page layer is kept for the next sentence of the same page.
+    The sentence frame is one shared array, so a result pickles to about one frame."""
+    page = _page_memo.get(page_index)
+    if page is None:
+        background_rgb = Image.fromarray(cv2.cvtColor(make_background_frame(width, height), cv2.COLOR_BGR2RGB))
+        page = prepare_page(page_info, background_rgb, max_box_width, font_path, base_font_size)
+        _page_memo.clear()
+        _page_memo[page_index] = page
+    for idx, bottom_text, start_word, word_frames in iter_sentences(page_info, page_frames):
+        if idx == sent_idx:
+            return list(iter_sentence_frames(page, bottom_text, start_word, word_frames))
+    return []
+
+
+def render_video_from_pages(temp_video, prepped_pages, page_frame_counts, width, height, fps, max_box_width, font_path, base_font_size,
+                            workers=None, profile=None):
+    """Silent video of all pages, encoded with the encoder_profiles `profile` (default: the default mode).
+
+    Rendering runs in-process unless workers (or PODCAST_RENDER_WORKERS) asks for more;
+    then one sentence per task goes to a RenderPool, so at most its window of sentences
+    is held in memory."""
+    profile = profile or get_profile()
+    specs = []
+    for page_index, page_info in enumerate(prepped_pages):
+        page_frames = page_frame_counts[page_index] if page_index < len(page_frame_counts) else []
+        specs += [(page_index, page_info, page_frames, sent_idx, width, height, max_box_width, font_path, base_font_size)
+                  for sent_idx, _, _, _ in iter_sentences(page_info, page_frames)]
+    with FFmpegFrameEncoder(temp_video, width, height, fps, **encoder_kwargs(profile, fps, width, height)) as out:
+        with RenderPool(workers=workers, chunksize=4) as pool:
+            for sentence in pool.imap(render_sentence_frames, specs):
+                for full, patch, frames_for_word in sentence:
+                    out.add_frame(word_frame(full, patch), frames_for_word / fps)
+    _page_memo.clear()
+
+
+def concat_and_mux_audio(tts_files, temp_video, final_video, warn=print, work_dir=""):
+    """Join the sentence clips and mux them under the silent video; `warn(title, message)` is
+    called when the audio can't be added (the silent video is returned then)."""
+    tts_audio = None
+    if not tts_files:
+        return temp_video
+    concat_list = os.path.join(work_dir, "tts_concat_list.txt")
+    try:
+        with open(concat_list, "w", encoding="utf-8") as lf:
+            for t in tts_files:
+                lf.write(f"file '{os.path.abspath(t)}'\n")
+        tts_audio = os.path.join(work_dir, "tts_output.mp3")
+        subprocess.run(["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", concat_list, "-c", "copy", tts_audio], check=True)
+    except Exception as e:
+        warn("Lưu ý", f"Không thể ghép âm thanh: {e}\nVideo sẽ không có âm thanh.")
+    finally:
+        try: os.remove(concat_list)
+        except: pass
+
+    final_path = temp_video
+    if tts_audio and os.path.exists(tts_audio):
+        try:
+            subprocess.run([
+                "ffmpeg", "-y", "-i", temp_video, "-i", tts_audio,
+                "-c:v", "copy", "-c:a", "aac", "-map", "0:v:0", "-map", "1:a:0", "-shortest", final_video
+            ], check=True)
+            try:
+                os.remove(temp_video)
+            except:
+                pass
+            final_path = final_video
+        except Exception as e:
+            warn("Lưu ý", f"Không thể ghép âm thanh: {e}\nVideo không có âm thanh sẽ được sử dụng.")
+    return final_path
+
+
+def render_story(txt_path, output_path="output_map_function.mp4", voice=None, speed="100%",
+                 font_path="arial.ttf", base_font_size=32, workers=None, warn=print, stage_callback=None,
+                 render_mode=None):
+    """Whole pipeline for one story file; returns the written video path.
+
+    `voice` is a VOICE_OPTIONS name or an Edge TTS voice id. Temp files go to a private
+    folder so several stories can render at the same time. stage_callback(stage) is told
+    when the render moves to "synthesizing", "rendering" and "muxing". render_mode is "draft"
+    or "final" (see encoder_profiles)."""
+    stage_callback = stage_callback or (lambda stage: None)
+    voice = VOICE_OPTIONS.get(voice, voice)
+    sentence_pairs = parse_input_file(txt_path)
+    pages_data = wrap_and_paginate_with_mapping(sentence_pairs, font_path, base_font_size, 640, 165)
+
+    # Prepare prepped pages with draws and counts
+    prepped_pages = []
+    max_box_width = 640
+    for page in pages_data:
+        top_sentences = page.get('top_sentences', [])
+        top_sentence_draws, sent_word_counts = prepare_top_sentence_draws(top_sentences, font_path, base_font_size, max_box_width)
+        prepped_pages.append({
+            'top_sentences': top_sentences,
+            'bottom_sentences': page.get('bottom_sentences', []),
+            'pinyin_lines': page.get('pinyin_lines', []),
+            'top_sentence_draws': top_sentence_draws,
+            'sent_word_counts': sent_word_counts
+        })
+
+    work_dir = tempfile.mkdtemp(prefix="read_story_")
+    try:
+        # Synthesize TTS and compute frames
+        get_default_cache().reset_stats()
+        stage_callback("synthesizing")
+        width, height = 800, 450
+        fps = 8
+        default_frames_per_word = 12
+        tts_files, page_frame_counts = synthesize_tts_and_compute_frame_counts(
+            prepped_pages, fps, default_frames_per_word, voice=voice, speed=speed, work_dir=work_dir)
+
+        # Render video
+        stage_callback("rendering")
+        temp_video = os.path.join(work_dir, "output_map_function_noaudio.mp4")
+        render_video_from_pages(temp_video, prepped_pages, page_frame_counts, width, height, fps, max_box_width,
+                                font_path, base_font_size, workers=workers, profile=get_profile(render_mode))
+
+        # Concatenate and mux audio
+        stage_callback("muxing")
+        final_path = concat_and_mux_audio(tts_files, temp_video, output_path, warn=warn, work_dir=work_dir)
+        if final_path == temp_video:
+            # no audio could be added: keep the silent video rather than losing it with the temp folder
+            shutil.move(temp_video, output_path)
+            final_path = output_path
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(get_default_cache().report())
+    return final_path
@@ -5,7 +5,7 @@ Usage:
   python test.py
 
 Requirements:
-  pip install moviepy numpy pillow
+  pip install moviepy numpy
 
 Notes:
   - MoviePy needs ffmpeg available on PATH. The workspace includes an ffmpeg build
@@ -33,7 +33,7 @@ except Exception:
 			from moviepy.editor import AudioArrayClip
 		except Exception:
 			AudioArrayClip = None
-from PIL import Image, ImageDraw
+from visualizer import bar_frames, bar_levels, gradient_colors
 
 
 def make_audio(duration=5.0, sr=44100):
@@ -49,70 +49,19 @@ def make_audio(duration=5.0, sr=44100):
 	return (audio.astype(np.float32), sr)
 
 
-def gradient_color(i, n):
-	# map index to an RGB color across a rainbow-like gradient
-	# i in [0, n-1]
-	ratio = i / max(1, n - 1)
-	from math import sin, pi
-	r = int(127.5 * (1 + sin(2 * pi * ratio + 0)))
-	g = int(127.5 * (1 + sin(2 * pi * ratio + 2 * pi / 3)))
-	b = int(127.5 * (1 + sin(2 * pi * ratio + 4 * pi / 3)))
-	return (r, g, b)
-
-
 def create_waveform_video(filename="waveform.mp4", duration=5.0, fps=30, width=1280, height=360, n_bars=48):
 	audio, sr = make_audio(duration=duration)
 	audio_clip = AudioArrayClip(audio.reshape((-1, 1)), fps=sr)
 
-	# Precompute colors for bars
-	colors = [gradient_color(i, n_bars) for i in range(n_bars)]
-
-	half_h = height // 2
-	bar_w = int(width / n_bars)
+	# Bar heights of every frame from one batched STFT (band bins computed once),
+	# colors for the bars, and one frame buffer reused by make_frame
+	levels = bar_levels(audio, sr, fps, n_bars)
+	colors = gradient_colors(n_bars)
+	frame = np.empty((1, height, width, 3), dtype=np.uint8)
 
-	# Make a frame generator using the audio's FFT around time t
 	def make_frame(t):
-		# get a short window of audio around t
-		center = int(t * sr)
-		win = 2048
-		start = max(0, center - win // 2)
-		segment = audio[start:start + win]
-		if len(segment) < 2:
-			segment = np.pad(segment, (0, max(0, 2 - len(segment))))
-
-		# compute magnitude per frequency band
-		fft = np.abs(np.fft.rfft(segment * np.hanning(len(segment))))
-		freqs = np.fft.rfftfreq(len(segment), d=1.0 / sr)
-
-		# split into n_bars bands
-		mags = np.zeros(n_bars)
-		maxf = sr / 2
-		band_edges = np.linspace(0, maxf, n_bars + 1)
-		for i in range(n_bars):
-			lo, hi = band_edges[i], band_edges[i + 1]
-			mask = (freqs >= lo) & (freqs < hi)
-			if np.any(mask):
-				mags[i] = fft[mask].mean()
-
-		# normalize magnitudes
-		mags = mags / (np.max(mags) + 1e-9)
-		# amplify low frequencies a bit for visual balance
-		mags = mags ** 0.8
-
-		# Create an image and draw vertical bars
-		img = Image.new("RGB", (width, height), (12, 12, 12))
-		draw = ImageDraw.Draw(img)
-
-		for i, mag in enumerate(mags):
-			bw = bar_w - 2
-			x0 = i * bar_w + 1
-			x1 = x0 + bw
-			h = int(mag * (height * 0.95))
-			y0 = half_h - h // 2
-			y1 = half_h + h // 2
-			draw.rectangle([x0, y0, x1, y1], fill=colors[i])
-
-		return np.asarray(img)
+		i = min(int(round(t * fps)), len(levels) - 1)
+		return bar_frames(levels[i:i + 1], width, height, colors, out=frame)[0]
 
 	clip = VideoClip(make_frame, duration=duration)
 	if hasattr(clip, "set_fps"):
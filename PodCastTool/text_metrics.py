@@ -0,0 +1,87 @@
+"""
+Process-wide text metrics cache for PIL fonts.
+
+readStory measures the same glyphs over and over: every Chinese character gets a
+throw-away image to find its ink box, "Ay" is measured for the line height on
+every line of every page, and the fitter/paginator re-measure the same words at
+each step. Everything here is memoized per (font path, size, index, text), so
+each glyph is measured once per process no matter which font object asks.
+"""
+from PIL import Image, ImageDraw
+
+MAX_ENTRIES = 200000  # safety valve for very long multi-word strings
+
+_bbox_cache = {}
+_advance_cache = {}
+_ink_cache = {}
+
+
+def font_key(font):
+    """Identify a FreeTypeFont by what it was loaded from, not by object identity."""
+    path = getattr(font, "path", None)
+    if not isinstance(path, str):
+        path = id(font)  # loaded from bytes / file object
+    return (path, getattr(font, "size", None), getattr(font, "index", 0))
+
+
+def _remember(cache, key, value):
+    if len(cache) >= MAX_ENTRIES:
+        cache.clear()
+    cache[key] = value
+    return value
+
+
+def text_bbox(text, font):
+    """font.getbbox(text), cached."""
+    key = (font_key(font), text)
+    bbox = _bbox_cache.get(key)
+    if bbox is None:
+        bbox = _remember(_bbox_cache, key, font.getbbox(text))
+    return bbox
+
+
+def text_size(text, font):
+    """(width, height) of the text's bounding box, like readStory.get_text_dimensions."""
+    b = text_bbox(text, font)
+    return b[2] - b[0], b[3] - b[1]
+
+
+def advance(text, font):
+    """Horizontal advance of the text (font.getlength), cached."""
+    key = (font_key(font), text)
+    w = _advance_cache.get(key)
+    if w is None:
+        w = _remember(_advance_cache, key, font.getlength(text))
+    return w
+
+
+def line_height(font):
+    """Height used for one text line ("Ay" box height)."""
+    return text_size("Ay", font)[1]
+
+
+def ink_extent(glyph, font):
+    """(x0, width) of the glyph's actual ink when drawn at x=0, found by rendering it once."""
+    key = (font_key(font), glyph)
+    ext = _ink_cache.get(key)
+    if ext is not None:
+        return ext
+    raw_w, raw_h = text_size(glyph, font)
+    try:
+        temp_img = Image.new('L', (raw_w + 40, raw_h + 40), color=255)
+        ImageDraw.Draw(temp_img).text((20, 0), glyph, font=font, fill=0)
+        bbox = temp_img.getbbox()
+        ext = (bbox[0] - 20, bbox[2] - bbox[0]) if bbox else (0, raw_w)
+    except Exception:
+        ext = (0, raw_w)
+    return _remember(_ink_cache, key, ext)
+
+
+def cache_info():
+    return {"bbox": len(_bbox_cache), "advance": len(_advance_cache), "ink": len(_ink_cache)}
+
+
+def clear():
+    _bbox_cache.clear()
+    _advance_cache.clear()
+    _ink_cache.clear()
@@ -0,0 +1,118 @@
+"""
+Cache of synthesized TTS clips by (text, voice, rate), with each clip's duration in a JSON
+sidecar so a hit skips synthesis and probing. PODCAST_TTS_CACHE / PODCAST_TTS_CACHE_MB.
+"""
+import json
+import os
+
+from audio_probe import get_duration
+from disk_cache import DiskCache, atomic_copy, atomic_write_bytes, default_cache, hash_key
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "podcasttool", "tts")
+DEFAULT_MAX_MB = 2048
+CLIP_EXT = ".clip"
+META_EXT = ".json"
+
+
+class TTSCache(DiskCache):
+    ext = CLIP_EXT
+    env = "PODCAST_TTS_CACHE"
+    default_dir = DEFAULT_CACHE_DIR
+    default_mb = DEFAULT_MAX_MB
+
+    @staticmethod
+    def key(text, voice, rate, namespace=""):
+        # namespace keeps clips from other backends (e.g. the offline stub) apart from Edge TTS ones
+        return hash_key([text, voice, rate] + ([namespace] if namespace else []))
+
+    def _paths(self, key):
+        clip = self.path(key)
+        return clip, clip[:-len(CLIP_EXT)] + META_EXT
+
+    def _read(self, text, voice, rate, namespace, require):
+        clip, meta_path = self._paths(self.key(text, voice, rate, namespace))
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not all(k in meta for k in require):
+            return None  # present but without the extra data asked for
+        meta["path"] = clip
+        return meta
+
+    def lookup(self, text, voice, rate, namespace="", require=()):
+        """Return the entry's metadata dict (with 'path' and 'duration') or None on a miss.
+        Entries missing any key in `require` count as misses."""
+        meta = self._read(text, voice, rate, namespace, require)
+        if meta is not None and not self.touch(meta["path"]):
+            meta = None
+        self.count("hits" if meta is not None else "misses")
+        return meta
+
+    def store(self, text, voice, rate, src_file, duration=None, namespace="", **extra):
+        """Copy a freshly synthesized clip into the cache and return its metadata."""
+        clip, meta_path = self._paths(self.key(text, voice, rate, namespace))
+        os.makedirs(os.path.dirname(clip), exist_ok=True)
+        if duration is None:
+            duration = get_duration(src_file)
+        try:
+            replaced = os.path.getsize(clip)  # re-synthesized entry (e.g. to add word boundaries)
+        except OSError:
+            replaced = 0
+        atomic_copy(src_file, clip)
+        meta = {"text": text, "voice": voice, "rate": rate, "duration": duration}
+        meta.update(extra)
+        atomic_write_bytes(meta_path, json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+        self.added(clip, replaced)
+        meta["path"] = clip
+        return meta
+
+    def fetch(self, text, voice, rate, dest, namespace="", require=()):
+        """On a hit, copy the cached clip to `dest` and return its metadata; otherwise None."""
+        meta = self._read(text, voice, rate, namespace, require)
+        if meta is not None:
+            try:
+                atomic_copy(meta["path"], dest)
+                self.touch(meta["path"])
+            except FileNotFoundError:
+                meta = None  # evicted (by another process) since the sidecar was read
+        self.count("hits" if meta is not None else "misses")
+        return meta
+
+    def remove(self, path):
+        super().remove(path)
+        super().remove(path[:-len(CLIP_EXT)] + META_EXT)
+
+    def report(self):
+        total = self.hits + self.misses
+        rate = (100.0 * self.hits / total) if total else 0.0
+        return f"TTS cache: {self.hits} hits / {self.misses} misses ({rate:.0f}% hit rate)"
+
+
+def get_default_cache():
+    return default_cache(TTSCache)
+
+
+async def synthesize_cached(text, voice, rate, filename, backend, cache=None, require=()):
+    """Write the clip for (text, voice, rate) to `filename`, synthesizing only on a cache miss.
+
+    `backend` is a coroutine function (text, voice, rate, filename). If it returns a dict
+    (e.g. word boundaries), those fields are stored in the entry too. Entries missing any
+    key in `require` are treated as misses and re-synthesized. Returns the cache metadata
+    (including 'duration') so callers don't need to probe the file again.
+    """
+    cache = cache or get_default_cache()
+    namespace = getattr(backend, "cache_namespace", "")
+    meta = cache.fetch(text, voice, rate, filename, namespace, require)
+    if meta is not None:
+        return meta
+    extra = await backend(text, voice, rate, filename)
+    return cache.store(text, voice, rate, filename, namespace=namespace, **(extra if isinstance(extra, dict) else {}))
+
+
+def cached_backend(backend, cache=None, require=()):
+    """Wrap a TTS backend so every call goes through the cache (for tts_pool.synthesize_all)."""
+    async def run(text, voice, rate, filename):
+        return await synthesize_cached(text, voice, rate, filename, backend, cache, require)
+    return run
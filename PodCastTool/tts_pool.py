@@ -0,0 +1,190 @@
+"""
+Bounded-concurrency TTS synthesis for the PodCastTool generators.
+
+Instead of calling asyncio.run(...) once per clip (a new event loop and one
+network round-trip at a time), a generator collects every TTSJob for the whole
+input file up front and hands them to synthesize_all(). The jobs run on a single
+event loop with at most `concurrency` requests in flight, failed requests are
+retried with exponential backoff, and the jobs come back in the order they were
+given so the assembly step can walk them line by line.
+
+The backend is any coroutine function (text, voice, rate, filename). The default
+is Edge TTS; StubTTSBackend is an offline stand-in used for benchmarking. Wrap a
+backend with tts_cache.cached_backend() to skip clips that were already made.
+
+`concurrency` only bounds one render. When several renders run at once
+(job_queue workers), set_shared_budget() adds a cap shared by all of them: every
+backend request then waits for a slot of the shared budget as well.
+"""
+import asyncio
+import contextlib
+import random
+import wave
+
+import edge_tts
+
+DEFAULT_CONCURRENCY = 6
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 1.0
+
+# cross-process cap on requests in flight (e.g. job_queue.TTSBudget), None = no shared cap
+_shared_budget = None
+
+
+def speed_to_rate(speed_str):
+    """Convert a GUI speed like '90%' into an edge_tts rate string like '-10%'."""
+    speed_val = int(str(speed_str).strip().replace("%", ""))
+    return f"{speed_val - 100:+d}%"
+
+
+class TTSJob:
+    """One clip to synthesize. `ok`/`error`/`attempts` are filled in by synthesize_all."""
+
+    def __init__(self, text, voice, rate, filename):
+        self.text = text
+        self.voice = voice
+        self.rate = rate
+        self.filename = filename
+        self.ok = False
+        self.error = None
+        self.attempts = 0
+        self.duration = None  # set when the backend reports it (e.g. a cached backend)
+        self.meta = None      # the backend's dict result, if any (cache metadata, word boundaries)
+
+    def __repr__(self):
+        return f"TTSJob({self.text[:30]!r}, {self.voice!r}, {self.rate!r}, {self.filename!r})"
+
+
+def set_shared_budget(budget):
+    """Make every TTS request of this process hold a slot of `budget` (async acquire() -> slot,
+    async release(slot)) while it runs. None turns the shared cap off again."""
+    global _shared_budget
+    _shared_budget = budget
+
+
+@contextlib.asynccontextmanager
+async def request_slot():
+    budget = _shared_budget
+    if budget is None:
+        yield
+        return
+    slot = await budget.acquire()
+    try:
+        yield
+    finally:
+        await budget.release(slot)
+
+
+async def edge_backend(text, voice, rate, filename):
+    async with request_slot():
+        await edge_tts.Communicate(text, voice, rate=rate).save(filename)
+
+
+async def edge_backend_with_words(text, voice, rate, filename):
+    """Stream Edge TTS to `filename` and capture its WordBoundary events.
+
+    Returns {"words": [{"text", "offset", "duration"}, ...]} with times in seconds.
+    """
+    try:
+        communicate = edge_tts.Communicate(text, voice, rate=rate, boundary="WordBoundary")
+    except TypeError:
+        # edge-tts < 7 has no `boundary` argument and always sends word boundaries
+        communicate = edge_tts.Communicate(text, voice, rate=rate)
+    words = []
+    async with request_slot():
+        with open(filename, "wb") as f:
+            async for chunk in communicate.stream():
+                if chunk["type"] == "audio":
+                    f.write(chunk["data"])
+                elif chunk["type"] == "WordBoundary":
+                    # offsets/durations come in 100-nanosecond ticks
+                    words.append({"text": chunk["text"], "offset": chunk["offset"] / 1e7, "duration": chunk["duration"] / 1e7})
+    return {"words": words}
+
+
+def write_silence_wav(filename, duration, sample_rate=24000):
+    n = max(1, int(duration * sample_rate))
+    with wave.open(filename, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(b"\x00\x00" * n)
+
+
+class StubTTSBackend:
+    """Offline backend: sleeps `latency` seconds (the network round-trip) and writes a
+    silent WAV whose length grows with the text. `fail_rate` injects random errors so
+    the retry path can be exercised too."""
+
+    cache_namespace = "stub"  # tts_cache keeps stub clips separate from real ones
+
+    def __init__(self, latency=0.3, seconds_per_char=0.06, sample_rate=24000, fail_rate=0.0):
+        self.latency = latency
+        self.seconds_per_char = seconds_per_char
+        self.sample_rate = sample_rate
+        self.fail_rate = fail_rate
+        self.calls = 0
+
+    async def __call__(self, text, voice, rate, filename):
+        self.calls += 1
+        async with request_slot():
+            await asyncio.sleep(self.latency)
+        if self.fail_rate and random.random() < self.fail_rate:
+            raise ConnectionError("stub TTS: simulated network failure")
+        write_silence_wav(filename, 0.3 + len(text) * self.seconds_per_char, self.sample_rate)
+
+
+async def _run_job(job, backend, semaphore, retries, backoff, on_done):
+    for attempt in range(retries + 1):
+        job.attempts = attempt + 1
+        async with semaphore:
+            try:
+                result = await backend(job.text, job.voice, job.rate, job.filename)
+                if isinstance(result, dict):
+                    job.meta = result
+                    job.duration = result.get("duration")
+                job.ok = True
+                job.error = None
+                break
+            except Exception as e:
+                job.error = e
+        if attempt < retries:
+            # exponential backoff with a little jitter so retries don't arrive together
+            await asyncio.sleep(backoff * (2 ** attempt) + random.uniform(0, backoff / 2))
+    if on_done:
+        on_done(job)
+    return job
+
+
+async def _run_all(jobs, backend, concurrency, retries, backoff, progress_callback):
+    semaphore = asyncio.Semaphore(max(1, int(concurrency)))
+    done = [0]
+
+    def on_done(job):
+        done[0] += 1
+        if progress_callback:
+            progress_callback(done[0], len(jobs), job)
+
+    return await asyncio.gather(*(_run_job(j, backend, semaphore, retries, backoff, on_done) for j in jobs))
+
+
+def synthesize_all(jobs, backend=None, concurrency=DEFAULT_CONCURRENCY, retries=DEFAULT_RETRIES,
+                   backoff=DEFAULT_BACKOFF, progress_callback=None, raise_on_error=True):
+    """Synthesize all jobs on one event loop and return them in the order given.
+
+    progress_callback(done, total, job) is called as each job finishes (in completion order).
+    If raise_on_error is True, a RuntimeError is raised when any job still fails after retries.
+    """
+    jobs = list(jobs)
+    if not jobs:
+        return jobs
+    backend = backend or edge_backend
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(_run_all(jobs, backend, concurrency, retries, backoff, progress_callback))
+    finally:
+        loop.close()
+    failed = [j for j in jobs if not j.ok]
+    if failed and raise_on_error:
+        raise RuntimeError(f"TTS failed for {len(failed)}/{len(jobs)} clips, first error: {failed[0].error}")
+    return jobs
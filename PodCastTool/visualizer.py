@@ -0,0 +1,310 @@
+"""
+Audio visualizer track computed once with numpy instead of per frame inside ffmpeg.
+
+main.py (WAVE_MODES: showwaves / showvolume) and toMp4 (showfreqs) used to draw the
+waveform or spectrum in the filter graph, at the output frame rate, for the whole
+render. Here the track is analysed in one vectorized pass:
+
+- waveform styles: per-frame, per-column min/max envelope of the samples shown in
+  that frame (one reshape + min/max over the whole track);
+- volume styles: per-frame peak level with showvolume's fade;
+- spectrum styles: a strided Hann-windowed STFT over the whole track (rfft in
+  batches), binned into the overlay's columns with np.add.reduceat.
+
+The result is rasterized into 8-bit coverage masks (numpy comparisons over a batch
+of frames, no per-pixel Python) and encoded losslessly as a small grayscale video,
+usually at a lower frame rate than the main video. In the render graph the mask
+becomes a white layer with that mask as alpha (overlay_filter()), overlaid where
+the ffmpeg visualizer used to go; overlay repeats frames to the output rate.
+
+    build_visualizer_track("full_audio.mp3", "wave.mkv", "line", 800, 200, fps=12)
+
+The colored equalizer bars of test.py (bar_levels() / bar_frames()) use the same
+STFT: band edges are turned into FFT bin indices once, bands are averaged with
+reduceat, and RGB frames are gathered from a (height, n_bars) bar image instead of
+drawn rectangle by rectangle.
+"""
+import numpy as np
+
+from audio_timeline import AudioTimeline
+from frame_encoder import FFmpegFrameEncoder
+
+DEFAULT_SAMPLE_RATE = 24000
+DEFAULT_FPS = 12
+STFT_WINDOW = 2048
+BATCH_FRAMES = 256  # frames analysed / rasterized per numpy batch
+RGB_BATCH_BYTES = 16 * 1024 * 1024  # RGB frames per batch: as many as fit (larger ones run slower)
+
+# style name -> drawing parameters
+#   kind: "wave" (showwaves), "volume" (showvolume) or "spectrum" (showfreqs)
+#   mode: how a waveform column is drawn (point / line / p2p / cline)
+#   intensity: mask value of drawn pixels (white@0.4 -> 0.4)
+#   thick: extra columns drawn on each side
+STYLES = {
+    "line": {"kind": "wave", "mode": "line", "intensity": 1.0, "thick": 0},
+    "p2p": {"kind": "wave", "mode": "p2p", "intensity": 1.0, "thick": 0},
+    "cline": {"kind": "wave", "mode": "cline", "intensity": 1.0, "thick": 0},
+    "point": {"kind": "wave", "mode": "point", "intensity": 1.0, "thick": 0},
+    "line_thin": {"kind": "wave", "mode": "line", "intensity": 0.6, "thick": 0},
+    "line_faint": {"kind": "wave", "mode": "line", "intensity": 0.4, "thick": 0},
+    "line_thick": {"kind": "wave", "mode": "line", "intensity": 1.0, "thick": 1},
+    "volume": {"kind": "volume", "fade": 0.5},
+    "volume_smooth": {"kind": "volume", "fade": 0.1},
+    "spectrum": {"kind": "spectrum", "fscale": "log", "ascale": "sqrt"},
+}
+
+
+def load_mono(path, sample_rate=DEFAULT_SAMPLE_RATE):
+    """Whole track as float32 mono in [-1, 1]."""
+    pcm = AudioTimeline(sample_rate=sample_rate, channels=1).load(path)
+    return pcm[:, 0].astype(np.float32) / 32768.0
+
+
+def frame_count(n_samples, sample_rate, fps):
+    return max(1, int(np.ceil(n_samples / sample_rate * fps)))
+
+
+# ---------- analysis ----------
+
+def wave_envelope(audio, sample_rate, fps, width):
+    """(lo, hi) arrays of shape (n_frames, width): min/max sample of every column of every frame.
+
+    Frame i shows the 1/fps seconds of audio that start at i/fps, spread over the width."""
+    n_frames = frame_count(len(audio), sample_rate, fps)
+    per_frame = sample_rate / fps
+    per_col = max(1, int(round(per_frame / width)))
+    # sample index of column c of frame i: i * per_frame + c * per_frame / width
+    starts = (np.arange(n_frames)[:, None] * per_frame + np.arange(width)[None, :] * (per_frame / width)).astype(np.int64)
+    padded = np.concatenate([audio, np.zeros(per_col, dtype=audio.dtype)])
+    starts = np.minimum(starts, len(audio))
+    lo = np.empty((n_frames, width), dtype=np.float32)
+    hi = np.empty((n_frames, width), dtype=np.float32)
+    # strided view: row j = padded[j:j + per_col], so each column's samples are one fancy index
+    windows = np.lib.stride_tricks.sliding_window_view(padded, per_col)
+    for b in range(0, n_frames, BATCH_FRAMES):
+        w = windows[starts[b:b + BATCH_FRAMES]]
+        lo[b:b + BATCH_FRAMES] = w.min(axis=-1)
+        hi[b:b + BATCH_FRAMES] = w.max(axis=-1)
+    return lo, hi
+
+
+def volume_levels(audio, sample_rate, fps, fade):
+    """Per-frame peak level in [0, 1]; a falling level decays by `fade` per frame like showvolume."""
+    n_frames = frame_count(len(audio), sample_rate, fps)
+    hop = int(round(sample_rate / fps))
+    padded = np.zeros(n_frames * hop, dtype=np.float32)
+    padded[:min(len(audio), len(padded))] = np.abs(audio[:len(padded)])
+    peaks = padded.reshape(n_frames, hop).max(axis=1)
+    levels = np.empty_like(peaks)
+    level = 0.0
+    for i, p in enumerate(peaks):
+        level = max(float(p), level * fade)
+        levels[i] = level
+    return levels
+
+
+def stft_magnitudes(audio, sample_rate, fps, window=STFT_WINDOW):
+    """Yield (first_frame, magnitudes) batches: |rfft| of a Hann window centred on every frame,
+    normalized so a full-scale sine reads 1.0. Shape of each batch: (frames, window // 2 + 1)."""
+    n_frames = frame_count(len(audio), sample_rate, fps)
+    hop = sample_rate / fps
+    half = window // 2
+    padded = np.concatenate([np.zeros(half, np.float32), audio, np.zeros(window, np.float32)])
+    frames = np.lib.stride_tricks.sliding_window_view(padded, window)
+    hann = np.hanning(window).astype(np.float32)
+    norm = 2.0 / hann.sum()
+    starts = np.minimum((np.arange(n_frames) * hop).astype(np.int64), len(frames) - 1)
+    for b in range(0, n_frames, BATCH_FRAMES):
+        spec = np.abs(np.fft.rfft(frames[starts[b:b + BATCH_FRAMES]] * hann, axis=1)) * norm
+        yield b, spec.astype(np.float32)
+
+
+def column_bins(n_bins, width, fscale="log"):
+    """First FFT bin of each of `width` display columns (linear or log frequency axis)."""
+    if fscale == "log":
+        edges = np.geomspace(1, n_bins, width + 1)[:-1]
+    else:
+        edges = np.linspace(0, n_bins, width + 1)[:-1]
+    return np.minimum(edges.astype(np.int64), n_bins - 1)
+
+
+def band_bins(window, n_bars):
+    """First FFT bin of each of `n_bars` equal-width bands between 0 Hz and Nyquist, and the
+    end bin (the Nyquist bin itself belongs to no band, like freqs < sr / 2 in test.py)."""
+    half = window // 2
+    starts = -(-np.arange(n_bars, dtype=np.int64) * half // n_bars)  # ceil(i * half / n_bars)
+    return starts, half
+
+
+def reduce_columns(spec, bins, empty=None):
+    """Mean magnitude of every column's bins; columns that share one bin repeat it (reduceat),
+    or read `empty` when it is given."""
+    sums = np.add.reduceat(spec, np.minimum(bins, spec.shape[1] - 1), axis=1)
+    counts = np.diff(np.append(bins, spec.shape[1]))
+    means = sums / np.maximum(counts, 1)
+    if empty is not None:
+        means[:, counts <= 0] = empty
+    return means
+
+
+def bar_levels(audio, sample_rate, fps, n_bars, window=STFT_WINDOW, gamma=0.8):
+    """(n_frames, n_bars) bar heights in [0, 1] as test.py computes them: mean magnitude of
+    equal-width frequency bands, divided by the loudest band of the frame, then ** gamma."""
+    starts, end = band_bins(window, n_bars)
+    levels = []
+    for _, mags in stft_magnitudes(audio, sample_rate, fps, window):
+        bands = reduce_columns(mags[:, :end], starts, empty=0.0)
+        bands /= bands.max(axis=1, keepdims=True) + 1e-9
+        levels.append(bands ** gamma)
+    return np.concatenate(levels).astype(np.float32)
+
+
+# ---------- rasterization ----------
+
+def raster_spans(top, bottom, height):
+    """uint8 masks (frames, height, width) with rows top..bottom (inclusive) of every column set."""
+    rows = np.arange(height, dtype=np.int32)[None, :, None]
+    return ((rows >= top[:, None, :]) & (rows <= bottom[:, None, :])).astype(np.uint8)
+
+
+def _thicken(mask, thick):
+    out = mask.copy()
+    for d in range(1, thick + 1):
+        out[:, :, d:] |= mask[:, :, :-d]
+        out[:, :, :-d] |= mask[:, :, d:]
+    return out
+
+
+def wave_masks(lo, hi, height, mode, thick=0):
+    """Rasterize envelopes from wave_envelope() the way showwaves draws each mode."""
+    mid = (height - 1) / 2.0
+    y_lo = np.clip(np.rint(mid - hi * mid), 0, height - 1).astype(np.int32)  # top of the column
+    y_hi = np.clip(np.rint(mid - lo * mid), 0, height - 1).astype(np.int32)  # bottom of the column
+    if mode == "line":
+        # a line from the centre to each sample: the span covering the centre and the envelope
+        centre = int(round(mid))
+        mask = raster_spans(np.minimum(y_lo, centre), np.maximum(y_hi, centre), height)
+    elif mode == "cline":
+        amp = np.maximum(np.abs(lo), np.abs(hi)) * mid / 2.0
+        mask = raster_spans(np.rint(mid - amp).astype(np.int32), np.rint(mid + amp).astype(np.int32), height)
+    elif mode == "p2p":
+        # join each column with the previous one so the trace stays connected
+        prev_lo = np.concatenate([y_lo[:, :1], y_lo[:, :-1]], axis=1)
+        prev_hi = np.concatenate([y_hi[:, :1], y_hi[:, :-1]], axis=1)
+        mask = raster_spans(np.minimum(y_lo, prev_hi), np.maximum(y_hi, prev_lo), height)
+    else:  # point
+        mask = raster_spans(y_lo, y_lo, height) | raster_spans(y_hi, y_hi, height)
+    return _thicken(mask, thick) if thick else mask
+
+
+def volume_masks(levels, width, height):
+    """Horizontal bar from the left, as long as the level."""
+    right = np.rint(levels * width).astype(np.int32)
+    cols = np.arange(width, dtype=np.int32)[None, None, :]
+    return np.broadcast_to(cols < right[:, None, None], (len(levels), height, width)).astype(np.uint8)
+
+
+def spectrum_masks(values, height):
+    """Bars from the bottom up, one per column, heights as fractions of `height`."""
+    top = np.rint(height - np.clip(values, 0.0, 1.0) * height).astype(np.int32)
+    return raster_spans(top, np.full_like(top, height - 1), height)
+
+
+def gradient_colors(n):
+    """(n, 3) uint8 rainbow gradient: three sines a third of a turn apart, one turn over the bars."""
+    ratio = np.arange(n) / max(1, n - 1)
+    phases = 2 * np.pi * ratio[:, None] + np.array([0, 2 * np.pi / 3, 4 * np.pi / 3])[None, :]
+    return np.floor(127.5 * (1 + np.sin(phases))).astype(np.uint8)
+
+
+def bar_frames(levels, width, height, colors, background=(12, 12, 12), fill=0.95, out=None):
+    """RGB frames (frames, height, width, 3) with one centred vertical bar per level.
+
+    Bar i covers columns i * bar_w + 1 .. (i + 1) * bar_w - 1 and rows within
+    int(level * height * fill) // 2 of the centre row. Rows therefore only differ in how
+    many of the tallest bars reach them: the n_bars + 1 possible rows of a frame are built
+    once and the frame is gathered from them row by row (contiguous copies). `out` may be a
+    uint8 buffer of the result's shape to fill instead of allocating one."""
+    n_frames, n = levels.shape
+    bar_w = max(2, width // n)
+    reach = (levels * (height * fill)).astype(np.int32) // 2  # half-height of every bar
+    # rank[f, i]: position of bar i when the frame's bars are sorted tallest first
+    order = np.argsort(-reach, axis=1, kind="stable")
+    rank = np.empty_like(order)
+    np.put_along_axis(rank, order, np.broadcast_to(np.arange(n), order.shape), axis=1)
+
+    cols = np.arange(width)
+    bar = np.minimum(cols // bar_w, n - 1)
+    in_bar = (cols % bar_w >= 1) & (cols < n * bar_w)
+    col_rank = np.where(in_bar[None, :], rank[:, bar], n)  # gaps are never drawn
+    # row k of a frame: its k tallest bars drawn; rows are handled as flat RGB bytes
+    drawn = np.repeat(col_rank, 3, axis=1)[:, None, :] < np.arange(n + 1)[None, :, None]
+    bar_row = colors[bar].reshape(-1)
+    bg_row = np.tile(np.asarray(background, dtype=np.uint8), width)
+    rows = np.where(drawn, bar_row, bg_row)  # (frames, n + 1, width * 3)
+
+    dist = np.abs(np.arange(height) - height // 2)
+    count = (reach[:, None, :] >= dist[None, :, None]).sum(axis=2)  # bars reaching each row
+    index = (count + np.arange(n_frames)[:, None] * (n + 1)).reshape(-1)
+    if out is None:
+        out = np.empty((n_frames, height, width, 3), dtype=np.uint8)
+    np.take(rows.reshape(-1, width * 3), index, axis=0, out=out.reshape(-1, width * 3))
+    return out
+
+
+def iter_bar_frames(audio, sample_rate, fps, width, height, n_bars=48, colors=None):
+    """Yield batches of bar_frames() for the whole track. Every batch is written into the
+    same buffer; copy a batch to keep it past the next iteration."""
+    levels = bar_levels(audio, sample_rate, fps, n_bars)
+    colors = gradient_colors(n_bars) if colors is None else colors
+    per_batch = max(1, RGB_BATCH_BYTES // (width * height * 3))
+    buf = np.empty((per_batch, height, width, 3), dtype=np.uint8)
+    for b in range(0, len(levels), per_batch):
+        batch = levels[b:b + per_batch]
+        yield bar_frames(batch, width, height, colors, out=buf[:len(batch)])
+
+
+# ---------- track ----------
+
+def iter_masks(audio, sample_rate, style, width, height, fps):
+    """Yield batches of uint8 masks (frames, height, width) with values 0..255."""
+    spec = STYLES[style]
+    kind = spec["kind"]
+    if kind == "wave":
+        lo, hi = wave_envelope(audio, sample_rate, fps, width)
+        value = int(round(255 * spec["intensity"]))
+        for b in range(0, len(lo), BATCH_FRAMES):
+            yield wave_masks(lo[b:b + BATCH_FRAMES], hi[b:b + BATCH_FRAMES], height, spec["mode"], spec["thick"]) * value
+    elif kind == "volume":
+        levels = volume_levels(audio, sample_rate, fps, spec["fade"])
+        for b in range(0, len(levels), BATCH_FRAMES):
+            yield volume_masks(levels[b:b + BATCH_FRAMES], width, height) * 255
+    else:
+        bins = None
+        for _, mags in stft_magnitudes(audio, sample_rate, fps):
+            if bins is None:
+                bins = column_bins(mags.shape[1], width, spec["fscale"])
+            values = reduce_columns(mags, bins)
+            if spec["ascale"] == "sqrt":
+                values = np.sqrt(values)
+            yield spectrum_masks(values, height) * 255
+
+
+def build_visualizer_track(audio_path, output_path, style, width, height, fps=DEFAULT_FPS,
+                           sample_rate=DEFAULT_SAMPLE_RATE):
+    """Encode the visualizer of `audio_path` as a lossless gray mask video; returns output_path.
+
+    Use a .mkv output; overlay it with overlay_filter()."""
+    audio = load_mono(audio_path, sample_rate)
+    with FFmpegFrameEncoder(output_path, width, height, fps, pix_fmt="gray", codec="ffv1",
+                            extra_args=["-pix_fmt", "gray"]) as enc:
+        for batch in iter_masks(audio, sample_rate, style, width, height, fps):
+            for mask in batch:
+                enc.add_frame(mask, 1.0 / fps)
+    return output_path
+
+
+def overlay_filter(input_label, output_label):
+    """Filter graph snippet turning the mask video into a white layer with the mask as alpha."""
+    return (f"{input_label}format=gray,split[vis_a][vis_c];[vis_c]lut=c0=255[vis_w];"
+            f"[vis_w][vis_a]alphamerge{output_label}")